@@ -1,38 +1,33 @@
-import streamlit as st
-import speech_recognition as sr
-import pyttsx3
-import threading
-import openai
-from queue import Queue
-
-# --- Configuration and Initialization ---
+import time
+RUN_STARTED = time.perf_counter()
 
-# Initialize pyttsx3 TTS engine and a thread-safe queue for voice commands
-tts_engine = pyttsx3.init()
-voice_queue = Queue()
-
-# Voice worker thread
-def voice_worker():
-    while True:
-        text = voice_queue.get()
-        if text is None:
-            break
-        try:
-            tts_engine.say(text)
-            tts_engine.runAndWait()
-        except Exception as e:
-            print(f"Error in voice worker: {e}")
-        finally:
-            voice_queue.task_done()
-
-# Start the voice worker thread ONLY ONCE using Streamlit's session state.
-# This is the key fix for the "run loop already started" error.
-if "voice_worker_started" not in st.session_state:
-    threading.Thread(target=voice_worker, daemon=True).start()
-    st.session_state["voice_worker_started"] = True
-
-def speak_text(text):
-    voice_queue.put(text)
+import streamlit as st
+import functools
+import html
+import os
+import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from saathi import metrics
+from saathi.assets import ASSETS, FONT_CSS_URL, IMG_DIR, asset_url, load_manifest, local_font_css, picture_html
+from saathi.cache import ResponseCache, estimate_tokens, make_key
+from saathi.conversations import CONVERSATION_WINDOW, ConversationLog
+from saathi.history import HistoryManager, prompt_tokens as payload_tokens
+from saathi.docstore import STORE_DIR, STUDY_NOTES, DocStore
+from saathi.lessonpack import install_all
+from saathi.llm import LLMClient, LLMTimeout
+from saathi.prompts import DEFAULT_MODEL, SYSTEM_PROMPT
+from saathi.retrieval import INDEX_DIR, RetrievalIndex
+from saathi.router import ModelRouter, classify
+from saathi.scheduler import LLM_BURST, LLM_RATE_PER_MINUTE, QueueTimeout, Scheduler
+from saathi.singleflight import SingleFlight
+from saathi.state import open_state
+from saathi.synthesis import TTS_WORKERS, SynthesisPool
+from saathi.tts import AudioRenderer, SentenceAudio, apply_profile, audio_duration, audio_mime, voice_profile
+from saathi.text import split_sentences
+from saathi.translation import TRANSLATION_WORKERS, SentencePipeline, TranslationMemory
+from saathi.voicequeue import VoiceQueue
 
 st.set_page_config(
     page_title="Shiksha Saathi 📚",
@@ -41,9 +36,245 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
+# --- Configuration and Initialization ---
+# Streamlit re-executes this script top to bottom on every interaction. Heavy
+# resources (TTS, recognizer, caches, API client) are therefore created once per
+# process with st.cache_resource, and optional subsystems such as speech
+# recognition are only imported when their feature is actually used.
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+CHAT_PAGE_SIZE = int(os.environ.get("SHIKSHA_CHAT_PAGE_SIZE", 20))
+
+# "file" renders each answer to a cached audio file that plays in the learner's
+# own browser; "speaker" keeps the old behaviour of speaking on the host's
+# speaker, which suits a single shared kiosk.
+TTS_MODE = os.environ.get("SHIKSHA_TTS_MODE", "file")
+
+# Initialize pyttsx3 TTS engine and a bounded per-session voice queue. A new
+# answer supersedes what is left of the session's previous one.
+@st.cache_resource(show_spinner=False)
+def get_voice_pipeline():
+    import pyttsx3
+    tts_engine = pyttsx3.init()
+
+    # Runs on the voice worker thread; item.on_start is an optional callback
+    # fired right before the text is spoken.
+    def speak(item):
+        apply_profile(tts_engine, item.profile)
+        tts_engine.say(item.text)
+        if item.cancelled:
+            tts_engine.stop()
+            return
+        tts_engine.runAndWait()
+
+    voice_queue = VoiceQueue(speak, stop=tts_engine.stop).start()
+    return tts_engine, voice_queue
+
+# Synthesis runs in a pool of worker processes so it scales with cores.
+@st.cache_resource(show_spinner=False)
+def get_audio_renderer():
+    return AudioRenderer(pool=SynthesisPool())
+
+# Threads that wait on the renderer, so file mode can render an answer's
+# sentences while the answer is still streaming.
+@st.cache_resource(show_spinner=False)
+def get_audio_executor():
+    return ThreadPoolExecutor(TTS_WORKERS, thread_name_prefix="tts")
+
+def speak_text(text, on_start=None, profile=None):
+    # Only the speaker mode speaks here; file mode renders each sentence
+    # through SentenceAudio and the whole answer in render_answer_audio.
+    if TTS_MODE == "speaker":
+        _, voice_queue = get_voice_pipeline()
+        voice_queue.put(st.session_state["session_id"], st.session_state.get("voice_turn"), text,
+                        on_start, profile or voice_profile())
+
+def stop_speaking():
+    # Silences this session's speech right away: a new question was sent or the
+    # learner has started talking (barge-in). Runs as the buttons' on_click, so
+    # before the chat is drawn. In file mode the answer's remaining sentences
+    # aren't rendered and this run leaves the player out, which stops it in the
+    # browser.
+    if TTS_MODE == "speaker":
+        _, voice_queue = get_voice_pipeline()
+        voice_queue.cancel(st.session_state["session_id"])
+    else:
+        sentence_audio = st.session_state.pop("sentence_audio", None)
+        if sentence_audio is not None:
+            sentence_audio.cancel()
+        st.session_state["audio_resume"] = {}
+        st.session_state["audio_stopped"] = True
+
+def render_answer_audio(text, profile, sentence_audio=None):
+    try:
+        with metrics.span("tts_render", chars=len(text)):
+            if sentence_audio is not None:
+                return sentence_audio.join(text)
+            return get_audio_renderer().render(text, profile)
+    except Exception as e:
+        print(f"Error rendering audio: {e}")
+        return None
+
+# Answer cache shared by every session in this process (and, via SQLite, by
+# other processes on the same machine).
+@st.cache_resource(show_spinner=False)
+def get_response_cache():
+    return ResponseCache()
+
+response_cache = get_response_cache()
+
+# Rate-limit bucket and in-flight calls, in this process or (with
+# SHIKSHA_STATE_BACKEND=sqlite) shared by every server process on the machine.
+@st.cache_resource(show_spinner=False)
+def get_shared_state():
+    return open_state()
+
+shared_state = get_shared_state()
+
+# Identical questions asked at the same moment by different sessions share one
+# upstream call.
+@st.cache_resource(show_spinner=False)
+def get_singleflight():
+    return SingleFlight(shared_state)
+
+singleflight = get_singleflight()
+
+# Every upstream chat/summary/translation call waits for a slot here, so the
+# whole process stays inside the API quota and sessions are served fairly.
+@st.cache_resource(show_spinner=False)
+def get_scheduler():
+    return Scheduler(bucket=shared_state.bucket("llm", LLM_RATE_PER_MINUTE / 60.0, LLM_BURST))
+
+scheduler = get_scheduler()
+
+# Picks a model tier per call from a local classification and rolling
+# per-model latency, error and cost stats. Cache keys keep using the
+# session's model, so cached and lesson-pack answers are found whichever
+# model served them.
+@st.cache_resource(show_spinner=False)
+def get_router():
+    return ModelRouter()
+
+router = get_router()
+
+@st.cache_resource(show_spinner=False)
+def get_conversation_log():
+    return ConversationLog()
+
+conversation_log = get_conversation_log()
+
+@st.cache_resource(show_spinner=False)
+def get_translation_memory():
+    return TranslationMemory()
+
+# Worker threads for sentence-by-sentence translation of streaming answers.
+@st.cache_resource(show_spinner=False)
+def get_translation_executor():
+    return ThreadPoolExecutor(TRANSLATION_WORKERS, thread_name_prefix="translate")
+
+# Lesson packs (python -m saathi.lessonpack build ...) are imported into the
+# answer cache, translation memory and audio cache once per server process.
+@st.cache_resource(show_spinner=False)
+def get_lesson_packs():
+    return install_all(response_cache, get_translation_memory())
+
+lesson_packs = get_lesson_packs()
+
+# The speech_recognition import, recognizer model and ambient-noise calibration
+# are only paid for once someone uses voice input, and then shared.
+@st.cache_resource(show_spinner=False)
+def get_speech_input():
+    import speech_recognition as sr
+    from saathi.speech import SpeechInput, make_backend
+    recognizer = sr.Recognizer()
+    return sr, SpeechInput(sr, recognizer, make_backend(sr, recognizer))
+
+# One pooled HTTP client per process, shared by every session.
+@st.cache_resource(show_spinner=False)
+def get_api_client():
+    return LLMClient(api_key=st.secrets["OPENAI_API_KEY"])
+
+# Offline BM25 index over the study documents (built with
+# `python -m saathi.retrieval build`). Keyed on the manifest's mtime so a
+# rebuild is picked up without restarting the server.
+@st.cache_resource(show_spinner=False, max_entries=1)
+def get_retrieval_index(manifest_mtime):
+    return RetrievalIndex()
+
+def study_notes_index():
+    manifest = os.path.join(INDEX_DIR, "manifest.json")
+    if not os.path.exists(manifest):
+        return None
+    return get_retrieval_index(os.path.getmtime(manifest))
+
+# Prometheus-style /metrics endpoint, started once per process when
+# SHIKSHA_METRICS=1.
+@st.cache_resource(show_spinner=False)
+def get_metrics_server():
+    return metrics.start_http_server()
+
+get_metrics_server()
+
+# Per-process run counter, used to tell the cold start apart from reruns.
+@st.cache_resource(show_spinner=False)
+def get_run_stats():
+    return {"runs": 0}
+
+# The stylesheet is read and minified once; each rerun only re-emits the string.
+@st.cache_data(show_spinner=False)
+def load_css():
+    with open(os.path.join(APP_DIR, "static", "style.css"), encoding="utf-8") as f:
+        css = f.read()
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    return re.sub(r"\s*([{}:;,>])\s*", r"\1", css).strip()
+
+# Bundled image variants (python -m saathi.assets build), reloaded when rebuilt.
+@st.cache_data(show_spinner=False)
+def get_asset_manifest(mtime):
+    return load_manifest()
+
+def asset_manifest():
+    path = os.path.join(IMG_DIR, "manifest.json")
+    return get_asset_manifest(os.path.getmtime(path) if os.path.exists(path) else 0)
+
+# Web font and background photo; low-bandwidth mode keeps the system font and
+# a flat background.
+@st.cache_data(show_spinner=False)
+def decor_css(manifest):
+    font_css = local_font_css() or f"@import url('{FONT_CSS_URL}');"
+    background = asset_url(manifest, "background") or ASSETS["background"]["url"]
+    css = f"{font_css}\nbody{{background:url('{background}') no-repeat center center fixed;background-size:cover;}}"
+    small = asset_url(manifest, "background", largest=False)
+    if small:
+        css += f"@media (max-width:700px){{body{{background-image:url('{small}');}}}}"
+    return css
+
+@st.cache_data(show_spinner=False)
+def card_html(picture, title, desc):
+    return f'''
+            <div class="card">
+                {picture}
+                <div class="card-title">{title}</div>
+                <div class="card-desc">{desc}</div>
+            </div>
+        '''
+
+@st.cache_data(show_spinner=False)
+def note_link_html(label, href, file_name):
+    return f'<a class="note-download" href="{html.escape(href)}" download="{file_name}" target="_blank">⬇️ Download {label}</a>'
+
+def catalog_mtime(store_dir):
+    path = os.path.join(store_dir, "catalog.json")
+    return os.path.getmtime(path) if os.path.exists(path) else 0
+
+# Reloaded when `python -m saathi.docstore prefetch` rewrites the catalog.
+@st.cache_resource(show_spinner=False, max_entries=1)
+def study_notes_store(mtime):
+    return DocStore()
+
 try:
-    openai.api_key = st.secrets["OPENAI_API_KEY"]
-    openai.api_base = "https://openrouter.ai/api/v1"
+    llm_client = get_api_client()
 except KeyError:
     st.error("API Key not found. Please add it to your secrets file.")
     st.stop()
@@ -51,11 +282,113 @@ except Exception as e:
     st.error(f"Error initializing API: {e}")
     st.stop()
 
+# Single non-streaming chat completion, used for translation and history summaries.
+# The model and session are bound up front because the call may run on a worker
+# thread (see SingleFlight) where st.session_state is not available. The router
+# picks the model actually called from the priority ("translation", "summary").
+def chat_completer(model, session_id, priority="answer"):
+    def complete(messages):
+        decision = router.route(priority, model)
+        with scheduler.slot(session_id, priority):
+            return "".join(router.stream(decision, llm_client.stream, messages))
+    return complete
+
+# Translates the answer a sentence at a time while it streams. Identical
+# sentences from sessions sharing one answer stream are translated once.
+def translation_pipeline(model, session_id):
+    complete = chat_completer(model, session_id, "translation")
+    memory = get_translation_memory()
+
+    def translate(segment):
+        return singleflight.do(make_key("translate", model, segment), lambda: memory.translate(segment, model, complete))
+    return SentencePipeline(translate, get_translation_executor())
+
+# Two learners share a flight only when the model would see exactly the same
+# messages: same history, notes and routed model, not just the same question.
+def answer_key(chat_messages, routed_model):
+    return make_key("answer", routed_model, *(f"{m['role']}:{m['content']}" for m in chat_messages))
+
+# Slot for the main answer, taken on the script thread so the learner sees
+# their place in the queue. Joining a call already in flight, in this process
+# or another one sharing the state backend, needs no slot.
+def answer_slot(flight_key, session_id, box):
+    if singleflight.in_flight(flight_key):
+        return nullcontext()
+
+    def show_wait(position, eta):
+        if position:
+            box.markdown(f'<div class="chat-ai">⏳ Many learners are asking right now. You are number {position + 1} in line (about {eta:.0f}s)...</div>', unsafe_allow_html=True)
+
+    return scheduler.slot(session_id, "answer", on_wait=show_wait)
+
+def search_study_notes(question, k=3):
+    index = study_notes_index()
+    if not index:
+        return []
+    with metrics.span("retrieval"):
+        return index.search(question, k=k)
+
+# Top passages go in as a second system message, right after the main prompt.
+def grounding_messages(notes):
+    if not notes:
+        return []
+    passages = "\n\n".join(
+        f"[{i}] ({note['title']}, page {note['page']}) {note['text'][:700]}" for i, note in enumerate(notes, 1)
+    )
+    grounding = {
+        "role": "system",
+        "content": "Here are passages from the learner's study notes. Use them if they help answer the question, "
+                   "but explain in your own simple words.\n\n" + passages,
+    }
+    return [grounding]
+
+# Appends to the durable log, then to the in-memory window, which keeps the
+# system prompt plus the newest CONVERSATION_WINDOW messages.
+def add_message(message):
+    messages = st.session_state["messages"]
+    messages.append(conversation_log.append(st.session_state["session_id"], message))
+    if len(messages) > CONVERSATION_WINDOW + 1:
+        del messages[1:len(messages) - CONVERSATION_WINDOW]
+
+def build_chat_messages(notes, summarize):
+    history = st.session_state["history_manager"]
+    grounding = grounding_messages(notes)
+    # The passages share the history's token budget.
+    payload = history.build(st.session_state["messages"], summarize, reserved=payload_tokens(grounding))
+    if history.folded:
+        conversation_log.save_history_state(st.session_state["session_id"], history.summary, history.summarized_seq)
+    return payload[:1] + grounding + payload[1:]
+
+# Used when the API can't be reached: answer straight from the best passage.
+def notes_answer(notes):
+    note = notes[0]
+    text = note["text"] if len(note["text"]) <= 600 else note["text"][:600] + "…"
+    return (
+        "Namaste, I can't reach the internet right now, but here is what your study notes say: "
+        f"{text} (from {note['title']}, page {note['page']})"
+    )
+
+def api_error_message(error):
+    if isinstance(error, QueueTimeout):
+        return "Sorry, many learners are asking right now. Please try again in a minute."
+    if isinstance(error, LLMTimeout):
+        return "Sorry, the AI is taking too long to answer. Please try again."
+    return "Sorry, an error occurred. Please try again."
+
 # --- Session State Initialization ---
+# The session id rides in the URL (?s=...), so a refresh or server restart
+# resumes the conversation from the log instead of starting over.
+if "session_id" not in st.session_state:
+    resumed_id = st.query_params.get("s", "")
+    st.session_state["session_id"] = resumed_id if re.fullmatch(r"[0-9a-f]{32}", resumed_id) else uuid.uuid4().hex
+    st.query_params["s"] = st.session_state["session_id"]
 if "openai_model" not in st.session_state:
-    st.session_state["openai_model"] = "openai/gpt-3.5-turbo"
+    st.session_state["openai_model"] = DEFAULT_MODEL
 if "messages" not in st.session_state:
-    st.session_state["messages"] = [{"role": "system", "content": "You are a helpful and simple Shiksha Saathi for rural learners. Give very short and simple answers in a friendly, conversational tone. Use analogies and simple words. Do not use any technical jargon. Always start your responses with a greeting like 'Hello friend,' or 'Namaste,'."}]
+    recent_messages = conversation_log.recent(st.session_state["session_id"])
+    st.session_state["messages"] = [{"role": "system", "content": SYSTEM_PROMPT}] + recent_messages
+    # Answers from before the refresh shouldn't start playing again.
+    st.session_state["autoplayed_audio"] = {m["audio"] for m in recent_messages if m.get("audio")}
 if "voice_search_enabled" not in st.session_state:
     st.session_state["voice_search_enabled"] = False
 if "enable_voice_out" not in st.session_state:
@@ -64,265 +397,24 @@ if "translate_to_hindi" not in st.session_state:
     st.session_state["translate_to_hindi"] = False
 if "user_input_temp" not in st.session_state:
     st.session_state["user_input_temp"] = ""
+if "history_manager" not in st.session_state:
+    st.session_state["history_manager"] = HistoryManager(**(conversation_log.history_state(st.session_state["session_id"]) or {}))
+if "autoplayed_audio" not in st.session_state:
+    st.session_state["autoplayed_audio"] = set()
+if "chat_visible" not in st.session_state:
+    st.session_state["chat_visible"] = CHAT_PAGE_SIZE
+if "low_bandwidth" not in st.session_state:
+    st.session_state["low_bandwidth"] = st.query_params.get("lite") == "1" or os.environ.get("SHIKSHA_LOW_BANDWIDTH") == "1"
+if "use_study_notes" not in st.session_state:
+    st.session_state["use_study_notes"] = True
+if "stream_responses" not in st.session_state:
+    st.session_state["stream_responses"] = True
 
 # --- CSS Styles ---
-st.markdown("""
-<style>
-@import url('https://fonts.googleapis.com/css2?family=Nunito:wght@400;700;900&display=swap');
-
-body {
-    background: url('https://images.unsplash.com/photo-1503676260728-1c00da094a0b?auto=format&fit=crop&w=1350&q=80') no-repeat center center fixed;
-    background-size: cover;
-    font-family: 'Nunito', sans-serif;
-    color: #0a2540;
-    margin: 0; padding: 0;
-}
-
-/* Navbar */
-nav {
-    background-color: rgba(255,255,255,0.95);
-    padding: 1rem 2rem;
-    box-shadow: 0 4px 7px rgba(0,0,0,0.2);
-    position: sticky;
-    top: 0;
-    z-index: 1000;
-    font-weight: 900;
-    font-size: 2rem;
-    letter-spacing: 2px;
-    text-align: center;
-    color: #0a2540;
-}
-
-/* Main container */
-.container {
-    max-width: 1100px;
-    margin: 3rem auto 5rem auto;
-    background: rgba(255,255,255,0.95);
-    padding: 40px 50px 60px 50px;
-    border-radius: 25px;
-    box-shadow: 0 10px 35px rgba(0,0,0,0.3);
-}
-
-/* Header & Subheader */
-.header {
-    font-size: 3.5rem;
-    font-weight: 900;
-    text-align: center;
-    margin-bottom: 10px;
-    color: #0a2540;
-    letter-spacing: 4px;
-    text-shadow: 1px 1px 6px #8db1e1;
-}
-.subheader {
-    font-size: 1.5rem;
-    font-weight: 600;
-    text-align: center;
-    margin-bottom: 2rem;
-    color: #1e3a8a;
-    font-style: italic;
-}
-
-/* Compact hero image */
-.intro-img {
-    display: block;
-    margin: 0 auto 3rem auto;
-    max-width: 600px;
-    width: 100%;
-    height: 250px;
-    object-fit: cover;
-    border-radius: 18px;
-    box-shadow: 0 8px 30px rgba(30,58,138,0.3);
-}
-
-/* Cards Section - HORIZONTAL ALIGNMENT */
-.card {
-    background: #e4ecfe;
-    border-radius: 20px;
-    box-shadow: 0 6px 18px rgba(0,0,0,0.15);
-    padding: 30px 25px;
-    flex-basis: 300px; 
-    flex-grow: 1; 
-    color: #0e2aad;
-    font-weight: 700;
-    transition: transform 0.3s ease;
-    display: flex;
-    flex-direction: column;
-    align-items: center;
-    text-align: center;
-    height: 100%; /* Ensures cards have equal height */
-}
-.card:hover {
-    transform: translateY(-10px);
-}
-.card img {
-    max-width: 100%;
-    border-radius: 15px;
-    margin-bottom: 15px;
-    box-shadow: 0 4px 10px rgba(0,0,0,0.1);
-}
-.card-title {
-    font-size: 1.4rem;
-    margin-bottom: 10px;
-}
-.card-desc {
-    font-weight: 500;
-    font-size: 1rem;
-    line-height: 1.4;
-}
-
-/* Chat container */
-.chat-container {
-    max-width: 900px;
-    margin: 0 auto 40px auto;
-    border-radius: 20px;
-    box-shadow: 0 10px 35px rgba(0,0,0,0.15);
-    background: #f1f7ff;
-    padding: 35px 45px 60px 45px;
-    overflow-y: auto;
-    max-height: 480px;
-}
-
-/* Chat bubbles */
-.chat-user {
-    background-color: #c4ebc7;
-    color: #065f09;
-    padding: 18px 26px;
-    border-radius: 35px 35px 0 35px;
-    margin-bottom: 18px;
-    font-size: 19px;
-    max-width: 75%;
-    box-shadow: inset 1px 1px 6px #7caf7aaa;
-    word-wrap: break-word;
-    font-weight: 600;
-    margin-left: auto;
-}
-.chat-ai {
-    background-color: #c8ddf8;
-    color: #0b3e91;
-    padding: 18px 26px;
-    border-radius: 35px 35px 35px 0;
-    margin-bottom: 18px;
-    font-size: 19px;
-    max-width: 75%;
-    box-shadow: inset 1px 1px 6px #7a8fafcc;
-    word-wrap: break-word;
-    font-weight: 600;
-}
-
-/* Input area with send button below textarea */
-.input-section {
-    max-width: 900px;
-    margin: 0 auto 50px auto;
-    display: flex;
-    flex-direction: column;
-    gap: 12px;
-}
-textarea {
-    padding: 15px 20px;
-    font-size: 18px;
-    font-family: 'Nunito', sans-serif;
-    border: 2px solid #0a2540;
-    border-radius: 20px;
-    width: 100%;
-    min-height: 90px;
-    resize: none;
-    transition: border-color 0.3s ease;
-}
-textarea:focus {
-    outline: none;
-    border-color: #1e40af;
-    box-shadow: 0 0 12px #1e40af88;
-}
-button.btn-send {
-    background-color: #1e40af;
-    color: #fff;
-    font-weight: 700;
-    font-size: 20px;
-    padding: 16px 0;
-    border: none;
-    border-radius: 20px;
-    cursor: pointer;
-    box-shadow: 0 6px 15px #1e40af66;
-    transition: background-color 0.3s ease, box-shadow 0.3s ease;
-}
-button.btn-send:hover {
-    background-color: #2c3ab1;
-    box-shadow: 0 8px 18px #2c3ab166;
-}
-button.btn-voice {
-    background-color: #22c55e;
-    color: white;
-    font-weight: 700;
-    font-size: 24px;
-    border: none;
-    border-radius: 50%;
-    width: 56px;
-    height: 56px;
-    cursor: pointer;
-    box-shadow: 0 6px 15px #22c55e66;
-    transition: background-color 0.3s ease;
-    margin-left: auto;
-}
-button.btn-voice:hover {
-    background-color: #2dd365;
-    box-shadow: 0 8px 20px #2dd36577;
-}
-
-/* Sidebar */
-.sidebar .sidebar-content {
-    background: #e4ecfe;
-    border-radius: 20px;
-    padding: 30px 35px;
-    font-weight: 700;
-    color: #0e2aad;
-    font-size: 18px;
-}
-.sidebar h3 {
-    margin-bottom: 15px;
-    font-weight: 900;
-    color: #0a1f62;
-}
-
-/* Footer */
-.footer {
-    text-align: center;
-    padding: 30px 10px;
-    font-size: 16px;
-    color: #375a9b;
-    font-weight: 600;
-    letter-spacing: 1.2px;
-    background: #e4ecfe;
-    border-top: 2px solid #0a1f62;
-    margin-top: 80px;
-}
-
-/* Responsive */
-@media (max-width: 900px) {
-    .chat-container {
-        padding: 25px 30px 40px 30px;
-    }
-    .header {
-        font-size: 2.5rem;
-    }
-    .subheader {
-        font-size: 1.2rem;
-    }
-    button.btn-voice {
-        width: 48px;
-        height: 48px;
-        font-size: 18px;
-    }
-    button.btn-send {
-        font-size: 18px;
-        padding: 14px 0;
-    }
-    .cards {
-        flex-direction: column;
-        gap: 30px;
-    }
-}
-</style>
-""", unsafe_allow_html=True)
+st.markdown(f"<style>{load_css()}</style>", unsafe_allow_html=True)
+low_bandwidth = st.session_state["low_bandwidth"]
+if not low_bandwidth:
+    st.markdown(f"<style>{decor_css(asset_manifest())}</style>", unsafe_allow_html=True)
 
 # --- Display Content and Chat History ---
 st.markdown("""<nav>Shiksha Saathi</nav>""", unsafe_allow_html=True)
@@ -330,13 +422,7 @@ with st.container():
     
     st.markdown('<h1 class="header">Shiksha Saathi 📚</h1>', unsafe_allow_html=True)
     st.markdown('<p class="subheader">Empowering Rural India through Voice-Activated Learning</p>', unsafe_allow_html=True)
-    st.image(
-        "https://www.powerschool.com/wp-content/uploads/2024/09/student-ai-literacy-blog-thumbnail-110424.jpg",
-        caption="Learn anytime, anywhere",
-        use_column_width=True,
-        clamp=True,
-        output_format="auto"
-    )
+    hero_slot = st.empty()
     st.markdown('''
         <p style="font-size:1.25rem; text-align:center; color:#0a2540;">
         Welcome to <strong>Shiksha Saathi</strong>, your voice-based companion designed for rural learners with limited literacy. 
@@ -349,35 +435,14 @@ with st.container():
     cards_col1, cards_col2, cards_col3 = st.columns(3)
     
     card_data = [
-        {"img": "https://images.unsplash.com/photo-1558261827-77136f565110?w=600&auto=format&fit=crop&q=60&ixlib=rb-4.1.0&ixid=M3wxMjA3fDB8MHxzZWFyY2h8OHx8aGluZGl8ZW58MHx8MHx8fDA%3D", "title": "Local Language Support", "desc": "Interact in your native dialect. AI adapts to your language and cultural context."},
-        {"img": "https://plus.unsplash.com/premium_photo-1678865184075-b635d6eeec78?w=600&auto=format&fit=crop&q=60&ixlib=rb-4.1.0&ixid=M3wxMjA3fDB8MHxzZWFyY2h8Nnx8U29sYXIlMjBSZWFkeXxlbnwwfHwwfHx8MA%3D%3D", "title": "Offline & Solar Ready", "desc": "Works with low connectivity and solar power to fit rural infrastructure."},
-        {"img": "https://plus.unsplash.com/premium_photo-1682092805057-14abef3fdff7?w=600&auto=format&fit=crop&q=60&ixlib=rb-4.1.0&ixid=M3wxMjA3fDB8MHxzZWFyY2h8Nnx8TGlmZSUyMHNraWxscyUyMGluZGlhfGVufDB8fDB8fDA", "title": "Practical Life Skills", "desc": "Learn health, agriculture, finance and more integrated with literacy training."},
+        {"img": "card-language", "title": "Local Language Support", "desc": "Interact in your native dialect. AI adapts to your language and cultural context."},
+        {"img": "card-solar", "title": "Offline & Solar Ready", "desc": "Works with low connectivity and solar power to fit rural infrastructure."},
+        {"img": "card-skills", "title": "Practical Life Skills", "desc": "Learn health, agriculture, finance and more integrated with literacy training."},
     ]
-
-    with cards_col1:
-        st.markdown(f'''
-            <div class="card">
-                <img src="{card_data[0]["img"]}" alt="{card_data[0]["title"]}">
-                <div class="card-title">{card_data[0]["title"]}</div>
-                <div class="card-desc">{card_data[0]["desc"]}</div>
-            </div>
-        ''', unsafe_allow_html=True)
-    with cards_col2:
-        st.markdown(f'''
-            <div class="card">
-                <img src="{card_data[1]["img"]}" alt="{card_data[1]["title"]}">
-                <div class="card-title">{card_data[1]["title"]}</div>
-                <div class="card-desc">{card_data[1]["desc"]}</div>
-            </div>
-        ''', unsafe_allow_html=True)
-    with cards_col3:
-        st.markdown(f'''
-            <div class="card">
-                <img src="{card_data[2]["img"]}" alt="{card_data[2]["title"]}">
-                <div class="card-title">{card_data[2]["title"]}</div>
-                <div class="card-desc">{card_data[2]["desc"]}</div>
-            </div>
-        ''', unsafe_allow_html=True)
+    card_slots = []
+    for card_col in (cards_col1, cards_col2, cards_col3):
+        with card_col:
+            card_slots.append(st.empty())
 
     st.markdown('</div>', unsafe_allow_html=True)
     
@@ -388,62 +453,91 @@ with st.container():
     notes_col1, notes_col2, notes_col3 = st.columns(3)
     
 
-# Farming Techniques
-with notes_col1:
-    st.markdown("### Farming Techniques")
-    st.download_button(
-        label="Download Natural Farming Manual",
-        data="https://www.agriwelfare.gov.in/Documents/HomeWhatsNew/Guideline_NMNF_V2_10022025_Revised.pdf",
-        file_name="natural-farming-manual.pdf",
-        mime="application/pdf",
-    )
-    st.download_button(
-        label="Download Organic Farming Training Manual",
-        data="https://nconf.dac.gov.in/uploads/books_manual/Comprehensive_Training_manual_Organic_Farming.pdf",
-        file_name="organic-farming-training-manual.pdf",
-        mime="application/pdf",
-    )
-
-# Basic Healthcare
-with notes_col2:
-    st.markdown("### Basic Healthcare")
-    st.download_button(
-        label="Download Introduction to Public Health (CDC)",
-        data="https://www.cdc.gov/training-publichealth101/media/pdfs/introduction-to-public-health.pdf",
-        file_name="introduction-to-public-health.pdf",
-        mime="application/pdf",
-    )
-
-# Financial Literacy
-with notes_col3:
-    st.markdown("### Financial Literacy")
-    st.download_button(
-        label="Download Financial Literacy Basics",
-        data="https://responsiblecash.org/sites/default/files/WFP%20Financial%20litteracy%205%20weeks%20training%20program%20Uganda%20%281%29.pdf",
-        file_name="financial-literacy-basics.pdf",
-        mime="application/pdf",
-    )
-    st.download_button(
-        label="Download Financial Literacy Manual",
-        data="https://agra.org/wp-content/uploads/2020/03/CARI-EA-Financial-literacy-manual.pdf",
-        file_name="financial-literacy-manual.pdf",
-        mime="application/pdf",
-    )
+# Served from the local document store when prefetched, else from the original site.
+doc_store = study_notes_store(catalog_mtime(STORE_DIR))
+for column, topic in zip((notes_col1, notes_col2, notes_col3), ("Farming Techniques", "Basic Healthcare", "Financial Literacy")):
+    with column:
+        st.markdown(f"### {topic}")
+        for doc in STUDY_NOTES:
+            if doc["topic"] == topic:
+                href = doc_store.local_url(doc["file_name"]) or doc["url"]
+                st.markdown(note_link_html(doc["label"], href, doc["file_name"]), unsafe_allow_html=True)
     st.markdown('</div>', unsafe_allow_html=True)
 
 
+# Hero image and cards. Full mode draws them here; low-bandwidth mode fills the
+# same slots only after the chat form, with lazily loaded bundled images (or
+# none if the assets haven't been built).
+def render_decor():
+    manifest = asset_manifest()
+    hero = picture_html(manifest, "hero", "Learn anytime, anywhere", "(max-width: 600px) 100vw, 600px",
+                        fallback_url=None if low_bandwidth else ASSETS["hero"]["url"], lazy=low_bandwidth, css_class="intro-img")
+    if hero:
+        hero_slot.markdown(f'<figure style="text-align:center;">{hero}<figcaption>Learn anytime, anywhere</figcaption></figure>', unsafe_allow_html=True)
+    for slot, card in zip(card_slots, card_data):
+        picture = picture_html(manifest, card["img"], card["title"], "(max-width: 900px) 100vw, 33vw",
+                               fallback_url=None if low_bandwidth else ASSETS[card["img"]]["url"], lazy=True)
+        slot.markdown(card_html(picture, card["title"], card["desc"]), unsafe_allow_html=True)
+
+if not low_bandwidth:
+    render_decor()
+
+
+# --- Chat History ---
+# Only the most recent CHAT_PAGE_SIZE messages are drawn; older ones sit behind
+# a "show earlier" button and are read from the conversation log if they have
+# already left the in-memory window. The visible window is emitted as a single markdown
+# element built from per-message HTML that is cached once a message is final,
+# and the whole thing runs as a fragment so paging does not rerun the page.
+
+@functools.lru_cache(maxsize=4096)
+def message_html(role, content):
+    css_class = "chat-user" if role == "user" else "chat-ai"
+    return f'<div class="{css_class}">{content}</div>'
+
+def show_earlier_messages():
+    st.session_state["chat_visible"] += CHAT_PAGE_SIZE
+
+@st.fragment
 def display_chat(messages):
-    for msg in [m for m in messages if m["role"] in ["user", "assistant"]]:
-        if msg["role"] == "user":
-            st.markdown(f'<div class="chat-user">{msg["content"]}</div>', unsafe_allow_html=True)
-        else:
-            st.markdown(f'<div class="chat-ai">{msg["content"]}</div>', unsafe_allow_html=True)
+    limit = st.session_state["chat_visible"]
+    visible = []
+    # Walk back from the newest message so the cost does not grow with history.
+    for msg in reversed(messages):
+        if msg["role"] in ["user", "assistant"]:
+            visible.append(msg)
+            if len(visible) > limit:
+                break
+    # Older turns aren't kept in memory; page them in from the log when asked for.
+    if len(visible) <= limit and visible and visible[-1].get("seq", 1) > 1:
+        older = conversation_log.before(st.session_state["session_id"], visible[-1]["seq"], limit + 1 - len(visible))
+        visible.extend(reversed(older))
+    if len(visible) > limit:
+        st.button("⬆️ Show earlier messages", on_click=show_earlier_messages, use_container_width=True)
+        visible = visible[:limit]
+    visible.reverse()
+
+    html = "".join(message_html(msg["role"], msg["content"]) for msg in visible)
+    st.markdown(f'<div class="chat-container">{html}</div>', unsafe_allow_html=True)
+
+    # Only the latest spoken answer gets a player.
+    latest_audio = next((msg["audio"] for msg in reversed(visible) if msg.get("audio")), None)
+    if latest_audio and os.path.exists(latest_audio) and not st.session_state.pop("audio_stopped", False):
+        # Autoplay a fresh answer once; later reruns just show the player.
+        autoplay = latest_audio not in st.session_state["autoplayed_audio"]
+        st.session_state["autoplayed_audio"].add(latest_audio)
+        start_time = 0
+        resume = st.session_state.get("audio_resume", {}).pop(latest_audio, None)
+        if autoplay and resume:
+            started, clip_length = resume
+            start_time = time.time() - started if clip_length is None else min(time.time() - started, clip_length)
+        st.audio(latest_audio, format=audio_mime(latest_audio), start_time=start_time, autoplay=autoplay)
 
 if len(st.session_state["messages"]) > 1:
-    st.markdown('<div class="chat-container">', unsafe_allow_html=True)
     display_chat(st.session_state["messages"])
-    st.markdown('</div>', unsafe_allow_html=True)
-    
+# Set by stop_speaking() for this run only, even when there was no chat to draw.
+st.session_state.pop("audio_stopped", None)
+
 with st.sidebar:
     st.markdown('<div class="sidebar"><h3>⚙️ Settings</h3></div>', unsafe_allow_html=True)
     voice_search = st.checkbox("Enable Voice Input 🎙️", value=st.session_state["voice_search_enabled"])
@@ -452,19 +546,53 @@ with st.sidebar:
     translate_to_hindi = st.checkbox("Translate to Hindi 🇮🇳", value=st.session_state["translate_to_hindi"])
     st.session_state["translate_to_hindi"] = translate_to_hindi
 
+    stream_responses = st.checkbox("Stream answers ⚡", value=st.session_state["stream_responses"], help="Show the answer word by word and start speaking after the first sentence.")
+    st.session_state["stream_responses"] = stream_responses
+    st.checkbox("Low-bandwidth mode 📶", key="low_bandwidth", help="Skip the web font and background photo, and load pictures only after the chat.")
+
+    if study_notes_index():
+        use_study_notes = st.checkbox("Use study notes 📚", value=st.session_state["use_study_notes"], help="Ground answers in the downloaded manuals, and answer from them when offline.")
+        st.session_state["use_study_notes"] = use_study_notes
+
+    cache_stats = response_cache.stats()
+    st.caption(
+        f"💾 Answer cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+        f"({cache_stats['hit_rate']:.0%}), ~{cache_stats['saved_seconds']:.0f}s and "
+        f"{cache_stats['saved_tokens']} tokens saved"
+    )
+    flight_stats = singleflight.stats()
+    shared_answers = flight_stats["coalesced"] + flight_stats["followed"]
+    if shared_answers:
+        st.caption(f"👥 {shared_answers} answers shared with other learners asking at the same time")
+    if lesson_packs:
+        st.caption("📦 Lesson packs: " + ", ".join(f"{p['name']} v{p['version']} ({p['answers']} answers)" for p in lesson_packs))
+    queue_stats = scheduler.stats()
+    if queue_stats["queued"]:
+        st.caption(f"⏳ {queue_stats['queued']} questions waiting, average wait {queue_stats['avg_wait']:.1f}s")
+    if "last_route" in st.session_state:
+        st.caption(f"🧭 Last answer: {st.session_state['last_route']}")
+    if st.session_state["translate_to_hindi"]:
+        tm_stats = get_translation_memory().stats()
+        st.caption(f"🔁 Translation memory: {tm_stats['hits']} segments reused, {tm_stats['misses']} translated")
+    run_timing_box = st.empty()
+
     st.markdown("### AI Voice Accent")
     voice_dialect = st.radio("Voice Dialect", ["American English", "British English"], index=0, label_visibility="hidden")
     st.markdown("### AI Voice Gender")
     voice_gender = st.radio("Voice Gender", ["Woman", "Man"], index=0, label_visibility="hidden")
     
 def handle_voice_input():
-    r = sr.Recognizer()
-    with st.spinner("🎤 Listening... Please speak clearly."):
+    # The last answer has already been silenced by the button (barge-in).
+    sr, speech_input = get_speech_input()
+    with st.spinner(f"🎤 Listening... Please speak clearly. ({speech_input.backend.name})"):
+        partial_box = st.empty()
         try:
-            with sr.Microphone() as source:
-                audio = r.listen(source, timeout=7, phrase_time_limit=7)
+            with metrics.span("voice_input", backend=speech_input.backend.name):
+                audio_text = speech_input.listen(
+                    on_partial=lambda text: partial_box.markdown(f'<div class="chat-user">🗣️ {text}…</div>', unsafe_allow_html=True)
+                )
+            partial_box.empty()
             st.success("🗣️ You spoke successfully! Processing your voice...")
-            audio_text = r.recognize_google(audio)
             return audio_text
         except sr.WaitTimeoutError:
             st.error("⚠️ Listening timed out. Please try again.")
@@ -482,6 +610,7 @@ with st.form(key='chat_form', clear_on_submit=True):
         voice_input_clicked = st.form_submit_button(
             "🎙️ Tap to Speak",
             help="Click and speak your input",
+            on_click=stop_speaking,
             use_container_width=True
         )
         user_text = st.text_area(
@@ -505,6 +634,7 @@ with st.form(key='chat_form', clear_on_submit=True):
         submit_clicked = st.form_submit_button(
             "➡️ Send",
             help="Send your message",
+            on_click=stop_speaking,
             use_container_width=True
         )
 
@@ -521,45 +651,259 @@ if submit_clicked or voice_input_clicked:
         st.session_state["user_input_temp"] = ""
 
     if final_prompt:
-        st.session_state.messages.append({"role": "user", "content": final_prompt})
+        # Whatever is left of the previous answer was stopped by the button;
+        # this turn's sentences supersede it in the voice queue.
+        st.session_state["voice_turn"] = uuid.uuid4().hex
+        add_message({"role": "user", "content": final_prompt})
         full_response = ""
-        
-        with st.spinner("🤖 AI is thinking..."):
+        answer_failed = False
+        voice_out = st.session_state["enable_voice_out"]
+        current_voice = voice_profile(voice_dialect, voice_gender)
+        pipeline = None
+        hindi_pieces = []
+        chat_messages = []
+
+        # Time-to-first-word and time-to-first-audio are measured from submit.
+        timings = {"submitted": time.perf_counter()}
+        st.session_state["last_timings"] = timings
+
+        def show_hindi(pieces, done=False):
+            if "first_hindi" not in timings and any(pieces):
+                timings["first_hindi"] = time.perf_counter() - timings["submitted"]
+            hindi_pieces.extend(pieces)
+            if pieces or done:
+                hindi_text = " ".join(p for p in hindi_pieces if p)
+                hindi_box.markdown(f'<div class="chat-ai"><b>Hindi Translation:</b> {hindi_text}{"" if done else "▌"}</div>', unsafe_allow_html=True)
+
+        def mark_first_audio():
+            if "first_audio" not in timings:
+                timings["first_audio"] = time.perf_counter() - timings["submitted"]
+                print(f"[timing] time_to_first_audio={timings['first_audio']:.3f}s")
+
+        # In file mode each sentence is rendered as soon as it is complete, and
+        # the first one plays while the rest of the answer is still coming.
+        sentence_audio = None
+        if voice_out and TTS_MODE == "file":
+            sentence_audio = SentenceAudio(get_audio_renderer(), current_voice, get_audio_executor())
+            st.session_state["sentence_audio"] = sentence_audio
+        first_clip = {}
+
+        def play_first_audio(wait=False):
+            if sentence_audio is None or first_clip:
+                return
+            clip = sentence_audio.first(wait)
+            if clip:
+                st.audio(clip, format=audio_mime(clip), autoplay=True)
+                first_clip.update(path=clip, started=time.time())
+                mark_first_audio()
+
+        def say(sentence):
+            speak_text(sentence, on_start=mark_first_audio, profile=current_voice)
+            if sentence_audio is not None:
+                sentence_audio.submit(sentence)
+                play_first_audio()
+
+        model = st.session_state["openai_model"]
+        session_id = st.session_state["session_id"]
+        complete_chat = chat_completer(model, session_id, "summary")
+        # The cache is keyed on the question alone, so it only serves the
+        # question that opens a conversation (lesson-pack answers included),
+        # and only stores answers that study notes didn't ground.
+        opening = (
+            not st.session_state["history_manager"].summary
+            and all(m["role"] == "system" for m in st.session_state["messages"][:-1])
+        )
+        cached_response = response_cache.get(final_prompt, SYSTEM_PROMPT, model) if opening else None
+        notes = []
+        if cached_response is None and st.session_state["use_study_notes"]:
+            notes = search_study_notes(final_prompt)
+        route = None
+        if cached_response is None:
+            route = router.route(classify(final_prompt), model)
+            st.session_state["last_route"] = f"{route.kind} → {route.model}"
+        if cached_response is not None:
+            full_response = cached_response
+            timings["first_word"] = time.perf_counter() - timings["submitted"]
+            print(f"[timing] time_to_first_word={timings['first_word']:.3f}s (cache hit)")
+            if sentence_audio is not None and get_audio_renderer().cached_path(full_response, current_voice):
+                sentence_audio = None
+            if voice_out:
+                sentences, pending = split_sentences(full_response)
+                for sentence in sentences + [pending]:
+                    if sentence.strip():
+                        say(sentence)
+        elif st.session_state["stream_responses"]:
+            chat_messages = build_chat_messages(notes, complete_chat)
+            flight_key = answer_key(chat_messages, route.model)
+            answer_box = st.empty()
+            answer_box.markdown('<div class="chat-ai">🤖 AI is thinking...</div>', unsafe_allow_html=True)
+            if st.session_state["translate_to_hindi"]:
+                pipeline = translation_pipeline(model, session_id)
+                hindi_box = st.empty()
+            pending = ""
             try:
-                response = openai.ChatCompletion.create(
-                    model=st.session_state["openai_model"],
-                    messages=[{"role": m["role"], "content": m["content"]} for m in st.session_state.messages],
-                )
-                full_response = response.choices[0].message.content
+                with answer_slot(flight_key, session_id, answer_box):
+                    for token in singleflight.stream(
+                        flight_key,
+                        lambda: router.stream(route, llm_client.stream, chat_messages),
+                    ):
+                        if "first_word" not in timings:
+                            timings["first_word"] = time.perf_counter() - timings["submitted"]
+                            print(f"[timing] time_to_first_word={timings['first_word']:.3f}s")
+                        full_response += token
+                        answer_box.markdown(f'<div class="chat-ai">{full_response}▌</div>', unsafe_allow_html=True)
+                        # Hand each finished sentence to the voice worker straight away.
+                        sentences, pending = split_sentences(pending + token)
+                        if voice_out:
+                            for sentence in sentences:
+                                say(sentence)
+                            play_first_audio()
+                        if pipeline is not None:
+                            for sentence in sentences:
+                                pipeline.submit(sentence)
+                            show_hindi(pipeline.ready())
+                if voice_out and pending.strip():
+                    say(pending)
+                if pipeline is not None and pending.strip():
+                    pipeline.submit(pending)
+                answer_box.markdown(f'<div class="chat-ai">{full_response}</div>', unsafe_allow_html=True)
             except Exception as e:
                 st.error(f"API error: {e}")
-                full_response = "Sorry, an error occurred. Please try again."
-
-        st.session_state.messages.append({"role": "assistant", "content": full_response})
-        
-        # This is the corrected voice output logic.
-        # It's better to speak whenever voice_out is enabled, regardless of input method.
-        if st.session_state["enable_voice_out"]:
-            speak_text(full_response)
+                answer_failed = True
+                if not full_response:
+                    full_response = api_error_message(e)
+        else:
+            wait_box = st.empty()
+            with st.spinner("🤖 AI is thinking..."):
+                try:
+                    chat_messages = build_chat_messages(notes, complete_chat)
+                    flight_key = answer_key(chat_messages, route.model)
+                    with answer_slot(flight_key, session_id, wait_box):
+                        full_response = singleflight.do(
+                            flight_key,
+                            lambda: "".join(router.stream(route, llm_client.stream, chat_messages)),
+                        )
+                    wait_box.empty()
+                    timings["first_word"] = time.perf_counter() - timings["submitted"]
+                    print(f"[timing] time_to_first_word={timings['first_word']:.3f}s")
+                except Exception as e:
+                    st.error(f"API error: {e}")
+                    answer_failed = True
+                    full_response = api_error_message(e)
+
+            # This is the corrected voice output logic.
+            # It's better to speak whenever voice_out is enabled, regardless of input method.
+            if voice_out:
+                sentences, pending = split_sentences(full_response)
+                for sentence in sentences + [pending]:
+                    if sentence.strip():
+                        say(sentence)
+
+        # Nothing came back from the API: fall back to the study notes if any matched.
+        answered_from_notes = answer_failed and bool(notes) and "first_word" not in timings
+        if answered_from_notes:
+            full_response = notes_answer(notes)
+
+        # Per-stage durations (seconds) for this turn, read by the benchmarks.
+        timings["answer"] = time.perf_counter() - timings["submitted"]
+        timings["cache_hit"] = cached_response is not None
+        timings["failed"] = answer_failed
+        prompt_tokens = 0 if cached_response is not None else payload_tokens(chat_messages)
+        completion_tokens = 0 if cached_response is not None else estimate_tokens(full_response)
+        metrics.observe("shiksha_stage_seconds", timings["answer"], stage="chat_completion")
+        metrics.inc("shiksha_llm_requests_total", cache="hit" if cached_response is not None else "miss")
+        metrics.inc("shiksha_llm_tokens_total", prompt_tokens, kind="prompt")
+        metrics.inc("shiksha_llm_tokens_total", completion_tokens, kind="completion")
+        if answer_failed:
+            metrics.inc("shiksha_stage_errors_total", stage="chat_completion")
+        metrics.log_event(
+            "chat_request",
+            model=route.model if route is not None else model,
+            route=route.kind if route is not None else "cache",
+            seconds=round(timings["answer"], 4),
+            first_word=round(timings.get("first_word", 0.0), 4),
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cache_hit=cached_response is not None,
+            failed=answer_failed,
+        )
+        if opening and not notes and cached_response is None and not answer_failed:
+            response_cache.put(
+                final_prompt,
+                SYSTEM_PROMPT,
+                model,
+                full_response,
+                latency=timings["answer"],
+            )
+
+        answer_message = {"role": "assistant", "content": full_response}
+        if voice_out and TTS_MODE == "file" and (not answer_failed or answered_from_notes):
+            with st.spinner("🔊 Preparing audio..."):
+                tts_started = time.perf_counter()
+                play_first_audio(wait=True)
+                audio_path = render_answer_audio(full_response, current_voice, sentence_audio)
+                timings["tts"] = time.perf_counter() - tts_started
+            if audio_path:
+                answer_message["audio"] = audio_path
+                mark_first_audio()
+                if first_clip:
+                    # The full answer picks up where the first sentence's clip
+                    # has got to when the page reruns.
+                    st.session_state["audio_resume"] = {audio_path: (first_clip["started"], audio_duration(first_clip["path"]))}
+        add_message(answer_message)
         
         if st.session_state["translate_to_hindi"]:
+            # A streamed answer has been translating sentence by sentence; this
+            # only waits for the last pieces. Otherwise the whole answer goes
+            # through the translation memory in one batch.
+            pipelined = pipeline is not None and not answer_failed
+            if pipeline is not None and not pipelined:
+                pipeline.cancel()
             with st.spinner("Translating..."):
+                translation_started = time.perf_counter()
                 try:
-                    translation_response = openai.ChatCompletion.create(
-                        model=st.session_state["openai_model"],
-                        messages=[
-                            {"role": "system", "content": "Translate the following English text to simple Hindi. Be direct and concise. Do not add any extra explanation or text. Just provide the translated text."},
-                            {"role": "user", "content": full_response}
-                        ],
-                    )
-                    hindi_translation = translation_response.choices[0].message.content
-                    st.session_state.messages.append({"role": "assistant", "content": f"**Hindi Translation:** {hindi_translation}"})
+                    if pipelined:
+                        # Pieces are spoken once the English has been queued, in order.
+                        speak_hindi = voice_out and TTS_MODE == "speaker"
+                        hindi_voice = voice_profile("Hindi", voice_gender)
+                        for piece in hindi_pieces:
+                            if speak_hindi and piece:
+                                speak_text(piece, profile=hindi_voice)
+                        for piece in pipeline.rest():
+                            show_hindi([piece])
+                            if speak_hindi and piece:
+                                speak_text(piece, profile=hindi_voice)
+                        show_hindi([], done=True)
+                        if pipeline.error is not None:
+                            raise pipeline.error
+                        hindi_translation = " ".join(p for p in hindi_pieces if p)
+                    else:
+                        hindi_translation = singleflight.do(
+                            make_key("translate", model, full_response),
+                            lambda: get_translation_memory().translate(full_response, model, chat_completer(model, session_id, "translation")),
+                        )
+                    add_message({"role": "assistant", "content": f"**Hindi Translation:** {hindi_translation}"})
                 except Exception as e:
+                    if pipelined:
+                        pipeline.cancel()
                     st.error(f"Translation error: {e}")
-                    st.session_state.messages.append({"role": "assistant", "content": "Sorry, an error occurred while translating."})
+                    add_message({"role": "assistant", "content": "Sorry, an error occurred while translating."})
+                timings["translation"] = time.perf_counter() - translation_started
+                metrics.observe("shiksha_stage_seconds", timings["translation"], stage="translation")
+                metrics.log_event(
+                    "translation",
+                    model=model,
+                    seconds=round(timings["translation"], 4),
+                    first_hindi=round(timings.get("first_hindi", 0.0), 4),
+                    chars=len(full_response),
+                    pipelined=pipelined,
+                )
         
         st.rerun()
 
+if low_bandwidth:
+    render_decor()
+
 # --- New Section for Study Documents ---
 st.markdown('<hr style="margin: 40px auto; max-width: 600px;">', unsafe_allow_html=True)
 st.markdown('<h2 style="text-align: center; color: #0a2540;">📚 Download Free Study Documents</h2>', unsafe_allow_html=True)
@@ -584,4 +928,12 @@ with notes_col3:
 st.markdown("""
 <div class="footer">
     © 2025 Shiksha Saathi — Powered by OpenAI API & pyttsx3 TTS — Designed for rural India
-</div>""", unsafe_allow_html=True)
\ No newline at end of file
+</div>""", unsafe_allow_html=True)
+
+# --- Run timing ---
+run_stats = get_run_stats()
+run_stats["runs"] += 1
+run_seconds = time.perf_counter() - RUN_STARTED
+run_kind = "cold_start" if run_stats["runs"] == 1 else "rerun"
+print(f"[timing] {run_kind}={run_seconds:.3f}s")
+run_timing_box.caption(f"⏱️ Page {run_kind.replace('_', ' ')}: {run_seconds * 1000:.0f} ms")
@@ -0,0 +1,67 @@
+import os
+import time
+import wave
+
+# Stand-in for pyttsx3 used by the benchmarks: put bench/fake_tts first on
+# sys.path and the app's TTS workers load this instead. Synthesis takes time
+# proportional to the text (SHIKSHA_FAKE_TTS_CPS characters per second) and
+# writes a short silent WAV, so the TTS stage costs something realistic without
+# needing espeak or a sound card.
+
+CHARS_PER_SECOND = float(os.environ.get("SHIKSHA_FAKE_TTS_CPS", 400))
+
+
+class Voice:
+    def __init__(self, voice_id, name, gender=None):
+        self.id = voice_id
+        self.name = name
+        self.languages = []
+        self.gender = gender
+
+
+class Engine:
+    def __init__(self):
+        self._properties = {
+            "voices": [Voice("english-us", "english-us"), Voice("english", "english")],
+            "voice": "english-us",
+            "rate": 200,
+        }
+        self._pending = []
+        self._stopped = False
+
+    def getProperty(self, name):
+        return self._properties.get(name)
+
+    def setProperty(self, name, value):
+        self._properties[name] = value
+
+    def say(self, text):
+        self._pending.append((text, None))
+
+    def save_to_file(self, text, path):
+        self._pending.append((text, path))
+
+    def runAndWait(self):
+        self._stopped = False
+        for text, path in self._pending:
+            # Sleep in slices so stop() from another thread cuts speech short.
+            finish = time.monotonic() + len(text) / CHARS_PER_SECOND
+            while not self._stopped and time.monotonic() < finish:
+                time.sleep(min(0.02, finish - time.monotonic()))
+            if self._stopped:
+                break
+            if path is not None:
+                with wave.open(path, "wb") as out:
+                    out.setnchannels(1)
+                    out.setsampwidth(2)
+                    out.setframerate(16000)
+                    out.writeframes(b"\0\0" * 1600)
+        self._pending = []
+
+    def stop(self):
+        self._stopped = True
+        self._pending = []
+
+
+def init(driverName=None, debug=False):
+    return Engine()
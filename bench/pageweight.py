@@ -0,0 +1,165 @@
+import argparse
+import gzip
+import html
+import json
+import os
+import re
+import sys
+import tempfile
+
+# --- Page-weight report ---
+# Renders the landing page with Streamlit's AppTest in full and low-bandwidth
+# mode. It adds up the bytes a first visit costs: the app's own markup and CSS
+# (sent over the websocket) plus every image, stylesheet and font they pull in.
+# Bundled files under static/ are measured on disk. Remote URLs are measured
+# with a HEAD/GET request, or reported as unmeasured when there's no network.
+# Lazily loaded images are listed separately, since they arrive only when
+# scrolled into view.
+# For <picture>/srcset the smallest candidate is counted (a small phone). The
+# Streamlit frontend bundle is the same in both modes and is cached after the
+# first visit, so it is reported on its own. Exits non-zero when a mode is over
+# its budget:
+#
+#     python -m bench.pageweight --budget-lite 100000 --out page_weight.json
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(REPO_DIR, "ai-literacy.py")
+STATIC_PREFIX = "app/static/"
+
+CSS_URL = re.compile(r"""url\(['"]?([^'")]+)['"]?\)""")
+PICTURE = re.compile(r"<picture>.*?</picture>", re.S)
+SRCSET = re.compile(r'srcset="([^"]+)"')
+
+
+def render(low_bandwidth):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=60)
+    at.secrets["OPENAI_API_KEY"] = "page-weight"
+    if low_bandwidth:
+        at.query_params["lite"] = "1"
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    return [m.value for m in at.markdown]
+
+
+def resources(markup):
+    # (url, lazy) for every resource the markup makes the browser fetch.
+    found = []
+    for picture in PICTURE.findall(markup):
+        lazy = 'loading="lazy"' in picture
+        srcsets = SRCSET.findall(picture)
+        if srcsets:
+            # Browsers take the first supported <source>; count its smallest candidate.
+            found.append((srcsets[0].split(",")[0].strip().split(" ")[0], lazy))
+    markup = PICTURE.sub("", markup)
+    for tag in re.findall(r"<img[^>]*>", markup):
+        src = re.search(r'\ssrc="([^"]+)"', tag)
+        if src:
+            found.append((src.group(1), 'loading="lazy"' in tag))
+    for url in CSS_URL.findall(markup):
+        found.append((url, False))
+    return found
+
+
+def measure(url, client):
+    if url.startswith(STATIC_PREFIX):
+        path = os.path.join(REPO_DIR, "static", url[len(STATIC_PREFIX):])
+        return os.path.getsize(path) if os.path.exists(path) else None
+    if client is None:
+        return None
+    try:
+        response = client.head(url)
+        if response.status_code < 400 and response.headers.get("content-length"):
+            return int(response.headers["content-length"])
+        response = client.get(url)
+        response.raise_for_status()
+        return len(response.content)
+    except Exception:
+        return None
+
+
+def frontend_bytes():
+    import streamlit
+
+    static_dir = os.path.join(os.path.dirname(streamlit.__file__), "static")
+    index_path = os.path.join(static_dir, "index.html")
+    with open(index_path, encoding="utf-8") as f:
+        index = f.read()
+    total = os.path.getsize(index_path)
+    for ref in re.findall(r'(?:src|href)="\.?/?([^"]+\.(?:js|css))"', index):
+        path = os.path.join(static_dir, ref)
+        if os.path.exists(path):
+            total += os.path.getsize(path)
+    return total
+
+
+def report_mode(name, markup_list, client):
+    markup = "".join(markup_list)
+    app_bytes = len(gzip.compress(markup.encode("utf-8")))
+    initial, deferred, unmeasured = [], [], []
+    for url, lazy in dict.fromkeys((html.unescape(url), lazy) for url, lazy in resources(markup)):
+        size = measure(url, client)
+        if size is None:
+            unmeasured.append(url)
+            continue
+        (deferred if lazy else initial).append({"url": url, "bytes": size})
+    initial_bytes = app_bytes + sum(r["bytes"] for r in initial)
+    return {
+        "mode": name,
+        "app_markup_bytes_gzip": app_bytes,
+        "initial_resources": initial,
+        "deferred_resources": deferred,
+        "unmeasured_resources": unmeasured,
+        "initial_bytes": initial_bytes,
+        "deferred_bytes": sum(r["bytes"] for r in deferred),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report first-load page weight in full and low-bandwidth mode.")
+    parser.add_argument("--budget-full", type=int, default=1_500_000, help="bytes allowed on a first full-mode load")
+    parser.add_argument("--budget-lite", type=int, default=100_000, help="bytes allowed on a first low-bandwidth load")
+    parser.add_argument("--offline", action="store_true", help="don't try to measure remote resources")
+    parser.add_argument("--out", default=None, help="write the report as JSON")
+    args = parser.parse_args()
+
+    sys.path.insert(0, REPO_DIR)
+    # A throwaway cache dir so the report doesn't touch the app's caches.
+    os.environ.setdefault("SHIKSHA_CACHE_DIR", tempfile.mkdtemp(prefix="shiksha-pageweight-"))
+    client = None
+    if not args.offline:
+        import httpx
+        client = httpx.Client(follow_redirects=True, timeout=5)
+
+    report = {"frontend_bundle_bytes": frontend_bytes(), "modes": []}
+    over_budget = False
+    for name, low_bandwidth, budget in (("full", False, args.budget_full), ("lite", True, args.budget_lite)):
+        mode = report_mode(name, render(low_bandwidth), client)
+        mode["budget"] = budget
+        mode["within_budget"] = mode["initial_bytes"] <= budget and not mode["unmeasured_resources"]
+        over_budget |= not mode["within_budget"]
+        report["modes"].append(mode)
+
+    print(f"Streamlit frontend bundle (first visit, cached afterwards): {report['frontend_bundle_bytes'] / 1024:,.0f} KB")
+    for mode in report["modes"]:
+        status = "OK" if mode["within_budget"] else "OVER BUDGET"
+        if mode["unmeasured_resources"]:
+            status = f"INCOMPLETE ({len(mode['unmeasured_resources'])} remote resources not measured)"
+        print(
+            f"{mode['mode']:>4}: initial {mode['initial_bytes'] / 1024:,.1f} KB "
+            f"(markup {mode['app_markup_bytes_gzip'] / 1024:,.1f} KB gzip, {len(mode['initial_resources'])} resources), "
+            f"deferred {mode['deferred_bytes'] / 1024:,.1f} KB, budget {mode['budget'] / 1024:,.0f} KB: {status}"
+        )
+        for url in mode["unmeasured_resources"]:
+            print(f"      unmeasured: {url[:100]}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if over_budget:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
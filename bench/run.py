@@ -0,0 +1,222 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# --- Ask -> answer -> speak load benchmark ---
+# Drives ai-literacy.py headlessly with Streamlit's AppTest: N simulated
+# learners in parallel threads, each typing questions and waiting for the
+# answer, against the local LLM stub (configurable latency and error rate)
+# and the fake TTS engine. All sessions share one process, like a real
+# Streamlit server, so process-wide caches, the TTS pool and single-flight
+# coalescing are exercised. Results are written as JSON for comparison
+# between releases:
+#
+#     python -m bench.run --sessions 20 --questions 3 --latency 0.8 --out bench_results.json
+#
+# --processes N splits the sessions over N server processes. They share the
+# cache directory and a SQLite state backend (SHIKSHA_STATE_BACKEND=sqlite), as
+# a multi-process deployment behind a load balancer would.
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(REPO_DIR, "ai-literacy.py")
+
+QUESTIONS = [
+    "How to open a bank account?",
+    "What is organic manure?",
+    "How do I keep drinking water clean?",
+    "What is a loan and what is interest?",
+    "How can I save seeds for next season?",
+    "Why should children get vaccines?",
+    "How do I read a electricity bill?",
+    "What is crop rotation?",
+]
+
+STAGES = ("answer", "first_word", "translation", "tts", "first_audio", "turn", "rerun")
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(values):
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": statistics.fmean(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values),
+    }
+
+
+def run_session(session_id, args, samples, errors, lock):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=args.timeout)
+    at.secrets["OPENAI_API_KEY"] = "bench"
+    at.run()
+    if args.hindi:
+        next(cb for cb in at.checkbox if "Hindi" in cb.label).check()
+        at.run()
+    for turn in range(args.questions):
+        question = QUESTIONS[(session_id * args.questions + turn) % len(QUESTIONS)]
+        started = time.perf_counter()
+        try:
+            at.text_area[0].input(question)
+            next(b for b in at.button if "Send" in b.label).click()
+            at.run()
+        except Exception as e:
+            with lock:
+                errors.append(f"session {session_id}: {e!r}")
+            continue
+        turn_seconds = time.perf_counter() - started
+        if at.exception:
+            with lock:
+                errors.append(f"session {session_id}: {at.exception[0].value}")
+        timings = dict(at.session_state["last_timings"]) if "last_timings" in at.session_state else {}
+        # A plain rerun with no new input measures per-click render overhead.
+        started = time.perf_counter()
+        at.run()
+        rerun_seconds = time.perf_counter() - started
+        with lock:
+            samples["turn"].append(turn_seconds)
+            samples["rerun"].append(rerun_seconds)
+            for stage in ("answer", "first_word", "translation", "tts", "first_audio"):
+                if isinstance(timings.get(stage), (int, float)) and not isinstance(timings.get(stage), bool):
+                    samples[stage].append(timings[stage])
+            samples["cache_hits"] += int(bool(timings.get("cache_hit")))
+            samples["failed"] += int(bool(timings.get("failed")))
+
+
+def run_sessions(args, session_ids):
+    samples = {stage: [] for stage in STAGES}
+    samples["cache_hits"] = 0
+    samples["failed"] = 0
+    errors = []
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=run_session, args=(i, args, samples, errors, lock))
+        for i in session_ids
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, errors
+
+
+def run_processes(args):
+    # Re-runs this script once per process with --worker; each writes its
+    # samples to a file that is merged here.
+    out_dir = tempfile.mkdtemp(prefix="shiksha-bench-workers-")
+    workers = []
+    for index in range(args.processes):
+        out_path = os.path.join(out_dir, f"worker-{index}.json")
+        command = [sys.executable, "-m", "bench.run", *sys.argv[1:], "--worker", str(index), "--worker-out", out_path]
+        workers.append((subprocess.Popen(command, cwd=REPO_DIR), out_path))
+    samples = {stage: [] for stage in STAGES}
+    samples["cache_hits"] = 0
+    samples["failed"] = 0
+    errors = []
+    for process, out_path in workers:
+        if process.wait() != 0 or not os.path.exists(out_path):
+            errors.append(f"worker process exited with {process.returncode}")
+            continue
+        with open(out_path, encoding="utf-8") as f:
+            result = json.load(f)
+        for stage in STAGES:
+            samples[stage].extend(result["samples"][stage])
+        samples["cache_hits"] += result["samples"]["cache_hits"]
+        samples["failed"] += result["samples"]["failed"]
+        errors.extend(result["errors"])
+    return samples, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the Shiksha Saathi ask -> answer -> speak pipeline.")
+    parser.add_argument("--sessions", type=int, default=10, help="simulated learners running in parallel")
+    parser.add_argument("--questions", type=int, default=3, help="questions asked by each learner")
+    parser.add_argument("--latency", type=float, default=0.5, help="stub LLM time to first byte, seconds")
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--tokens-per-second", type=float, default=60.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--tts-cps", type=float, default=400.0, help="fake TTS speed, characters per second")
+    parser.add_argument("--hindi", action="store_true", help="enable the Hindi translation pass")
+    parser.add_argument("--warm-cache", action="store_true", help="reuse the cache directory instead of a fresh one")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--processes", type=int, default=1, help="server processes sharing the state backend")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--worker", type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--worker-out", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.join(REPO_DIR, "bench", "fake_tts"))
+    sys.path.insert(0, REPO_DIR)
+    os.environ["SHIKSHA_FAKE_TTS_CPS"] = str(args.tts_cps)
+    if args.worker is not None:
+        # A worker process: the parent has set up the stub server and cache dir.
+        session_ids = range(args.worker, args.sessions, args.processes)
+        samples, errors = run_sessions(args, session_ids)
+        with open(args.worker_out, "w", encoding="utf-8") as f:
+            json.dump({"samples": samples, "errors": errors}, f)
+        return
+    if not args.warm_cache:
+        os.environ["SHIKSHA_CACHE_DIR"] = tempfile.mkdtemp(prefix="shiksha-bench-")
+    if args.processes > 1:
+        os.environ.setdefault("SHIKSHA_STATE_BACKEND", "sqlite")
+
+    from bench.stub_server import StubConfig, start_in_thread
+    stub_config = StubConfig(args.latency, args.jitter, args.tokens_per_second, args.error_rate)
+    server, base_url = start_in_thread(config=stub_config)
+    os.environ["SHIKSHA_LLM_BASE_URL"] = base_url
+
+    started = time.perf_counter()
+    if args.processes > 1:
+        samples, errors = run_processes(args)
+    else:
+        samples, errors = run_sessions(args, range(args.sessions))
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+
+    turns = len(samples["turn"])
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "elapsed_seconds": elapsed,
+        "turns": turns,
+        "throughput_turns_per_second": turns / elapsed if elapsed else 0.0,
+        "cache_hits": samples["cache_hits"],
+        "failed_answers": samples["failed"],
+        "upstream_requests": stub_config.requests,
+        "upstream_errors": stub_config.errors,
+        "stages": {stage: summarize(samples[stage]) for stage in STAGES},
+        "errors": errors[:50],
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"{turns} turns in {elapsed:.1f}s ({results['throughput_turns_per_second']:.2f}/s), "
+          f"{stub_config.requests} upstream requests, {len(errors)} errors")
+    for stage in STAGES:
+        stats = results["stages"][stage]
+        if stats["count"]:
+            print(f"  {stage:<12} p50={stats['p50'] * 1000:7.0f}ms  p95={stats['p95'] * 1000:7.0f}ms  p99={stats['p99'] * 1000:7.0f}ms  (n={stats['count']})")
+    print(f"Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- Local OpenAI-compatible stub ---
+# Serves /v1/chat/completions (streaming and non-streaming) with configurable
+# latency, token rate and error rate, so the LLM client, the app and the
+# benchmarks can run without network or API spend:
+#
+#     python -m bench.stub_server --port 8901 --latency 0.8 --error-rate 0.05
+#     SHIKSHA_LLM_BASE_URL=http://127.0.0.1:8901/v1 streamlit run ai-literacy.py
+#
+# Per-model overrides ("--model-latency openai/gpt-3.5-turbo=5") make it easy
+# to exercise hedging and fallback.
+
+ANSWER = (
+    "Hello friend, a bank account is like a safe box for your money. "
+    "You give the bank your money and it keeps it safe for you. "
+    "You can take it out when you need it, and the bank even adds a little extra called interest."
+)
+HINDI = "नमस्ते दोस्त, बैंक खाता आपके पैसे के लिए एक सुरक्षित डिब्बे जैसा है।"
+
+
+class StubConfig:
+    def __init__(self, latency=0.5, jitter=0.1, tokens_per_second=40.0, error_rate=0.0, error_status=503, model_latency=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.model_latency = model_latency or {}
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def count(self, error):
+        with self._lock:
+            self.requests += 1
+            self.errors += int(error)
+
+
+def reply_for(messages):
+    system = next((m["content"] for m in messages if m["role"] == "system"), "")
+    user = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+    if "numbered line" in system:
+        # Batched translation: answer every numbered line.
+        lines = [line for line in user.splitlines() if line.strip()]
+        return "\n".join(f"{line.split('.', 1)[0]}. {HINDI}" for line in lines)
+    if "Hindi" in system:
+        return HINDI
+    if "summary" in system.lower():
+        return "The learner asked about banking and farming."
+    return ANSWER
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = StubConfig()
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle(self):
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client hung up (e.g. a hedged request lost the race).
+            pass
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        config = self.config
+        model = body.get("model", "stub")
+        delay = config.model_latency.get(model, config.latency) + random.uniform(0, config.jitter)
+        failed = random.random() < config.error_rate
+        config.count(failed)
+        time.sleep(delay)
+        if failed:
+            payload = json.dumps({"error": {"message": "stub failure", "code": config.error_status}}).encode()
+            self.send_response(config.error_status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+        text = reply_for(body.get("messages", []))
+        if body.get("stream"):
+            self._stream(model, text)
+        else:
+            self._complete(model, text, body.get("messages", []))
+
+    def _complete(self, model, text, messages):
+        prompt_tokens = sum(len(m.get("content", "")) // 4 for m in messages)
+        payload = json.dumps({
+            "id": "stub",
+            "object": "chat.completion",
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(text) // 4, "total_tokens": prompt_tokens + len(text) // 4},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _stream(self, model, text):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        pause = 1.0 / self.config.tokens_per_second if self.config.tokens_per_second > 0 else 0
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            delta = {"content": word + (" " if i < len(words) - 1 else "")}
+            event = {"id": "stub", "object": "chat.completion.chunk", "model": model,
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+            self._chunk(f"data: {json.dumps(event)}\n\n".encode())
+            time.sleep(pause)
+        self._chunk(b"data: [DONE]\n\n")
+        self._chunk(b"")
+
+    def _chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+def serve(host="127.0.0.1", port=8901, config=None):
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"config": config or StubConfig()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_thread(host="127.0.0.1", port=0, config=None):
+    # port=0 picks a free port; the base URL to use is returned alongside.
+    server = serve(host, port, config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub for Shiksha Saathi.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds before the first byte")
+    parser.add_argument("--jitter", type=float, default=0.1, help="extra random latency, seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--model-latency", action="append", default=[], metavar="MODEL=SECONDS")
+    args = parser.parse_args()
+    model_latency = {}
+    for item in args.model_latency:
+        name, _, seconds = item.rpartition("=")
+        model_latency[name] = float(seconds)
+    config = StubConfig(args.latency, args.jitter, args.tokens_per_second, args.error_rate, args.error_status, model_latency)
+    server = serve(args.host, args.port, config)
+    print(f"Stub LLM listening on http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
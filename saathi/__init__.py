@@ -0,0 +1 @@
+# Backend helpers for the Shiksha Saathi Streamlit app (ai-literacy.py).
@@ -0,0 +1,188 @@
+import argparse
+import html
+import json
+import os
+import re
+
+import httpx
+
+from saathi.cache import CACHE_DIR
+
+# --- Bundled page assets ---
+# The background, hero and card photos and the Nunito web font are served
+# from static/ instead of Unsplash, PowerSchool and Google Fonts:
+#
+#     python -m saathi.assets build
+#
+# downloads each original once, resizes it to a few widths and re-encodes it as
+# WebP and (where Pillow supports it) AVIF under static/img/. It also fetches the
+# Latin subset of Nunito into static/fonts/. Commit the output. Pages use
+# <picture> with srcset so the browser picks the smallest file that fits. Until
+# the build has run, full mode falls back to the original URLs and
+# low-bandwidth mode shows no photos at all.
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMG_DIR = os.path.join(APP_DIR, "static", "img")
+FONT_DIR = os.path.join(APP_DIR, "static", "fonts")
+STATIC_URL = "app/static"
+SOURCE_DIR = os.path.join(CACHE_DIR, "assets")
+WEBP_QUALITY = int(os.environ.get("SHIKSHA_WEBP_QUALITY", 55))
+AVIF_QUALITY = int(os.environ.get("SHIKSHA_AVIF_QUALITY", 40))
+
+ASSETS = {
+    "background": {
+        "url": "https://images.unsplash.com/photo-1503676260728-1c00da094a0b?auto=format&fit=crop&w=1350&q=80",
+        "widths": (640, 1350),
+    },
+    "hero": {
+        "url": "https://www.powerschool.com/wp-content/uploads/2024/09/student-ai-literacy-blog-thumbnail-110424.jpg",
+        "widths": (360, 600),
+    },
+    "card-language": {
+        "url": "https://images.unsplash.com/photo-1558261827-77136f565110?w=600&auto=format&fit=crop&q=60&ixlib=rb-4.1.0&ixid=M3wxMjA3fDB8MHxzZWFyY2h8OHx8aGluZGl8ZW58MHx8MHx8fDA%3D",
+        "widths": (240, 480),
+    },
+    "card-solar": {
+        "url": "https://plus.unsplash.com/premium_photo-1678865184075-b635d6eeec78?w=600&auto=format&fit=crop&q=60&ixlib=rb-4.1.0&ixid=M3wxMjA3fDB8MHxzZWFyY2h8Nnx8U29sYXIlMjBSZWFkeXxlbnwwfHwwfHx8MA%3D%3D",
+        "widths": (240, 480),
+    },
+    "card-skills": {
+        "url": "https://plus.unsplash.com/premium_photo-1682092805057-14abef3fdff7?w=600&auto=format&fit=crop&q=60&ixlib=rb-4.1.0&ixid=M3wxMjA3fDB8MHxzZWFyY2h8Nnx8TGlmZSUyMHNraWxscyUyMGluZGlhfGVufDB8fDB8fDA",
+        "widths": (240, 480),
+    },
+}
+FONT_CSS_URL = "https://fonts.googleapis.com/css2?family=Nunito:wght@400;700;900&display=swap"
+# Google Fonts only serves woff2 to browsers it recognises.
+FONT_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+
+
+def load_manifest(img_dir=IMG_DIR):
+    path = os.path.join(img_dir, "manifest.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def local_font_css(font_dir=FONT_DIR):
+    # The @font-face rules for the bundled Nunito subset, or None.
+    path = os.path.join(font_dir, "nunito.css")
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def picture_html(manifest, name, alt, sizes, fallback_url=None, lazy=True, css_class=""):
+    # <picture> with AVIF/WebP srcsets for a bundled asset. Without a built
+    # asset it falls back to a plain <img> of fallback_url, or "" when there
+    # is none (low-bandwidth mode).
+    loading = ' loading="lazy" decoding="async"' if lazy else ""
+    class_attr = f' class="{css_class}"' if css_class else ""
+    alt = html.escape(alt)
+    entry = manifest.get(name)
+    if not entry:
+        if not fallback_url:
+            return ""
+        return f'<img src="{html.escape(fallback_url)}" alt="{alt}"{class_attr}{loading}>'
+    sources = []
+    for fmt in ("avif", "webp"):
+        variants = entry.get(fmt)
+        if variants:
+            srcset = ", ".join(f"{STATIC_URL}/img/{v['file']} {v['width']}w" for v in variants)
+            sources.append(f'<source type="image/{fmt}" srcset="{srcset}" sizes="{sizes}">')
+    smallest = entry["webp"][0]
+    return (
+        f'<picture>{"".join(sources)}<img src="{STATIC_URL}/img/{smallest["file"]}" alt="{alt}" '
+        f'width="{smallest["width"]}" height="{smallest["height"]}"{class_attr}{loading}></picture>'
+    )
+
+
+def asset_url(manifest, name, fmt="webp", largest=True):
+    entry = manifest.get(name)
+    if not entry or not entry.get(fmt):
+        return None
+    variant = entry[fmt][-1 if largest else 0]
+    return f"{STATIC_URL}/img/{variant['file']}"
+
+
+# --- Building ---
+
+def _fetch(client, url, path):
+    if os.path.exists(path):
+        return path
+    response = client.get(url)
+    response.raise_for_status()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        f.write(response.content)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def build_images(client, img_dir=IMG_DIR, source_dir=SOURCE_DIR, sources=None):
+    from PIL import Image, features
+
+    formats = ["webp"] + (["avif"] if features.check("avif") else [])
+    manifest = {}
+    os.makedirs(img_dir, exist_ok=True)
+    for name, spec in ASSETS.items():
+        original = (sources or {}).get(name) or _fetch(client, spec["url"], os.path.join(source_dir, name + ".orig"))
+        with Image.open(original) as image:
+            image = image.convert("RGB")
+            entry = {fmt: [] for fmt in formats}
+            for width in spec["widths"]:
+                width = min(width, image.width)
+                height = round(image.height * width / image.width)
+                resized = image.resize((width, height), Image.LANCZOS)
+                for fmt in formats:
+                    file_name = f"{name}-{width}.{fmt}"
+                    path = os.path.join(img_dir, file_name)
+                    if fmt == "webp":
+                        resized.save(path, "WEBP", quality=WEBP_QUALITY, method=6)
+                    else:
+                        resized.save(path, "AVIF", quality=AVIF_QUALITY)
+                    entry[fmt].append({"file": file_name, "width": width, "height": height, "bytes": os.path.getsize(path)})
+        manifest[name] = entry
+        sizes = ", ".join(f"{v['file']} {v['bytes'] / 1024:.0f} KB" for fmt in formats for v in entry[fmt])
+        print(f"{name}: {sizes}")
+    with open(os.path.join(img_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    return manifest
+
+
+def build_fonts(client, font_dir=FONT_DIR):
+    # Keeps only the Latin @font-face blocks; Devanagari text renders in the
+    # system font either way.
+    css = client.get(FONT_CSS_URL, headers={"User-Agent": FONT_USER_AGENT}).raise_for_status().text
+    blocks = re.findall(r"/\* ([\w-]+) \*/\s*(@font-face\s*{[^}]*})", css)
+    os.makedirs(font_dir, exist_ok=True)
+    local_css = []
+    for subset, block in blocks:
+        if subset != "latin":
+            continue
+        weight = re.search(r"font-weight:\s*(\d+)", block).group(1)
+        url = re.search(r"url\(([^)]+)\)", block).group(1)
+        file_name = f"nunito-{weight}-latin.woff2"
+        _fetch(client, url, os.path.join(font_dir, file_name))
+        local_css.append(block.replace(url, f"{STATIC_URL}/fonts/{file_name}"))
+    with open(os.path.join(font_dir, "nunito.css"), "w", encoding="utf-8") as f:
+        f.write("\n".join(local_css) + "\n")
+    print(f"Nunito: {len(local_css)} Latin font files")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bundle resized, recompressed page assets into static/.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="download, resize and re-encode the images and font")
+    build.add_argument("--no-fonts", action="store_true")
+    args = parser.parse_args()
+
+    with httpx.Client(follow_redirects=True, timeout=60) as client:
+        build_images(client)
+        if not args.no_fonts:
+            build_fonts(client)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# --- Persistent answer cache ---
+# Learners ask the same questions again and again, so answers are kept in a
+# small SQLite file shared by every session and process on this machine.
+# Entries expire after CACHE_TTL seconds and the least recently used ones are
+# evicted once the cache grows past CACHE_MAX_ENTRIES or CACHE_MAX_BYTES.
+
+CACHE_DIR = os.environ.get("SHIKSHA_CACHE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache"))
+CACHE_TTL = float(os.environ.get("SHIKSHA_CACHE_TTL", 30 * 24 * 3600))
+CACHE_MAX_ENTRIES = int(os.environ.get("SHIKSHA_CACHE_MAX_ENTRIES", 5000))
+CACHE_MAX_BYTES = int(os.environ.get("SHIKSHA_CACHE_MAX_BYTES", 50 * 1024 * 1024))
+
+
+def normalize_question(text):
+    text = text.lower().strip()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def estimate_tokens(text):
+    # Rough OpenAI-style estimate (~4 characters per token) - good enough for accounting.
+    return max(1, len(text) // 4) if text else 0
+
+
+def make_key(*parts):
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path=None, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.path = path or os.path.join(CACHE_DIR, "responses.sqlite3")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                question TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL,
+                latency REAL NOT NULL DEFAULT 0,
+                tokens INTEGER NOT NULL DEFAULT 0,
+                size INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS responses_last_access ON responses(last_access);
+            CREATE TABLE IF NOT EXISTS stats (
+                name TEXT PRIMARY KEY,
+                value REAL NOT NULL
+            );
+        """)
+        self._db.commit()
+
+    def key_for(self, question, system_prompt, model):
+        return make_key(model, system_prompt, normalize_question(question))
+
+    def get(self, question, system_prompt, model):
+        key = self.key_for(question, system_prompt, model)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response, created, latency, tokens FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[1] > self.ttl:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self._bump({"misses": 1})
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            # A hit saves the upstream round trip and the tokens it would have cost.
+            self._bump({"hits": 1, "saved_seconds": row[2], "saved_tokens": row[3]})
+            self._db.commit()
+            return row[0]
+
+    def put(self, question, system_prompt, model, response, latency=0.0, tokens=None):
+        key = self.key_for(question, system_prompt, model)
+        now = time.time()
+        if tokens is None:
+            tokens = estimate_tokens(system_prompt) + estimate_tokens(question) + estimate_tokens(response)
+        size = len(response.encode("utf-8")) + len(question.encode("utf-8"))
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, question, response, created, last_access, latency, tokens, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, model, normalize_question(question), response, now, now, latency, tokens, size),
+            )
+            self._evict(now)
+            self._db.commit()
+
+    def preload(self, entries, system_prompt, model):
+        # Bulk-load (question, response) pairs, e.g. from a lesson pack. New keys
+        # are inserted and existing ones have their age reset, so precomputed
+        # answers don't expire while the pack is installed.
+        now = time.time()
+        rows = []
+        for question, response in entries:
+            tokens = estimate_tokens(system_prompt) + estimate_tokens(question) + estimate_tokens(response)
+            size = len(response.encode("utf-8")) + len(question.encode("utf-8"))
+            rows.append((self.key_for(question, system_prompt, model), model, normalize_question(question), response, now, now, tokens, size))
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO responses (key, model, question, response, created, last_access, latency, tokens, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?) ON CONFLICT(key) DO UPDATE SET created = excluded.created",
+                rows,
+            )
+            self._evict(now)
+            self._db.commit()
+        return len(rows)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._db.execute("SELECT name, value FROM stats").fetchall())
+            entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        hits, misses = int(stats.get("hits", 0)), int(stats.get("misses", 0))
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "saved_seconds": stats.get("saved_seconds", 0.0),
+            "saved_tokens": int(stats.get("saved_tokens", 0)),
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.execute("DELETE FROM stats")
+            self._db.commit()
+
+    def _bump(self, deltas):
+        for name, delta in deltas.items():
+            self._db.execute(
+                "INSERT INTO stats (name, value) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                (name, delta),
+            )
+
+    def _evict(self, now):
+        self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if entries <= self.max_entries and size <= self.max_bytes:
+            return
+        # Walk from least recently used and drop until both caps are met again.
+        doomed = []
+        for key, entry_size in self._db.execute("SELECT key, size FROM responses ORDER BY last_access ASC"):
+            if entries <= self.max_entries and size <= self.max_bytes:
+                break
+            doomed.append((key,))
+            entries -= 1
+            size -= entry_size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", doomed)
@@ -0,0 +1,101 @@
+import os
+import sqlite3
+import threading
+import time
+
+from saathi.cache import CACHE_DIR
+
+# --- Durable conversation log ---
+# Every chat message is appended to a SQLite (WAL) log keyed by session id and
+# a per-session sequence number, so a refresh or server restart can pick the
+# conversation back up. The session only keeps the last CONVERSATION_WINDOW
+# messages in memory; older ones are read back a page at a time when the
+# learner scrolls up. Resuming reads the newest window and the saved history
+# summary through the (session, seq) primary key, so it costs the same however
+# long the conversation is.
+
+CONVERSATION_WINDOW = int(os.environ.get("SHIKSHA_CONVERSATION_WINDOW", 40))
+
+
+class ConversationLog:
+    def __init__(self, path=None):
+        self.path = path or os.path.join(CACHE_DIR, "conversations.sqlite3")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY,
+                created REAL NOT NULL,
+                updated REAL NOT NULL,
+                last_seq INTEGER NOT NULL DEFAULT 0,
+                summary TEXT NOT NULL DEFAULT '',
+                summarized_seq INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS messages (
+                session TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                audio TEXT,
+                created REAL NOT NULL,
+                PRIMARY KEY (session, seq)
+            ) WITHOUT ROWID;
+        """)
+        self._db.commit()
+
+    def append(self, session, message):
+        # Stores the message and returns it with its sequence number set.
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO sessions (id, created, updated) VALUES (?, ?, ?) ON CONFLICT(id) DO NOTHING",
+                (session, now, now),
+            )
+            self._db.execute("UPDATE sessions SET last_seq = last_seq + 1, updated = ? WHERE id = ?", (now, session))
+            seq = self._db.execute("SELECT last_seq FROM sessions WHERE id = ?", (session,)).fetchone()[0]
+            self._db.execute(
+                "INSERT INTO messages (session, seq, role, content, audio, created) VALUES (?, ?, ?, ?, ?, ?)",
+                (session, seq, message["role"], message["content"], message.get("audio"), now),
+            )
+            self._db.commit()
+        return {**message, "seq": seq}
+
+    def _rows(self, sql, params):
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        messages = []
+        for seq, role, content, audio in reversed(rows):
+            message = {"role": role, "content": content, "seq": seq}
+            if audio:
+                message["audio"] = audio
+            messages.append(message)
+        return messages
+
+    def recent(self, session, limit=CONVERSATION_WINDOW):
+        return self._rows(
+            "SELECT seq, role, content, audio FROM messages WHERE session = ? ORDER BY seq DESC LIMIT ?",
+            (session, limit),
+        )
+
+    def before(self, session, seq, limit):
+        # Up to `limit` messages older than `seq`, oldest first.
+        return self._rows(
+            "SELECT seq, role, content, audio FROM messages WHERE session = ? AND seq < ? ORDER BY seq DESC LIMIT ?",
+            (session, seq, limit),
+        )
+
+    def history_state(self, session):
+        with self._lock:
+            row = self._db.execute("SELECT summary, summarized_seq FROM sessions WHERE id = ?", (session,)).fetchone()
+        return {"summary": row[0], "summarized_seq": row[1]} if row else None
+
+    def save_history_state(self, session, summary, summarized_seq):
+        with self._lock:
+            self._db.execute(
+                "UPDATE sessions SET summary = ?, summarized_seq = ? WHERE id = ?",
+                (summary, summarized_seq, session),
+            )
+            self._db.commit()
@@ -0,0 +1,228 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+import httpx
+
+from saathi.cache import CACHE_DIR
+from saathi.llm import RETRY_STATUS, backoff_delay
+from saathi.retrieval import DOCS_DIR
+
+# --- Local study-notes store ---
+# The manuals behind the "Study Notes" buttons are mirrored into a
+# content-addressed store (.cache/store/objects/ab/abcdef..., named by SHA-256)
+# by `python -m saathi.docstore prefetch`. Downloads resume from a .part file
+# with an HTTP Range request, and a pinned checksum in STUDY_NOTES is verified
+# before anything is published. Each stored file is then hard-linked into
+# static/docs/, which Streamlit serves from disk with chunked reads (see
+# .streamlit/config.toml), and into DOCS_DIR for the retrieval index. The app
+# only reads the small catalog; it never opens a PDF itself.
+
+STORE_DIR = os.environ.get("SHIKSHA_STORE_DIR", os.path.join(CACHE_DIR, "store"))
+STATIC_DOCS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static", "docs")
+STATIC_DOCS_URL = "app/static/docs"
+FETCH_RETRIES = int(os.environ.get("SHIKSHA_FETCH_RETRIES", 4))
+CHUNK_SIZE = 1 << 16
+
+# "sha256" may be pinned once a file is known-good; a mismatch is then refused.
+STUDY_NOTES = [
+    {"topic": "Farming Techniques", "label": "Natural Farming Manual", "file_name": "natural-farming-manual.pdf",
+     "url": "https://www.agriwelfare.gov.in/Documents/HomeWhatsNew/Guideline_NMNF_V2_10022025_Revised.pdf"},
+    {"topic": "Farming Techniques", "label": "Organic Farming Training Manual", "file_name": "organic-farming-training-manual.pdf",
+     "url": "https://nconf.dac.gov.in/uploads/books_manual/Comprehensive_Training_manual_Organic_Farming.pdf"},
+    {"topic": "Basic Healthcare", "label": "Introduction to Public Health (CDC)", "file_name": "introduction-to-public-health.pdf",
+     "url": "https://www.cdc.gov/training-publichealth101/media/pdfs/introduction-to-public-health.pdf"},
+    {"topic": "Financial Literacy", "label": "Financial Literacy Basics", "file_name": "financial-literacy-basics.pdf",
+     "url": "https://responsiblecash.org/sites/default/files/WFP%20Financial%20litteracy%205%20weeks%20training%20program%20Uganda%20%281%29.pdf"},
+    {"topic": "Financial Literacy", "label": "Financial Literacy Manual", "file_name": "financial-literacy-manual.pdf",
+     "url": "https://agra.org/wp-content/uploads/2020/03/CARI-EA-Financial-literacy-manual.pdf"},
+]
+
+
+class ChecksumMismatch(Exception):
+    pass
+
+
+def sha256_of(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _link(src, dst):
+    # Hard links keep one copy on disk; fall back to copying across filesystems.
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    tmp = dst + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+class DocStore:
+    def __init__(self, store_dir=STORE_DIR, static_dir=STATIC_DOCS_DIR, docs_dir=DOCS_DIR):
+        self.store_dir = store_dir
+        self.static_dir = static_dir
+        self.docs_dir = docs_dir
+        self.catalog_path = os.path.join(store_dir, "catalog.json")
+        self._lock = threading.Lock()
+        self.catalog = {}
+        if os.path.exists(self.catalog_path):
+            with open(self.catalog_path, encoding="utf-8") as f:
+                self.catalog = json.load(f)
+
+    def object_path(self, sha):
+        return os.path.join(self.store_dir, "objects", sha[:2], sha)
+
+    def local_url(self, file_name):
+        # URL of the mirrored copy, or None if it hasn't been fetched. Only
+        # looks at the catalog and one stat() - never opens the file.
+        entry = self.catalog.get(file_name)
+        if entry and os.path.exists(os.path.join(self.static_dir, file_name)):
+            return f"{STATIC_DOCS_URL}/{file_name}"
+        return None
+
+    def _save_catalog(self):
+        os.makedirs(self.store_dir, exist_ok=True)
+        with open(self.catalog_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.catalog, f, indent=1, sort_keys=True)
+        os.replace(self.catalog_path + ".tmp", self.catalog_path)
+
+    # --- Fetching ---
+
+    def fetch(self, doc, client, force=False):
+        file_name = doc["file_name"]
+        entry = self.catalog.get(file_name)
+        if not force and entry and entry["url"] == doc["url"] and os.path.exists(self.object_path(entry["sha256"])):
+            self._publish(file_name, entry["sha256"])
+            return entry, False
+        part = os.path.join(self.store_dir, "partial", file_name + ".part")
+        os.makedirs(os.path.dirname(part), exist_ok=True)
+        for attempt in range(FETCH_RETRIES + 1):
+            try:
+                headers = self._download(doc["url"], part, client)
+                break
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                status = e.response.status_code if isinstance(e, httpx.HTTPStatusError) else None
+                if status == 416 and os.path.exists(part):
+                    # The saved part no longer lines up with the file; start over.
+                    os.remove(part)
+                if attempt == FETCH_RETRIES or (status is not None and status != 416 and status not in RETRY_STATUS):
+                    raise
+                delay = backoff_delay(attempt, base=1.0, cap=30.0)
+                print(f"{file_name}: {e}; resuming in {delay:.1f}s")
+                time.sleep(delay)
+        sha = sha256_of(part)
+        if doc.get("sha256") and doc["sha256"] != sha:
+            os.remove(part)
+            raise ChecksumMismatch(f"{file_name}: expected {doc['sha256']}, got {sha}")
+        target = self.object_path(sha)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(part, target)
+        if os.path.exists(part + ".json"):
+            os.remove(part + ".json")
+        entry = {
+            "url": doc["url"],
+            "sha256": sha,
+            "size": os.path.getsize(target),
+            "etag": headers.get("etag"),
+            "fetched_at": round(time.time()),
+        }
+        with self._lock:
+            self.catalog[file_name] = entry
+            self._save_catalog()
+        self._publish(file_name, sha)
+        return entry, True
+
+    def _download(self, url, part, client):
+        # Continues an interrupted download when the server honours Range and
+        # the file hasn't changed since (If-Range on the saved ETag).
+        meta_path = part + ".json"
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        validator = None
+        if offset and os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                validator = json.load(f).get("validator")
+        headers = {}
+        if offset and validator:
+            headers = {"Range": f"bytes={offset}-", "If-Range": validator}
+        with client.stream("GET", url, headers=headers) as response:
+            response.raise_for_status()
+            if response.status_code != 206:
+                offset = 0
+            validator = response.headers.get("etag") or response.headers.get("last-modified")
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump({"url": url, "validator": validator}, f)
+            with open(part, "r+b" if offset else "wb") as f:
+                f.seek(offset)
+                f.truncate()
+                for chunk in response.iter_bytes(CHUNK_SIZE):
+                    f.write(chunk)
+            return response.headers
+
+    def _publish(self, file_name, sha):
+        source = self.object_path(sha)
+        for directory in (self.static_dir, self.docs_dir):
+            target = os.path.join(directory, file_name)
+            if os.path.exists(target) and os.path.samefile(source, target):
+                continue
+            _link(source, target)
+
+    def prefetch(self, docs=STUDY_NOTES, force=False):
+        failed = []
+        with httpx.Client(follow_redirects=True, timeout=httpx.Timeout(60, connect=10)) as client:
+            for doc in docs:
+                try:
+                    entry, fetched = self.fetch(doc, client, force=force)
+                except Exception as e:
+                    print(f"Could not fetch {doc['file_name']}: {e}")
+                    failed.append(doc["file_name"])
+                    continue
+                state = "fetched" if fetched else "up to date"
+                print(f"{doc['file_name']}: {state} ({entry['size'] / 1e6:.1f} MB, sha256 {entry['sha256'][:12]})")
+        return failed
+
+    def verify(self):
+        # Re-hash every stored object; returns the names whose bytes changed.
+        bad = []
+        for file_name, entry in sorted(self.catalog.items()):
+            path = self.object_path(entry["sha256"])
+            if not os.path.exists(path) or sha256_of(path) != entry["sha256"]:
+                bad.append(file_name)
+        return bad
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mirror the study notes into the local document store.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    prefetch = sub.add_parser("prefetch", help="download missing or changed manuals")
+    prefetch.add_argument("--force", action="store_true", help="download again even if already stored")
+    sub.add_parser("verify", help="check stored files against their checksums")
+    args = parser.parse_args()
+
+    store = DocStore()
+    if args.command == "prefetch":
+        failed = store.prefetch(force=args.force)
+        if failed:
+            raise SystemExit(f"{len(failed)} download(s) failed; run prefetch again to resume.")
+        print("Run `python -m saathi.retrieval build` to index the notes.")
+    else:
+        bad = store.verify()
+        for file_name in bad:
+            print(f"{file_name}: checksum mismatch or missing")
+        if bad:
+            raise SystemExit(1)
+        print(f"{len(store.catalog)} documents OK.")
+
+
+if __name__ == "__main__":
+    main()
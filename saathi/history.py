@@ -0,0 +1,127 @@
+import os
+import threading
+
+from saathi.cache import estimate_tokens
+
+# --- Token-budgeted conversation history ---
+# Instead of resending the whole transcript each turn, the chat call gets the
+# system prompt, a rolling summary of older turns and the most recent turns
+# verbatim. Older turns are folded into the summary a few at a time, so each
+# summarisation call only sees the new messages plus the previous summary.
+# Progress is tracked by message sequence number ("seq", see ConversationLog),
+# so the caller may hand in just a recent window of the conversation.
+
+HISTORY_TOKEN_BUDGET = int(os.environ.get("SHIKSHA_HISTORY_TOKEN_BUDGET", 1200))
+HISTORY_RECENT_MESSAGES = int(os.environ.get("SHIKSHA_HISTORY_RECENT_MESSAGES", 6))
+HISTORY_FOLD_EVERY = int(os.environ.get("SHIKSHA_HISTORY_FOLD_EVERY", 4))
+
+TRANSLATION_PREFIX = "**Hindi Translation:**"
+TRANSLATION_ERROR = "Sorry, an error occurred while translating."
+SUMMARY_PROMPT = (
+    "You keep a short running summary of a conversation between a rural learner and "
+    "Shiksha Saathi, a friendly tutor. Update the summary with the new messages. Keep the "
+    "topics asked about and key facts given, in at most five short sentences. Reply with "
+    "the summary only."
+)
+# Per-message framing overhead in the chat format.
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def count_tokens(text):
+    # tiktoken is optional, and get_encoding() downloads its BPE file the first
+    # time. Offline or without tiktoken, fall back to the rough estimate. The
+    # lock keeps concurrent sessions from loading (or warning) more than once.
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception as e:
+                    print(f"tiktoken unavailable, estimating tokens instead: {e}")
+                    _encoding = False
+    if _encoding is False:
+        return estimate_tokens(text)
+    return len(_encoding.encode(text))
+
+
+def is_translation_echo(message):
+    content = message["content"]
+    return message["role"] == "assistant" and (content.startswith(TRANSLATION_PREFIX) or content == TRANSLATION_ERROR)
+
+
+def prompt_tokens(messages):
+    return sum(count_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+class HistoryManager:
+    def __init__(self, budget=HISTORY_TOKEN_BUDGET, recent_messages=HISTORY_RECENT_MESSAGES, fold_every=HISTORY_FOLD_EVERY,
+                 summary="", summarized_seq=0):
+        self.budget = budget
+        self.recent_messages = recent_messages
+        self.fold_every = fold_every
+        self.summary = summary
+        # Sequence number of the last message folded into the summary.
+        self.summarized_seq = summarized_seq
+        self.last_prompt_tokens = 0
+        self.folded = False
+
+    def build(self, messages, summarize, reserved=0):
+        # summarize(messages) performs one chat completion and returns its text.
+        # reserved is the tokens of anything the caller adds to the payload
+        # (study-note passages), taken out of the budget. Sets self.folded when
+        # the summary changed and is worth saving.
+        budget = self.budget - reserved
+        system = [{"role": m["role"], "content": m["content"]} for m in messages[:1] if m["role"] == "system"]
+        conversation = [
+            {"role": m["role"], "content": m["content"], "seq": m.get("seq", i)}
+            for i, m in enumerate(messages)
+            if i >= len(system) and m["role"] in ("user", "assistant") and not is_translation_echo(m)
+        ]
+        summarized = sum(1 for m in conversation if m["seq"] <= self.summarized_seq)
+        self.folded = False
+
+        # Shrink the verbatim window until it fits the budget, keeping at least the
+        # current question. Anything before the window is a candidate for folding.
+        cut = max(summarized, len(conversation) - self.recent_messages)
+        while cut < len(conversation) - 1 and prompt_tokens(system + self._summary_message() + conversation[cut:]) > budget:
+            cut += 1
+
+        pending = conversation[summarized:cut]
+        if pending and (len(pending) >= self.fold_every or prompt_tokens(system + self._summary_message() + conversation[summarized:]) > budget):
+            self._fold(pending, summarize)
+            self.summarized_seq = conversation[cut - 1]["seq"]
+            self.folded = True
+            pending = []
+
+        payload = system + self._summary_message() + [{"role": m["role"], "content": m["content"]} for m in pending + conversation[cut:]]
+        self.last_prompt_tokens = prompt_tokens(payload) + reserved
+        print(
+            f"[history] prompt_tokens={self.last_prompt_tokens} budget={self.budget} "
+            f"verbatim={len(pending) + len(conversation) - cut} summarized_seq={self.summarized_seq}"
+        )
+        return payload
+
+    def _summary_message(self):
+        if not self.summary:
+            return []
+        return [{"role": "system", "content": f"Summary of the earlier conversation: {self.summary}"}]
+
+    def _fold(self, new_messages, summarize):
+        transcript = "\n".join(
+            f"{'Learner' if m['role'] == 'user' else 'Saathi'}: {m['content']}" for m in new_messages
+        )
+        request = f"Previous summary: {self.summary or '(none)'}\n\nNew messages:\n{transcript}"
+        try:
+            self.summary = summarize([
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {"role": "user", "content": request},
+            ]).strip()
+        except Exception as e:
+            # Keep the old summary; the new messages are dropped rather than
+            # letting the payload grow past the budget.
+            print(f"Error summarizing history: {e}")
@@ -0,0 +1,281 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from saathi.cache import CACHE_DIR, ResponseCache, make_key
+from saathi.prompts import DEFAULT_MODEL, SYSTEM_PROMPT
+from saathi.text import segment_text
+from saathi.translation import TranslationMemory
+from saathi.tts import AUDIO_DIR, profile_key, voice_profile
+
+# --- Lesson packs ---
+# For villages with unreliable connectivity, answers to a curriculum of common
+# questions are generated ahead of time and shipped as a single file:
+#
+#     python -m saathi.lessonpack build curricula/basics.json
+#
+# Every question goes through the same system prompt, model, Hindi translation
+# memory and TTS renderer as the app. Calls run on a bounded thread pool behind
+# the request scheduler. Each finished question is appended to a progress
+# journal, so a build that dies half-way resumes where it stopped. The pack is a
+# zip holding a manifest (format and curriculum version), the answers, the
+# Hindi segment translations and the rendered audio. On startup the app imports
+# every pack in PACKS_DIR into its answer cache, translation memory and audio
+# cache, so those questions are answered instantly and offline.
+
+PACK_FORMAT = 1
+PACKS_DIR = os.environ.get("SHIKSHA_PACKS_DIR", os.path.join(CACHE_DIR, "packs"))
+PACK_WORKERS = int(os.environ.get("SHIKSHA_PACK_WORKERS", 4))
+TOPICS = ("farming", "health", "finance", "literacy")
+
+
+class PackError(Exception):
+    pass
+
+
+def load_curriculum(path):
+    # {"name": "...", "version": "...", "topics": {"farming": ["question", ...], ...}}
+    with open(path, encoding="utf-8") as f:
+        curriculum = json.load(f)
+    for key in ("name", "version", "topics"):
+        if key not in curriculum:
+            raise PackError(f"{path}: missing '{key}'")
+    unknown = set(curriculum["topics"]) - set(TOPICS)
+    if unknown:
+        raise PackError(f"{path}: unknown topics {sorted(unknown)}; expected some of {list(TOPICS)}")
+    return curriculum
+
+
+def question_id(question, model):
+    return make_key(model, SYSTEM_PROMPT, question.strip())[:16]
+
+
+class PackBuilder:
+    def __init__(self, client, model=DEFAULT_MODEL, hindi=True, profiles=None, workers=PACK_WORKERS,
+                 cache=None, memory=None, renderer=None, scheduler=None):
+        self.client = client
+        self.model = model
+        self.hindi = hindi
+        self.profiles = profiles or []
+        self.workers = workers
+        self.cache = cache or ResponseCache()
+        self.memory = memory or TranslationMemory()
+        self.renderer = renderer
+        self.scheduler = scheduler
+
+    def _complete(self, messages):
+        if self.scheduler is None:
+            return self.client.complete(messages, self.model)
+        with self.scheduler.slot("lesson-pack", "answer", timeout=3600):
+            return self.client.complete(messages, self.model)
+
+    def _answer(self, topic, question):
+        answer = self.cache.get(question, SYSTEM_PROMPT, self.model)
+        if answer is None:
+            answer = self._complete([
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": question},
+            ])
+            self.cache.put(question, SYSTEM_PROMPT, self.model, answer)
+        entry = {"id": question_id(question, self.model), "topic": topic, "question": question, "answer": answer}
+        if self.hindi:
+            entry["hindi"] = self.memory.translate(answer, self.model, self._complete)
+            found = self.memory.lookup(set(segment_text(answer)), self.model)
+            entry["segments"] = sorted(found.items())
+        entry["audio"] = {}
+        for profile in self.profiles:
+            path = self.renderer.render(answer, profile)
+            if path:
+                entry["audio"][profile_key(profile)] = path
+        return entry
+
+    def build(self, curriculum, out_path, journal_path, allow_partial=False):
+        done = {}
+        if os.path.exists(journal_path):
+            with open(journal_path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        done[entry["id"]] = entry
+        todo = []
+        for topic, questions in curriculum["topics"].items():
+            for question in questions:
+                if question_id(question, self.model) not in done:
+                    todo.append((topic, question))
+        total = len(done) + len(todo)
+        print(f"{len(done)} questions already done, {len(todo)} to go")
+
+        failed = []
+        os.makedirs(os.path.dirname(os.path.abspath(journal_path)), exist_ok=True)
+        with open(journal_path, "a", encoding="utf-8") as journal, ThreadPoolExecutor(self.workers) as pool:
+            futures = {pool.submit(self._answer, topic, question): question for topic, question in todo}
+            for future in as_completed(futures):
+                question = futures[future]
+                try:
+                    entry = future.result()
+                except Exception as e:
+                    print(f"Failed: {question!r}: {e}")
+                    failed.append(question)
+                    continue
+                done[entry["id"]] = entry
+                journal.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                journal.flush()
+                print(f"[{len(done)}/{total}] {entry['topic']}: {question}")
+        if failed and not allow_partial:
+            raise PackError(f"{len(failed)} questions failed; run the build again to resume")
+        write_pack(out_path, curriculum, self.model, list(done.values()), self.profiles)
+        return len(done), failed
+
+
+def write_pack(out_path, curriculum, model, entries, profiles):
+    manifest = {
+        "format": PACK_FORMAT,
+        "name": curriculum["name"],
+        "version": str(curriculum["version"]),
+        "created": round(time.time()),
+        "model": model,
+        "system_prompt_sha256": hashlib.sha256(SYSTEM_PROMPT.encode("utf-8")).hexdigest(),
+        "profiles": profiles,
+        "answers": len(entries),
+    }
+    answers = []
+    segments = {}
+    audio_files = {}
+    for entry in sorted(entries, key=lambda e: (e["topic"], e["question"])):
+        audio = {}
+        for key, path in entry.get("audio", {}).items():
+            if os.path.exists(path):
+                name = "audio/" + os.path.basename(path)
+                audio_files[name] = path
+                audio[key] = name
+        answers.append({"topic": entry["topic"], "question": entry["question"], "answer": entry["answer"],
+                        "hindi": entry.get("hindi"), "audio": audio})
+        segments.update(dict(entry.get("segments", [])))
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(suffix=".zip.tmp", dir=os.path.dirname(os.path.abspath(out_path)))
+    os.close(fd)
+    try:
+        with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=9) as pack:
+            pack.writestr("manifest.json", json.dumps(manifest, indent=1, ensure_ascii=False))
+            pack.writestr("answers.jsonl", "".join(json.dumps(a, ensure_ascii=False) + "\n" for a in answers))
+            pack.writestr("segments.jsonl", "".join(json.dumps([s, t], ensure_ascii=False) + "\n" for s, t in sorted(segments.items())))
+            for name, path in sorted(audio_files.items()):
+                # Opus/WAV audio doesn't deflate usefully.
+                pack.write(path, name, compress_type=zipfile.ZIP_STORED)
+        os.replace(tmp_path, out_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return manifest
+
+
+def read_manifest(pack):
+    manifest = json.loads(pack.read("manifest.json"))
+    if manifest.get("format") != PACK_FORMAT:
+        raise PackError(f"unsupported pack format {manifest.get('format')} (expected {PACK_FORMAT})")
+    if manifest["system_prompt_sha256"] != hashlib.sha256(SYSTEM_PROMPT.encode("utf-8")).hexdigest():
+        print(f"Lesson pack {manifest['name']} was built with a different system prompt")
+    return manifest
+
+
+def install_pack(path, cache, memory, audio_dir=AUDIO_DIR):
+    # Imports one pack into the caches; returns its manifest.
+    with zipfile.ZipFile(path) as pack:
+        manifest = read_manifest(pack)
+        model = manifest["model"]
+        answers = [json.loads(line) for line in pack.read("answers.jsonl").decode("utf-8").splitlines() if line]
+        cache.preload([(a["question"], a["answer"]) for a in answers], SYSTEM_PROMPT, model)
+        pairs = [tuple(json.loads(line)) for line in pack.read("segments.jsonl").decode("utf-8").splitlines() if line]
+        if pairs:
+            memory.store(pairs, model)
+        for name in pack.namelist():
+            if not name.startswith("audio/"):
+                continue
+            file_name = os.path.basename(name)
+            target = os.path.join(audio_dir, file_name[:2], file_name)
+            if os.path.exists(target):
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with pack.open(name) as src, open(target + ".tmp", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(target + ".tmp", target)
+    return manifest
+
+
+def install_all(cache, memory, packs_dir=PACKS_DIR, audio_dir=AUDIO_DIR):
+    installed = []
+    if not os.path.isdir(packs_dir):
+        return installed
+    for name in sorted(os.listdir(packs_dir)):
+        if not name.endswith(".zip"):
+            continue
+        try:
+            installed.append(install_pack(os.path.join(packs_dir, name), cache, memory, audio_dir))
+        except (PackError, zipfile.BadZipFile, KeyError, ValueError) as e:
+            print(f"Skipping lesson pack {name}: {e}")
+    return installed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute answers, Hindi translations and audio for a curriculum.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="build a lesson pack from a curriculum file")
+    build.add_argument("curriculum")
+    build.add_argument("-o", "--out", help="pack file (default: PACKS_DIR/<name>-<version>.zip)")
+    build.add_argument("--model", default=DEFAULT_MODEL)
+    build.add_argument("--workers", type=int, default=PACK_WORKERS, help="questions processed in parallel")
+    build.add_argument("--no-hindi", action="store_true", help="skip the Hindi translations")
+    build.add_argument("--voices", default="American English/Woman",
+                       help="comma-separated dialect/gender pairs to pre-render, or 'none'")
+    build.add_argument("--allow-partial", action="store_true", help="write the pack even if some questions failed")
+    show = sub.add_parser("show", help="print a pack's manifest")
+    show.add_argument("pack")
+    args = parser.parse_args()
+
+    if args.command == "show":
+        with zipfile.ZipFile(args.pack) as pack:
+            print(json.dumps(read_manifest(pack), indent=1, ensure_ascii=False))
+        return
+
+    from saathi.llm import LLMClient
+    from saathi.scheduler import LLM_BURST, LLM_RATE_PER_MINUTE, Scheduler
+    from saathi.state import open_state
+
+    curriculum = load_curriculum(args.curriculum)
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        raise SystemExit("Set OPENAI_API_KEY to build a lesson pack.")
+    profiles = []
+    if args.voices != "none":
+        for pair in args.voices.split(","):
+            dialect, gender = pair.split("/")
+            profiles.append(voice_profile(dialect.strip(), gender.strip()))
+    renderer = None
+    if profiles:
+        from saathi.synthesis import SynthesisPool
+        from saathi.tts import AudioRenderer
+        renderer = AudioRenderer(pool=SynthesisPool())
+    slug = f"{curriculum['name']}-{curriculum['version']}"
+    out_path = args.out or os.path.join(PACKS_DIR, slug + ".zip")
+    journal_path = os.path.join(CACHE_DIR, "pack-builds", slug + ".progress.jsonl")
+    builder = PackBuilder(LLMClient(api_key), model=args.model, hindi=not args.no_hindi, profiles=profiles,
+                          workers=args.workers, renderer=renderer,
+                          scheduler=Scheduler(bucket=open_state().bucket("llm", LLM_RATE_PER_MINUTE / 60.0, LLM_BURST)))
+    try:
+        count, failed = builder.build(curriculum, out_path, journal_path, allow_partial=args.allow_partial)
+    except PackError as e:
+        raise SystemExit(str(e))
+    finally:
+        if renderer is not None:
+            renderer.pool.close()
+    print(f"Wrote {out_path}: {count} answers" + (f", {len(failed)} failed" if failed else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+import asyncio
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+import httpx
+
+# --- Pooled LLM client ---
+# One httpx connection pool per process talks to the OpenAI-compatible chat
+# endpoint (OpenRouter by default). Every request has an overall deadline,
+# transient failures (429/5xx, dropped connections) are retried with jittered
+# exponential backoff, and if the primary model hasn't produced its first token
+# after LLM_HEDGE_AFTER seconds - or fails outright - the same request is sent
+# to LLM_FALLBACK_MODEL and whichever answers first wins. Point
+# SHIKSHA_LLM_BASE_URL at bench/stub_server.py to exercise it locally.
+
+LLM_BASE_URL = os.environ.get("SHIKSHA_LLM_BASE_URL", "https://openrouter.ai/api/v1")
+LLM_FALLBACK_MODEL = os.environ.get("SHIKSHA_LLM_FALLBACK_MODEL", "meta-llama/llama-3.1-8b-instruct")
+LLM_DEADLINE = float(os.environ.get("SHIKSHA_LLM_DEADLINE", 30))
+LLM_CONNECT_TIMEOUT = float(os.environ.get("SHIKSHA_LLM_CONNECT_TIMEOUT", 5))
+LLM_HEDGE_AFTER = float(os.environ.get("SHIKSHA_LLM_HEDGE_AFTER", 6))
+LLM_MAX_RETRIES = int(os.environ.get("SHIKSHA_LLM_MAX_RETRIES", 2))
+LLM_MAX_CONNECTIONS = int(os.environ.get("SHIKSHA_LLM_MAX_CONNECTIONS", 32))
+
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    pass
+
+
+class LLMTimeout(LLMError):
+    pass
+
+
+class _Retryable(Exception):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def backoff_delay(attempt, retry_after=None, base=0.5, cap=8.0):
+    # "Full jitter": a random delay up to the exponential bound, so a burst of
+    # clients that failed together doesn't retry together.
+    if retry_after is not None:
+        return min(cap, retry_after)
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _check_status(response):
+    if response.status_code in RETRY_STATUS:
+        raise _Retryable(f"HTTP {response.status_code}", _retry_after(response))
+    if response.status_code >= 400:
+        raise LLMError(f"HTTP {response.status_code}: {response.text[:300]}")
+
+
+def _parse_sse_line(line):
+    # Returns the content delta of one server-sent event line, "" for events
+    # without content and None at the end of the stream.
+    if not line.startswith("data:"):
+        return ""
+    data = line[5:].strip()
+    if data == "[DONE]":
+        return None
+    choices = json.loads(data).get("choices") or [{}]
+    return (choices[0].get("delta") or {}).get("content") or ""
+
+
+class LLMClient:
+    def __init__(self, api_key, base_url=LLM_BASE_URL, fallback_model=LLM_FALLBACK_MODEL, deadline=LLM_DEADLINE,
+                 hedge_after=LLM_HEDGE_AFTER, max_retries=LLM_MAX_RETRIES):
+        self.base_url = base_url.rstrip("/")
+        self.fallback_model = fallback_model
+        self.deadline = deadline
+        self.hedge_after = hedge_after
+        self.max_retries = max_retries
+        self._headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+        self._limits = httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS // 2)
+        self._http = httpx.Client(base_url=self.base_url, headers=self._headers, limits=self._limits)
+        # httpx async clients are bound to one event loop.
+        self._async_clients = {}
+        # Updated from the hedge threads as well as the caller's.
+        self._stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "hedged": 0, "fallback_wins": 0, "timeouts": 0, "errors": 0}
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    # --- Sync API ---
+
+    def complete(self, messages, model, deadline=None, on_model=None):
+        return "".join(self.stream(messages, model, deadline=deadline, on_model=on_model))
+
+    def stream(self, messages, model, deadline=None, on_model=None):
+        # Yields content tokens. The primary and (if hedged) fallback attempts run
+        # in threads; the first one to produce a token is followed to the end and
+        # the other is cancelled. on_model(model) is told which model that was.
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        events = queue.Queue()
+        cancels = []
+        models = [model] + ([self.fallback_model] if self.fallback_model and self.fallback_model != model else [])
+        self._count("requests")
+
+        def start(attempt):
+            cancel = threading.Event()
+            cancels.append(cancel)
+
+            def run():
+                try:
+                    for token in self._stream_once(messages, models[attempt], deadline_at, cancel):
+                        events.put((attempt, "token", token))
+                    events.put((attempt, "done", None))
+                except Exception as e:
+                    events.put((attempt, "error", e))
+
+            threading.Thread(target=run, daemon=True).start()
+
+        start(0)
+        hedge_at = time.monotonic() + self.hedge_after
+        chosen = None
+        failed = {}
+        try:
+            while True:
+                now = time.monotonic()
+                can_hedge = chosen is None and len(cancels) < len(models)
+                wait = (min(hedge_at, deadline_at) if can_hedge else deadline_at) - now
+                try:
+                    attempt, kind, payload = events.get(timeout=max(0.0, wait))
+                except queue.Empty:
+                    if can_hedge and time.monotonic() < deadline_at:
+                        self._count("hedged")
+                        start(len(cancels))
+                        continue
+                    self._count("timeouts")
+                    raise LLMTimeout(f"No answer from {model} within {deadline or self.deadline:.0f}s")
+                if chosen is not None and attempt != chosen:
+                    continue
+                if kind == "error":
+                    if chosen is not None:
+                        self._count("errors")
+                        raise payload
+                    failed[attempt] = payload
+                    if len(cancels) < len(models):
+                        self._count("hedged")
+                        start(len(cancels))
+                    elif len(failed) == len(cancels):
+                        self._count("errors")
+                        raise failed[0] if isinstance(failed[0], LLMError) else LLMError(str(failed[0]))
+                    continue
+                if chosen is None:
+                    chosen = attempt
+                    if attempt > 0:
+                        self._count("fallback_wins")
+                    if on_model is not None:
+                        on_model(models[attempt])
+                    for i, cancel in enumerate(cancels):
+                        if i != attempt:
+                            cancel.set()
+                if kind == "done":
+                    return
+                yield payload
+        finally:
+            for cancel in cancels:
+                cancel.set()
+
+    def _stream_once(self, messages, model, deadline_at, cancel):
+        payload = {"model": model, "messages": messages, "stream": True}
+        for attempt in range(self.max_retries + 1):
+            produced = False
+            try:
+                remaining = deadline_at - time.monotonic()
+                if remaining <= 0:
+                    raise LLMTimeout(f"Deadline passed before calling {model}")
+                timeout = httpx.Timeout(remaining, connect=min(LLM_CONNECT_TIMEOUT, remaining))
+                with self._http.stream("POST", "/chat/completions", json=payload, timeout=timeout) as response:
+                    if response.status_code >= 400:
+                        response.read()
+                    _check_status(response)
+                    for line in response.iter_lines():
+                        if cancel.is_set():
+                            return
+                        if time.monotonic() > deadline_at:
+                            raise LLMTimeout(f"{model} exceeded the deadline mid-answer")
+                        token = _parse_sse_line(line)
+                        if token is None:
+                            return
+                        if token:
+                            produced = True
+                            yield token
+                    return
+            except (_Retryable, httpx.TransportError) as e:
+                # Once tokens have been shown, a retry would duplicate them.
+                if produced or attempt == self.max_retries or cancel.is_set():
+                    raise LLMError(f"{model}: {e}") from e
+                delay = backoff_delay(attempt, getattr(e, "retry_after", None))
+                if time.monotonic() + delay >= deadline_at:
+                    raise LLMTimeout(f"{model}: {e} (no time left to retry)") from e
+                self._count("retries")
+                if cancel.wait(delay):
+                    return
+
+    # --- Async API ---
+
+    def _async_http(self):
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(base_url=self.base_url, headers=self._headers, limits=self._limits)
+            self._async_clients[loop] = client
+        return client
+
+    async def acomplete(self, messages, model, deadline=None):
+        # Hedged like stream(): the fallback starts after hedge_after seconds or
+        # as soon as the primary fails, and the first success wins.
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        models = [model] + ([self.fallback_model] if self.fallback_model and self.fallback_model != model else [])
+        self._count("requests")
+        tasks = {}
+        errors = []
+
+        def launch():
+            attempt = len(errors) + len(tasks)
+            tasks[asyncio.ensure_future(self._acomplete_once(messages, models[attempt], deadline_at))] = attempt
+
+        launch()
+        try:
+            while tasks:
+                can_hedge = len(errors) + len(tasks) < len(models)
+                wait_until = min(time.monotonic() + self.hedge_after, deadline_at) if can_hedge else deadline_at
+                done, _ = await asyncio.wait(tasks, timeout=max(0.0, wait_until - time.monotonic()), return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if can_hedge and time.monotonic() < deadline_at:
+                        self._count("hedged")
+                        launch()
+                        continue
+                    self._count("timeouts")
+                    raise LLMTimeout(f"No answer from {model} within {deadline or self.deadline:.0f}s")
+                for task in done:
+                    attempt = tasks.pop(task)
+                    if task.exception() is None:
+                        if attempt > 0:
+                            self._count("fallback_wins")
+                        return task.result()
+                    errors.append(task.exception())
+                if len(errors) + len(tasks) < len(models):
+                    self._count("hedged")
+                    launch()
+            self._count("errors")
+            raise errors[0] if isinstance(errors[0], LLMError) else LLMError(str(errors[0]))
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _acomplete_once(self, messages, model, deadline_at):
+        payload = {"model": model, "messages": messages}
+        for attempt in range(self.max_retries + 1):
+            try:
+                remaining = deadline_at - time.monotonic()
+                if remaining <= 0:
+                    raise LLMTimeout(f"Deadline passed before calling {model}")
+                timeout = httpx.Timeout(remaining, connect=min(LLM_CONNECT_TIMEOUT, remaining))
+                response = await self._async_http().post("/chat/completions", json=payload, timeout=timeout)
+                _check_status(response)
+                return response.json()["choices"][0]["message"]["content"]
+            except (_Retryable, httpx.TransportError) as e:
+                if attempt == self.max_retries:
+                    raise LLMError(f"{model}: {e}") from e
+                delay = backoff_delay(attempt, getattr(e, "retry_after", None))
+                if time.monotonic() + delay >= deadline_at:
+                    raise LLMTimeout(f"{model}: {e} (no time left to retry)") from e
+                self._count("retries")
+                await asyncio.sleep(delay)
+
+    def close(self):
+        self._http.close()
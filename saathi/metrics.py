@@ -0,0 +1,202 @@
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- Per-stage timing and metrics ---
+# Spans time each stage of a turn (voice input, chat completion, translation,
+# voice queue wait, synthesis) and counters/gauges track tokens and queue
+# depth. Everything is kept in-process and exported two ways: one JSON log
+# line per span/event on the "shiksha.metrics" logger, and Prometheus text
+# format on http://127.0.0.1:SHIKSHA_METRICS_PORT/metrics.
+#
+# Metrics are off unless SHIKSHA_METRICS=1; when off, every call returns
+# immediately (span() hands back a shared no-op context manager).
+
+METRICS_ENABLED = os.environ.get("SHIKSHA_METRICS", "0") == "1"
+METRICS_HOST = os.environ.get("SHIKSHA_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("SHIKSHA_METRICS_PORT", 9464))
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+logger = logging.getLogger("shiksha.metrics")
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_histograms = {}
+_help = {
+    "shiksha_stage_seconds": "Duration of each pipeline stage.",
+    "shiksha_stage_errors_total": "Stages that ended with an exception.",
+    "shiksha_llm_tokens_total": "Prompt and completion tokens sent to or received from the LLM.",
+    "shiksha_llm_requests_total": "Chat requests, by whether they were served from the cache.",
+    "shiksha_voice_queue_depth": "Items waiting in the voice worker queue.",
+    "shiksha_voice_queue_wait_seconds": "Time a voice item waited in the queue before being spoken.",
+    "shiksha_voice_dropped_total": "Voice items dropped before being spoken, by reason (overflow, superseded, cancelled).",
+    "shiksha_voice_interrupted_total": "Sentences cut off mid-speech by a newer turn, a new question or barge-in.",
+    "shiksha_tts_pool_queued": "Synthesis jobs waiting for a TTS worker process.",
+    "shiksha_tts_pool_busy": "TTS worker processes currently synthesising.",
+    "shiksha_llm_queue_depth": "LLM requests waiting for a scheduler slot.",
+    "shiksha_llm_in_flight": "LLM requests holding a scheduler slot.",
+    "shiksha_llm_queue_wait_seconds": "Time an LLM request waited for a scheduler slot.",
+}
+
+
+def enabled():
+    return METRICS_ENABLED
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    if not METRICS_ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(name, value, **labels):
+    if not METRICS_ENABLED:
+        return
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def observe(name, value, **labels):
+    if not METRICS_ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                histogram["buckets"][i] += 1
+        histogram["sum"] += value
+        histogram["count"] += 1
+
+
+def log_event(event, **fields):
+    if not METRICS_ENABLED:
+        return
+    logger.info(json.dumps({"event": event, "ts": round(time.time(), 3), **fields}, ensure_ascii=False, default=str))
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **fields):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    def __init__(self, stage, fields):
+        self.stage = stage
+        self.fields = fields
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.started
+        observe("shiksha_stage_seconds", seconds, stage=self.stage)
+        if exc_type is not None:
+            inc("shiksha_stage_errors_total", stage=self.stage)
+        log_event("span", stage=self.stage, seconds=round(seconds, 4), error=exc_type.__name__ if exc_type else None, **self.fields)
+        return False
+
+    def set(self, **fields):
+        # Attach extra fields (token counts, cache hit, ...) to the span's log line.
+        self.fields.update(fields)
+
+
+def span(stage, **fields):
+    if not METRICS_ENABLED:
+        return _NOOP_SPAN
+    return _Span(stage, fields)
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v)}"'.replace("\n", " ") for k, v in labels) + "}"
+
+
+def render_prometheus():
+    lines = []
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        histograms = {k: {"buckets": list(v["buckets"]), "sum": v["sum"], "count": v["count"]} for k, v in _histograms.items()}
+    seen = set()
+
+    def header(name, kind):
+        if name not in seen:
+            seen.add(name)
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), value in sorted(counters.items()):
+        header(name, "counter")
+        lines.append(f"{name}{_labels(labels)} {value}")
+    for (name, labels), value in sorted(gauges.items()):
+        header(name, "gauge")
+        lines.append(f"{name}{_labels(labels)} {value}")
+    for (name, labels), histogram in sorted(histograms.items()):
+        header(name, "histogram")
+        for bound, count in zip(BUCKETS, histogram["buckets"]):
+            lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {count}")
+        lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {histogram['count']}")
+        lines.append(f"{name}_sum{_labels(labels)} {histogram['sum']}")
+        lines.append(f"{name}_count{_labels(labels)} {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_http_server(host=METRICS_HOST, port=METRICS_PORT):
+    if not METRICS_ENABLED:
+        return None
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        # Another server process on this machine already owns the port.
+        print(f"Metrics endpoint not started on {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
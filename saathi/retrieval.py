@@ -0,0 +1,305 @@
+import argparse
+import array
+import hashlib
+import json
+import math
+import mmap
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+
+from saathi.cache import CACHE_DIR
+
+# --- Offline retrieval over the study documents ---
+# The farming, health and finance manuals are split into overlapping chunks
+# and indexed into a BM25 lexical index on disk. The index is a list of
+# immutable segments; each build only extracts and indexes documents that are
+# new or changed since the last one (changed or removed documents are marked
+# dead in the manifest), so adding a manual doesn't force a full rebuild.
+# Postings, chunk lengths and chunk texts are flat binary files that are
+# memory-mapped on load, so opening the index costs little more than reading
+# the per-segment term dictionaries.
+#
+#     python -m saathi.retrieval build .cache/docs
+#     python -m saathi.retrieval search "how to make compost"
+
+DOCS_DIR = os.environ.get("SHIKSHA_DOCS_DIR", os.path.join(CACHE_DIR, "docs"))
+INDEX_DIR = os.environ.get("SHIKSHA_INDEX_DIR", os.path.join(CACHE_DIR, "index"))
+CHUNK_WORDS = 120
+CHUNK_OVERLAP = 30
+BM25_K1 = 1.2
+BM25_B = 0.75
+INDEX_VERSION = 1
+
+STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from has have how i if in into is it its me my of on or our
+so than that the their them then there these they this to was we were what when where which who why will
+with you your
+""".split())
+TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return [t for t in TOKEN.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def extract_pages(path):
+    # Returns a list of page texts. PDFs need pypdf; plain text is one page.
+    if path.lower().endswith(".pdf"):
+        from pypdf import PdfReader
+        reader = PdfReader(path)
+        return [page.extract_text() or "" for page in reader.pages]
+    with open(path, encoding="utf-8", errors="ignore") as f:
+        return [f.read()]
+
+
+def chunk_pages(pages, size=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    # Overlapping word windows, remembering the page each chunk starts on.
+    words = []
+    for page_number, text in enumerate(pages, 1):
+        words.extend((word, page_number) for word in text.split())
+    step = size - overlap
+    for start in range(0, max(1, len(words) - overlap), step):
+        window = words[start:start + size]
+        if window:
+            yield " ".join(w for w, _ in window), window[0][1]
+
+
+class _Segment:
+    def __init__(self, index_dir, meta):
+        self.meta = meta
+        base = os.path.join(index_dir, meta["name"])
+        with open(base + ".lex.json", encoding="utf-8") as f:
+            self.lexicon = json.load(f)
+        self._files = []
+        self.postings = self._map(base + ".post", "I")
+        self.lengths = self._map(base + ".len", "I")
+        self.doc_of = self._map(base + ".doc", "I")
+        self.offsets = self._map(base + ".off", "Q")
+        self.text = self._map(base + ".txt", None)
+
+    def _map(self, path, typecode):
+        f = open(path, "rb")
+        self._files.append(f)
+        if os.fstat(f.fileno()).st_size == 0:
+            return memoryview(b"").cast(typecode) if typecode else b""
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._files.append(mapped)
+        return memoryview(mapped).cast(typecode) if typecode else mapped
+
+    def chunk_text(self, chunk_id):
+        return bytes(self.text[self.offsets[chunk_id]:self.offsets[chunk_id + 1]]).decode("utf-8")
+
+    def close(self):
+        for handle in reversed(self._files):
+            try:
+                handle.close()
+            except (BufferError, ValueError):
+                pass
+
+
+class RetrievalIndex:
+    def __init__(self, index_dir=INDEX_DIR):
+        self.index_dir = index_dir
+        self._lock = threading.Lock()
+        self.manifest = {"version": INDEX_VERSION, "segments": []}
+        self.segments = []
+        manifest_path = os.path.join(index_dir, "manifest.json")
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                self.manifest = json.load(f)
+            self.segments = [_Segment(index_dir, meta) for meta in self.manifest["segments"]]
+        self._refresh_stats()
+
+    def _refresh_stats(self):
+        live = [doc for seg in self.manifest["segments"] for doc in seg["docs"] if doc["live"]]
+        self.live_chunks = sum(doc["chunks"] for doc in live)
+        self.avg_length = (sum(doc["tokens"] for doc in live) / self.live_chunks) if self.live_chunks else 0.0
+
+    def __bool__(self):
+        return self.live_chunks > 0
+
+    # --- Building ---
+
+    def build(self, paths):
+        # Index new or changed documents into one new segment; returns the
+        # number of documents (re)indexed.
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                for root, _, names in os.walk(path):
+                    files.extend(os.path.join(root, n) for n in sorted(names) if n.lower().endswith((".pdf", ".txt", ".md")))
+            elif os.path.isfile(path):
+                files.append(path)
+        known = {}
+        for seg in self.manifest["segments"]:
+            for doc in seg["docs"]:
+                if doc["live"]:
+                    known[doc["path"]] = doc
+        seen = set()
+        todo = []
+        for path in files:
+            key = os.path.abspath(path)
+            seen.add(key)
+            sha = file_sha256(path)
+            if key in known and known[key]["sha256"] == sha:
+                continue
+            todo.append((key, sha))
+        changed = {key for key, _ in todo}
+        for key, doc in known.items():
+            # Changed documents are re-added below; removed ones just die.
+            if key not in seen or key in changed:
+                doc["live"] = False
+        if todo:
+            self._write_segment(todo)
+        self._save_manifest()
+        return len(todo)
+
+    def _write_segment(self, todo):
+        os.makedirs(self.index_dir, exist_ok=True)
+        name = f"seg-{len(self.manifest['segments']) + 1:04d}-{os.urandom(3).hex()}"
+        base = os.path.join(self.index_dir, name)
+        postings = defaultdict(list)
+        lengths = array.array("I")
+        doc_of = array.array("I")
+        offsets = array.array("Q", [0])
+        docs = []
+        with open(base + ".txt", "wb") as text_file:
+            for path, sha in todo:
+                try:
+                    pages = extract_pages(path)
+                except Exception as e:
+                    print(f"Skipping {path}: {e}")
+                    continue
+                doc_index = len(docs)
+                chunks = tokens = 0
+                for text, page in chunk_pages(pages):
+                    terms = tokenize(text)
+                    if not terms:
+                        continue
+                    chunk_id = len(lengths)
+                    for term, tf in Counter(terms).items():
+                        postings[term].append((chunk_id, tf))
+                    lengths.append(len(terms))
+                    doc_of.append(doc_index)
+                    encoded = json.dumps({"text": text, "page": page}, ensure_ascii=False).encode("utf-8")
+                    text_file.write(encoded)
+                    offsets.append(offsets[-1] + len(encoded))
+                    chunks += 1
+                    tokens += len(terms)
+                docs.append({
+                    "path": path,
+                    "title": os.path.splitext(os.path.basename(path))[0].replace("-", " ").replace("_", " "),
+                    "sha256": sha,
+                    "chunks": chunks,
+                    "tokens": tokens,
+                    "live": True,
+                })
+        lexicon = {}
+        flat = array.array("I")
+        for term in sorted(postings):
+            lexicon[term] = [len(flat) // 2, len(postings[term])]
+            for chunk_id, tf in postings[term]:
+                flat.append(chunk_id)
+                flat.append(tf)
+        for suffix, data in ((".post", flat), (".len", lengths), (".doc", doc_of), (".off", offsets)):
+            with open(base + suffix, "wb") as f:
+                data.tofile(f)
+        with open(base + ".lex.json", "w", encoding="utf-8") as f:
+            json.dump(lexicon, f, separators=(",", ":"))
+        meta = {"name": name, "docs": docs}
+        self.manifest["segments"].append(meta)
+        self.segments.append(_Segment(self.index_dir, meta))
+
+    def _save_manifest(self):
+        os.makedirs(self.index_dir, exist_ok=True)
+        path = os.path.join(self.index_dir, "manifest.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(path + ".tmp", path)
+        self._refresh_stats()
+
+    # --- Searching ---
+
+    def search(self, query, k=3):
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.live_chunks:
+            return []
+        with self._lock:
+            # Document frequency over live chunks only, so dead documents don't
+            # skew the weights.
+            matches = {}
+            for term in terms:
+                term_matches = []
+                for seg_index, seg in enumerate(self.segments):
+                    entry = seg.lexicon.get(term)
+                    if entry is None:
+                        continue
+                    docs = seg.meta["docs"]
+                    start, count = entry
+                    for i in range(start, start + count):
+                        chunk_id = seg.postings[2 * i]
+                        if docs[seg.doc_of[chunk_id]]["live"]:
+                            term_matches.append((seg_index, chunk_id, seg.postings[2 * i + 1]))
+                matches[term] = term_matches
+            scores = defaultdict(float)
+            for term, term_matches in matches.items():
+                df = len(term_matches)
+                if not df:
+                    continue
+                idf = math.log(1 + (self.live_chunks - df + 0.5) / (df + 0.5))
+                for seg_index, chunk_id, tf in term_matches:
+                    length = self.segments[seg_index].lengths[chunk_id]
+                    norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / (self.avg_length or 1))
+                    scores[(seg_index, chunk_id)] += idf * tf * (BM25_K1 + 1) / norm
+            top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+            results = []
+            for (seg_index, chunk_id), score in top:
+                seg = self.segments[seg_index]
+                chunk = json.loads(seg.chunk_text(chunk_id))
+                doc = seg.meta["docs"][seg.doc_of[chunk_id]]
+                results.append({"text": chunk["text"], "page": chunk["page"], "title": doc["title"], "source": doc["path"], "score": score})
+            return results
+
+    def close(self):
+        for seg in self.segments:
+            seg.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the offline study-document index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="index new or changed documents")
+    build.add_argument("paths", nargs="*", default=[DOCS_DIR])
+    build.add_argument("--index", default=INDEX_DIR)
+    build.add_argument("--rebuild", action="store_true", help="drop the existing index first")
+    search = sub.add_parser("search", help="show the best matching passages")
+    search.add_argument("query")
+    search.add_argument("-k", type=int, default=3)
+    search.add_argument("--index", default=INDEX_DIR)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        if args.rebuild and os.path.isdir(args.index):
+            for name in os.listdir(args.index):
+                os.remove(os.path.join(args.index, name))
+        index = RetrievalIndex(args.index)
+        added = index.build(args.paths)
+        print(f"Indexed {added} new or changed documents; {index.live_chunks} live chunks.")
+    else:
+        index = RetrievalIndex(args.index)
+        for hit in index.search(args.query, k=args.k):
+            print(f"[{hit['score']:.2f}] {hit['title']} (p. {hit['page']})\n    {hit['text'][:300]}\n")
+
+
+if __name__ == "__main__":
+    main()
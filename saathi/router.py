@@ -0,0 +1,249 @@
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import threading
+import time
+from collections import deque
+
+from saathi.cache import CACHE_DIR, estimate_tokens
+from saathi.prompts import DEFAULT_MODEL
+
+# --- Adaptive model routing ---
+# Each LLM call is classified on this machine, without a model call. Greetings
+# and short factual questions, translations and history summaries go to a
+# cheap, fast tier. Open-ended "why/how/explain" questions go to the standard
+# tier. A tier may list several models. The router keeps a rolling window of
+# latency, errors and token cost per model, and picks the cheapest-and-fastest
+# healthy one. If every model in a tier is failing, the call moves to the other
+# tier. Every routed call is appended to a JSONL decision log:
+#
+#     python -m saathi.router report
+#
+# prints p50 latency, error rate and spend per class and model. It compares
+# the spend with sending everything to DEFAULT_MODEL.
+
+ROUTING_ENABLED = os.environ.get("SHIKSHA_ROUTING", "1") == "1"
+TIER_MODELS = {
+    "fast": os.environ.get("SHIKSHA_MODEL_FAST", "meta-llama/llama-3.1-8b-instruct").split(","),
+    "standard": os.environ.get("SHIKSHA_MODEL_STANDARD", DEFAULT_MODEL).split(","),
+}
+CLASS_TIERS = {"short": "fast", "translation": "fast", "summary": "fast", "explain": "standard"}
+# USD per million prompt / completion tokens.
+MODEL_PRICES = {
+    "openai/gpt-3.5-turbo": (0.50, 1.50),
+    "meta-llama/llama-3.1-8b-instruct": (0.02, 0.05),
+}
+MODEL_PRICES.update({model: tuple(prices) for model, prices in json.loads(os.environ.get("SHIKSHA_MODEL_PRICES", "{}")).items()})
+ROUTER_WINDOW = int(os.environ.get("SHIKSHA_ROUTER_WINDOW", 50))
+ROUTER_MIN_SAMPLES = int(os.environ.get("SHIKSHA_ROUTER_MIN_SAMPLES", 5))
+ROUTER_MAX_ERROR_RATE = float(os.environ.get("SHIKSHA_ROUTER_MAX_ERROR_RATE", 0.25))
+# An unhealthy model gets one probe call after this many seconds without traffic.
+ROUTER_PROBE_AFTER = float(os.environ.get("SHIKSHA_ROUTER_PROBE_AFTER", 30))
+# Seconds of p50 latency one US cent per call is worth when comparing models.
+ROUTER_COST_WEIGHT = float(os.environ.get("SHIKSHA_ROUTER_COST_WEIGHT", 1.0))
+ROUTER_LOG = os.environ.get("SHIKSHA_ROUTER_LOG", os.path.join(CACHE_DIR, "routing.jsonl"))
+
+GREETING_ONLY = re.compile(r"^\W*(hello|hi|hey|namaste|namaskar|thanks|thank you|good (morning|evening|night)|ok|okay|bye)\b[\w\s]{0,15}\W*$", re.IGNORECASE)
+TRANSLATE_ASK = re.compile(r"\b(translate|in hindi|hindi (mein|me|word|for)|meaning of)\b", re.IGNORECASE)
+EXPLAIN_ASK = re.compile(r"\b(why|how (do|does|can|to|should|is|are)|explain|difference|compare|steps?|describe|tell me about|what happens|should i|help me)\b", re.IGNORECASE)
+SHORT_WORDS = 12
+
+
+def classify(text):
+    # "short", "translation" or "explain" for a learner's question.
+    text = text.strip()
+    if GREETING_ONLY.match(text):
+        return "short"
+    if TRANSLATE_ASK.search(text):
+        return "translation"
+    if EXPLAIN_ASK.search(text) or len(text.split()) > SHORT_WORDS:
+        return "explain"
+    return "short"
+
+
+def call_cost(model, prompt_tokens, completion_tokens):
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+class Decision:
+    def __init__(self, kind, tier, model, reason):
+        self.kind = kind
+        self.tier = tier
+        self.model = model
+        self.reason = reason
+        self.started = time.perf_counter()
+
+
+class ModelStats:
+    def __init__(self, window=ROUTER_WINDOW):
+        self.calls = deque(maxlen=window)  # (latency, ok, cost)
+        self.last_call = 0.0
+
+    def add(self, latency, ok, cost):
+        self.calls.append((latency, ok, cost))
+        self.last_call = time.monotonic()
+
+    def summary(self):
+        if not self.calls:
+            return {"samples": 0, "p50": 0.0, "error_rate": 0.0, "avg_cost": 0.0, "idle": float("inf")}
+        latencies = [latency for latency, ok, _ in self.calls if ok]
+        return {
+            "samples": len(self.calls),
+            "p50": statistics.median(latencies) if latencies else 0.0,
+            "error_rate": sum(1 for _, ok, _ in self.calls if not ok) / len(self.calls),
+            "avg_cost": sum(cost for _, _, cost in self.calls) / len(self.calls),
+            "idle": time.monotonic() - self.last_call,
+        }
+
+
+class ModelRouter:
+    def __init__(self, tiers=None, class_tiers=None, log_path=ROUTER_LOG, enabled=ROUTING_ENABLED):
+        self.tiers = tiers or TIER_MODELS
+        self.class_tiers = class_tiers or CLASS_TIERS
+        self.log_path = log_path
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _score(self, summary):
+        # Models without enough samples score 0 so each one gets tried.
+        if summary["samples"] < ROUTER_MIN_SAMPLES:
+            return 0.0
+        return summary["p50"] + ROUTER_COST_WEIGHT * summary["avg_cost"] * 100
+
+    def _healthy(self, summary):
+        return (summary["samples"] < ROUTER_MIN_SAMPLES or summary["error_rate"] <= ROUTER_MAX_ERROR_RATE
+                or summary["idle"] >= ROUTER_PROBE_AFTER)
+
+    def route(self, kind, default_model):
+        if not self.enabled:
+            return Decision(kind, "default", default_model, "routing off")
+        preferred = self.class_tiers.get(kind, "standard")
+        order = [preferred] + [tier for tier in self.tiers if tier != preferred]
+        with self._lock:
+            for tier in order:
+                summaries = {model: self._summary(model) for model in self.tiers[tier]}
+                healthy = [model for model in self.tiers[tier] if self._healthy(summaries[model])]
+                if healthy:
+                    model = min(healthy, key=lambda m: self._score(summaries[m]))
+                    reason = "preferred tier" if tier == preferred else f"{preferred} tier unhealthy"
+                    if summaries[model]["error_rate"] > ROUTER_MAX_ERROR_RATE and summaries[model]["samples"] >= ROUTER_MIN_SAMPLES:
+                        # Probing: mark the call so the next one doesn't probe too.
+                        self._stats[model].last_call = time.monotonic()
+                        reason = "probe"
+                    return Decision(kind, tier, model, reason)
+        return Decision(kind, "default", default_model, "no healthy model")
+
+    def _summary(self, model):
+        stats = self._stats.get(model)
+        return stats.summary() if stats else ModelStats().summary()
+
+    def record(self, decision, ok, prompt_tokens=0, completion_tokens=0, latency=None, model=None):
+        # Feeds one finished call back into the stats and the decision log.
+        # model is the one that actually answered, if a fallback won.
+        latency = time.perf_counter() - decision.started if latency is None else latency
+        model = model or decision.model
+        cost = call_cost(model, prompt_tokens, completion_tokens)
+        with self._lock:
+            self._stats.setdefault(model, ModelStats()).add(latency, ok, cost)
+            entry = {
+                "ts": round(time.time(), 3),
+                "class": decision.kind,
+                "tier": decision.tier,
+                "model": model,
+                "reason": decision.reason,
+                "latency": round(latency, 4),
+                "ok": ok,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "cost": round(cost, 8),
+                "baseline_cost": round(call_cost(DEFAULT_MODEL, prompt_tokens, completion_tokens), 8),
+            }
+            if self.log_path:
+                try:
+                    os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+                    with open(self.log_path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(entry) + "\n")
+                except OSError as e:
+                    print(f"Router: could not write decision log: {e}")
+        return entry
+
+    def stream(self, decision, open_stream, messages):
+        # Yields the tokens of open_stream(messages, model, on_model=...) and
+        # records the call once it ends. Latency covers only the call itself
+        # (not queueing or the work before it), and the call is credited to
+        # the model that answered. Only the process making the upstream call
+        # should go through here, so coalesced callers aren't counted twice.
+        prompt_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+        answered = {}
+        reply = []
+        started = time.perf_counter()
+        try:
+            for token in open_stream(messages, decision.model, on_model=lambda model: answered.update(model=model)):
+                reply.append(token)
+                yield token
+        except Exception:
+            self.record(decision, False, prompt_tokens, latency=time.perf_counter() - started, model=answered.get("model"))
+            raise
+        self.record(decision, True, prompt_tokens, estimate_tokens("".join(reply)),
+                    latency=time.perf_counter() - started, model=answered.get("model"))
+
+    def stats(self):
+        with self._lock:
+            return {model: stats.summary() for model, stats in self._stats.items()}
+
+
+def report(log_path=ROUTER_LOG):
+    groups = {}
+    with open(log_path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                groups.setdefault((entry["class"], entry["model"]), []).append(entry)
+    rows = []
+    for (kind, model), entries in sorted(groups.items()):
+        latencies = [e["latency"] for e in entries if e["ok"]]
+        rows.append({
+            "class": kind,
+            "model": model,
+            "calls": len(entries),
+            "p50": statistics.median(latencies) if latencies else None,
+            "error_rate": sum(1 for e in entries if not e["ok"]) / len(entries),
+            "spend": sum(e["cost"] for e in entries),
+            "baseline_spend": sum(e["baseline_cost"] for e in entries),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarise the model router's decision log.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rep = sub.add_parser("report", help="p50 latency, error rate and spend per class and model")
+    rep.add_argument("--log", default=ROUTER_LOG)
+    sub.add_parser("classify", help="classify questions read from stdin, one per line")
+    args = parser.parse_args()
+
+    if args.command == "classify":
+        for line in sys.stdin:
+            if line.strip():
+                print(f"{classify(line):<12} {line.strip()}")
+        return
+    if not os.path.exists(args.log):
+        raise SystemExit(f"No decision log at {args.log}")
+    rows = report(args.log)
+    for row in rows:
+        p50 = f"{row['p50'] * 1000:7.0f}ms" if row["p50"] is not None else "      n/a"
+        print(f"{row['class']:<12} {row['model']:<40} {row['calls']:>6} calls  p50 {p50}  "
+              f"errors {row['error_rate']:5.1%}  spend ${row['spend']:.4f}")
+    spend = sum(row["spend"] for row in rows)
+    baseline = sum(row["baseline_spend"] for row in rows)
+    saved = f" ({1 - spend / baseline:.0%} less)" if baseline else ""
+    print(f"Total spend ${spend:.4f} vs ${baseline:.4f} with everything on {DEFAULT_MODEL}{saved}")
+
+
+if __name__ == "__main__":
+    main()
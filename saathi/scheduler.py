@@ -0,0 +1,221 @@
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from saathi import metrics
+
+# --- Admission control for upstream LLM calls ---
+# Every chat, summary and translation request takes a slot from one
+# process-wide scheduler before it goes upstream. A token bucket keeps the
+# request rate within the API quota (LLM_RATE_PER_MINUTE, with bursts of up to
+# LLM_BURST) and LLM_MAX_IN_FLIGHT caps concurrent calls. Waiting requests are
+# queued per priority level (answers before translations) and, within a
+# level, per session and served round-robin, so one learner firing off many
+# questions can't starve the rest of the class.
+#
+# The clock is injectable: with a fake clock, submit() tickets and call
+# dispatch() after moving the clock to step the scheduler deterministically.
+# So is the bucket: the app passes one from saathi.state, which several server
+# processes can share.
+
+LLM_RATE_PER_MINUTE = float(os.environ.get("SHIKSHA_LLM_RATE_PER_MINUTE", 60))
+LLM_BURST = int(os.environ.get("SHIKSHA_LLM_BURST", 10))
+LLM_MAX_IN_FLIGHT = int(os.environ.get("SHIKSHA_LLM_MAX_IN_FLIGHT", 16))
+QUEUE_TIMEOUT = float(os.environ.get("SHIKSHA_QUEUE_TIMEOUT", 60))
+
+PRIORITIES = {"answer": 0, "summary": 0, "translation": 1}
+
+
+class QueueTimeout(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = burst
+        self.clock = clock
+        self.tokens = float(burst)
+        self.updated = clock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now=None):
+        self._refill(self.clock() if now is None else now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self, needed=1, now=None):
+        # Seconds until `needed` tokens will be available.
+        self._refill(self.clock() if now is None else now)
+        return max(0.0, (needed - self.tokens) / self.rate)
+
+
+class Ticket:
+    def __init__(self, session, priority, seq, now):
+        self.session = session
+        self.priority = priority
+        self.level = PRIORITIES[priority]
+        self.seq = seq
+        self.enqueued_at = now
+        self.granted_at = None
+
+    @property
+    def granted(self):
+        return self.granted_at is not None
+
+
+class Scheduler:
+    def __init__(self, rate_per_minute=LLM_RATE_PER_MINUTE, burst=LLM_BURST, max_in_flight=LLM_MAX_IN_FLIGHT,
+                 clock=time.monotonic, bucket=None):
+        self.clock = clock
+        self.bucket = bucket or TokenBucket(rate_per_minute / 60.0, burst, clock)
+        self.max_in_flight = max_in_flight
+        self._cond = threading.Condition()
+        # One OrderedDict per priority level: session -> deque of tickets. The
+        # dict order is the round-robin order; a served session moves to the end.
+        self._levels = [OrderedDict() for _ in range(max(PRIORITIES.values()) + 1)]
+        self._seq = itertools.count()
+        self.in_flight = 0
+        self.granted = 0
+        self.timed_out = 0
+        self.total_wait = 0.0
+
+    def submit(self, session, priority="answer"):
+        with self._cond:
+            ticket = Ticket(session, priority, next(self._seq), self.clock())
+            self._levels[ticket.level].setdefault(session, deque()).append(ticket)
+            self._dispatch()
+            return ticket
+
+    def dispatch(self):
+        with self._cond:
+            self._dispatch()
+
+    def _dispatch(self):
+        granted = False
+        while self.in_flight < self.max_in_flight:
+            level = next((queues for queues in self._levels if queues), None)
+            if level is None or not self.bucket.take():
+                break
+            session, queue = next(iter(level.items()))
+            ticket = queue.popleft()
+            if queue:
+                level.move_to_end(session)
+            else:
+                del level[session]
+            ticket.granted_at = self.clock()
+            self.in_flight += 1
+            self.granted += 1
+            self.total_wait += ticket.granted_at - ticket.enqueued_at
+            metrics.observe("shiksha_llm_queue_wait_seconds", ticket.granted_at - ticket.enqueued_at, priority=ticket.priority)
+            granted = True
+        metrics.set_gauge("shiksha_llm_queue_depth", self._queued())
+        metrics.set_gauge("shiksha_llm_in_flight", self.in_flight)
+        if granted:
+            self._cond.notify_all()
+
+    def _queued(self):
+        return sum(len(queue) for level in self._levels for queue in level.values())
+
+    def position(self, ticket):
+        # Requests that will be granted before this one if nothing else arrives.
+        with self._cond:
+            if ticket.granted:
+                return 0
+            ahead = sum(len(queue) for level in self._levels[:ticket.level] for queue in level.values())
+            level = self._levels[ticket.level]
+            queue = level.get(ticket.session)
+            if queue is None or ticket not in queue:
+                return 0
+            rounds = queue.index(ticket)
+            before = True
+            for session, other in level.items():
+                if session == ticket.session:
+                    before = False
+                    continue
+                ahead += min(len(other), rounds + (1 if before else 0))
+            return ahead + rounds
+
+    def eta(self, ticket):
+        # Estimated seconds until the ticket is granted, from the refill rate.
+        position = self.position(ticket)
+        with self._cond:
+            return self.bucket.wait_time(position + 1)
+
+    def wait(self, ticket, timeout=QUEUE_TIMEOUT, on_wait=None):
+        # Blocks until the ticket is granted. on_wait(position, eta) is called
+        # from the waiting thread whenever the position changes.
+        deadline = self.clock() + timeout
+        last_position = None
+        while True:
+            with self._cond:
+                self._dispatch()
+                if ticket.granted:
+                    return
+                now = self.clock()
+                if now >= deadline:
+                    self._remove(ticket)
+                    self.timed_out += 1
+                    raise QueueTimeout(f"Still waiting for an LLM slot after {timeout:.0f}s")
+            position = self.position(ticket)
+            if on_wait is not None and position != last_position:
+                last_position = position
+                on_wait(position, self.eta(ticket))
+            with self._cond:
+                if not ticket.granted:
+                    # A release() or refill wakes us; at the concurrency cap only a release can.
+                    refill = 0.5 if self.in_flight >= self.max_in_flight else max(0.01, self.bucket.wait_time())
+                    self._cond.wait(min(0.5, refill, max(0.0, deadline - now)))
+
+    def release(self, ticket):
+        with self._cond:
+            self.in_flight -= 1
+            self._dispatch()
+
+    def _remove(self, ticket):
+        level = self._levels[ticket.level]
+        queue = level.get(ticket.session)
+        if queue is not None and ticket in queue:
+            queue.remove(ticket)
+            if not queue:
+                del level[ticket.session]
+
+    def cancel(self, ticket):
+        with self._cond:
+            self._remove(ticket)
+            metrics.set_gauge("shiksha_llm_queue_depth", self._queued())
+
+    @contextmanager
+    def slot(self, session, priority="answer", timeout=QUEUE_TIMEOUT, on_wait=None):
+        ticket = self.submit(session, priority)
+        try:
+            self.wait(ticket, timeout=timeout, on_wait=on_wait)
+        except BaseException:
+            # Granted just as the wait was interrupted: hand the slot back.
+            if ticket.granted:
+                self.release(ticket)
+            else:
+                self.cancel(ticket)
+            raise
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queued": self._queued(),
+                "in_flight": self.in_flight,
+                "granted": self.granted,
+                "timed_out": self.timed_out,
+                "avg_wait": self.total_wait / self.granted if self.granted else 0.0,
+            }
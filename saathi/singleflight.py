@@ -0,0 +1,138 @@
+import threading
+
+from saathi.state import FlightAbandoned, LocalState
+
+# --- Single-flight request coalescing ---
+# When many learners ask the same thing at once (a teacher's prompt in a
+# classroom), only the first request goes upstream; the others attach to the
+# call already in flight and share its result. Streamed answers are buffered
+# so a late joiner first replays the tokens seen so far and then follows live.
+# With a shared state backend (saathi.state) the same happens across server
+# processes: one process makes the call and the others follow its tokens.
+
+
+class _Flight:
+    def __init__(self):
+        self.tokens = []
+        self.done = False
+        self.error = None
+        self.cond = threading.Condition()
+
+    def publish(self, token):
+        with self.cond:
+            self.tokens.append(token)
+            self.cond.notify_all()
+
+    def finish(self, error=None):
+        with self.cond:
+            self.done = True
+            self.error = error
+            self.cond.notify_all()
+
+    def follow(self):
+        index = 0
+        while True:
+            with self.cond:
+                while index >= len(self.tokens) and not self.done:
+                    self.cond.wait()
+                pending = self.tokens[index:]
+                index = len(self.tokens)
+                done, error = self.done, self.error
+            yield from pending
+            if done and index >= len(self.tokens):
+                if error is not None:
+                    raise error
+                return
+
+
+class SingleFlight:
+    def __init__(self, state=None):
+        self.state = state or LocalState()
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.upstream = 0
+        self.coalesced = 0
+        self.followed = 0
+
+    def _join(self, key, start):
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                return flight
+            flight = self._flights[key] = _Flight()
+            self.upstream += 1
+
+        def run():
+            try:
+                start(flight)
+                flight.finish()
+            except Exception as e:
+                flight.finish(e)
+            finally:
+                with self._lock:
+                    if self._flights.get(key) is flight:
+                        del self._flights[key]
+
+        # The upstream call runs on its own thread so it keeps going even if the
+        # session that started it goes away.
+        threading.Thread(target=run, daemon=True).start()
+        return flight
+
+    def _shared(self, key, open_stream):
+        # Leads the call for key across processes, or follows the process that
+        # does. A follower takes over if the leader dies before its first token.
+        while not self.state.claim(key):
+            followed = False
+            try:
+                for token in self.state.follow(key):
+                    if not followed:
+                        followed = True
+                        with self._lock:
+                            self.followed += 1
+                    yield token
+                return
+            except FlightAbandoned:
+                if followed:
+                    raise
+        publisher = self.state.lead(key)
+        try:
+            for token in open_stream():
+                publisher.publish(token)
+                yield token
+        except Exception as e:
+            publisher.finish(e)
+            raise
+        publisher.finish()
+
+    def stream(self, key, open_stream):
+        # open_stream() returns an iterator of tokens; it is only called once per
+        # key while a call is in flight.
+        def start(flight):
+            for token in self._shared(key, open_stream):
+                flight.publish(token)
+
+        return self._join(key, start).follow()
+
+    def do(self, key, fn):
+        # fn() returns a str.
+        def start(flight):
+            for result in self._shared(key, lambda: iter([fn()])):
+                flight.publish(result)
+
+        # A do() may join a streamed flight under the same key, so the result
+        # is everything published, not just the first piece.
+        return "".join(self._join(key, start).follow())
+
+    def in_flight(self, key):
+        # Also true when another process leads the call, or has just finished
+        # it, so this one would only follow.
+        with self._lock:
+            if key in self._flights:
+                return True
+        return self.state.in_flight(key)
+
+    def stats(self):
+        with self._lock:
+            return {"upstream": self.upstream, "coalesced": self.coalesced, "followed": self.followed,
+                    "in_flight": len(self._flights)}
@@ -0,0 +1,160 @@
+import array
+import collections
+import json
+import math
+import os
+import threading
+
+from saathi.cache import CACHE_DIR
+
+# --- Offline, streaming speech recognition ---
+# Audio is read from the microphone in 30 ms frames and fed to the recognizer
+# while the learner is still talking, so partial transcripts can be shown live.
+# Voice-activity detection ends the utterance after a short pause instead of a
+# fixed 7-second window. Vosk decodes locally on the CPU; Google's web API is
+# kept as an online fallback when no local model is installed.
+
+ASR_BACKEND = os.environ.get("SHIKSHA_ASR_BACKEND", "auto")
+VOSK_MODEL_PATH = os.environ.get("SHIKSHA_VOSK_MODEL", os.path.join(CACHE_DIR, "models", "vosk-model-small-en-in-0.4"))
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+FRAME_SAMPLES = SAMPLE_RATE * FRAME_MS // 1000
+START_TIMEOUT = float(os.environ.get("SHIKSHA_ASR_START_TIMEOUT", 7))
+END_SILENCE_MS = int(os.environ.get("SHIKSHA_ASR_END_SILENCE_MS", 700))
+MAX_UTTERANCE = float(os.environ.get("SHIKSHA_ASR_MAX_UTTERANCE", 15))
+# Audio kept from just before speech is detected, so first syllables aren't cut.
+PRE_ROLL_MS = 300
+
+
+def frame_rms(frame):
+    samples = array.array("h", frame)
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(s * s for s in samples) / len(samples))
+
+
+class VoiceActivity:
+    def __init__(self, energy_threshold, aggressiveness=2):
+        self.energy_threshold = energy_threshold
+        try:
+            import webrtcvad
+            self._vad = webrtcvad.Vad(aggressiveness)
+        except ImportError:
+            self._vad = None
+
+    def is_speech(self, frame):
+        if self._vad is not None:
+            return self._vad.is_speech(frame, SAMPLE_RATE)
+        return frame_rms(frame) > self.energy_threshold
+
+
+class VoskBackend:
+    name = "Vosk (offline)"
+
+    def __init__(self, model_path=VOSK_MODEL_PATH):
+        from vosk import KaldiRecognizer, Model, SetLogLevel
+        SetLogLevel(-1)
+        self._make_recognizer = KaldiRecognizer
+        self.model = Model(model_path)
+
+    def start(self):
+        self._recognizer = self._make_recognizer(self.model, SAMPLE_RATE)
+        self._final = []
+
+    def feed(self, frame):
+        if self._recognizer.AcceptWaveform(frame):
+            self._final.append(json.loads(self._recognizer.Result()).get("text", ""))
+            partial = ""
+        else:
+            partial = json.loads(self._recognizer.PartialResult()).get("partial", "")
+        return " ".join(t for t in self._final + [partial] if t)
+
+    def finish(self):
+        self._final.append(json.loads(self._recognizer.FinalResult()).get("text", ""))
+        return " ".join(t for t in self._final if t)
+
+
+class GoogleBackend:
+    name = "Google (online)"
+
+    def __init__(self, sr, recognizer):
+        self.sr = sr
+        self.recognizer = recognizer
+
+    def start(self):
+        self._frames = []
+
+    def feed(self, frame):
+        # No partial results; the audio is uploaded once the learner stops.
+        self._frames.append(frame)
+        return None
+
+    def finish(self):
+        audio = self.sr.AudioData(b"".join(self._frames), SAMPLE_RATE, 2)
+        return self.recognizer.recognize_google(audio)
+
+
+def make_backend(sr, recognizer, name=ASR_BACKEND):
+    if name in ("auto", "vosk"):
+        try:
+            if not os.path.isdir(VOSK_MODEL_PATH):
+                raise FileNotFoundError(f"Vosk model not found at {VOSK_MODEL_PATH}")
+            return VoskBackend()
+        except Exception as e:
+            if name == "vosk":
+                raise
+            print(f"Offline speech recognition unavailable, using Google: {e}")
+    return GoogleBackend(sr, recognizer)
+
+
+class SpeechInput:
+    def __init__(self, sr, recognizer, backend):
+        self.sr = sr
+        self.recognizer = recognizer
+        self.backend = backend
+        self.calibrated = False
+        # There is one microphone; sessions take turns.
+        self._lock = threading.Lock()
+
+    def calibrate(self, source):
+        # Ambient noise is measured on first use and reused for every later tap.
+        if not self.calibrated:
+            self.recognizer.adjust_for_ambient_noise(source, duration=1)
+            self.calibrated = True
+
+    def listen(self, on_partial=None):
+        with self._lock, self.sr.Microphone(sample_rate=SAMPLE_RATE, chunk_size=FRAME_SAMPLES) as source:
+            self.calibrate(source)
+            vad = VoiceActivity(self.recognizer.energy_threshold)
+            pre_roll = collections.deque(maxlen=PRE_ROLL_MS // FRAME_MS)
+            self.backend.start()
+            # Time is counted in audio frames, not wall-clock, so decoding
+            # hiccups don't cut an utterance short.
+            now = 0.0
+            speech_started = last_voice = None
+            while True:
+                frame = source.stream.read(FRAME_SAMPLES)
+                now += FRAME_MS / 1000
+                voiced = vad.is_speech(frame)
+                if speech_started is None:
+                    if not voiced:
+                        if now > START_TIMEOUT:
+                            raise self.sr.WaitTimeoutError("listening timed out while waiting for phrase to start")
+                        pre_roll.append(frame)
+                        continue
+                    speech_started = now
+                    for earlier in pre_roll:
+                        self.backend.feed(earlier)
+                partial = self.backend.feed(frame)
+                if partial and on_partial is not None:
+                    on_partial(partial)
+                if voiced:
+                    last_voice = now
+                elif (now - last_voice) * 1000 >= END_SILENCE_MS:
+                    break
+                if now - speech_started > MAX_UTTERANCE:
+                    break
+        text = self.backend.finish()
+        if not text or not text.strip():
+            raise self.sr.UnknownValueError()
+        return text.strip()
@@ -0,0 +1,281 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from saathi.cache import CACHE_DIR
+from saathi.scheduler import TokenBucket
+
+# --- Shared state across server processes ---
+# The answer cache, translation memory and conversation log are already SQLite
+# (WAL) files under SHIKSHA_CACHE_DIR, so every process pointed at the same
+# directory shares them. A learner who lands on another process picks the
+# conversation up from the log through the ?s= session id. This module covers
+# the state that was still process-local: the LLM rate-limit bucket and the
+# single-flight table of calls in progress.
+#
+# SHIKSHA_STATE_BACKEND=local (the default) keeps both in memory, which is
+# right for a single process. With "sqlite", every process on the machine
+# draws from one token bucket, so N processes together stay within the API
+# quota. Identical calls are also coalesced across processes. The process that
+# claims a call streams its tokens into the state file and the others follow
+# from there.
+
+STATE_BACKEND = os.environ.get("SHIKSHA_STATE_BACKEND", "local")
+STATE_PATH = os.environ.get("SHIKSHA_STATE_PATH", os.path.join(CACHE_DIR, "state.sqlite3"))
+# A leader that hasn't published anything for this long is presumed dead. It
+# covers a full scheduler queue wait plus the LLM deadline.
+FLIGHT_LEASE = float(os.environ.get("SHIKSHA_FLIGHT_LEASE", 120))
+# Finished results stay readable this long, for followers that poll late.
+FLIGHT_KEEP = float(os.environ.get("SHIKSHA_FLIGHT_KEEP", 30))
+FLIGHT_POLL = float(os.environ.get("SHIKSHA_FLIGHT_POLL", 0.05))
+FLIGHT_FLUSH = float(os.environ.get("SHIKSHA_FLIGHT_FLUSH", 0.1))
+
+
+class FlightAbandoned(Exception):
+    pass
+
+
+class FlightFailed(Exception):
+    pass
+
+
+class LocalState:
+    # Everything in this process: SingleFlight's own table is the only
+    # coalescing needed, so every claim succeeds.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def bucket(self, name, rate, burst):
+        with self._lock:
+            if name not in self._buckets:
+                self._buckets[name] = TokenBucket(rate, burst)
+            return self._buckets[name]
+
+    def claim(self, key):
+        return True
+
+    def in_flight(self, key):
+        return False
+
+    def lead(self, key):
+        return _Publisher(None, key)
+
+    def follow(self, key):
+        raise FlightAbandoned(key)
+
+
+class SQLiteBucket:
+    # TokenBucket with its level in the state file, refilled on wall-clock time.
+
+    def __init__(self, state, name, rate, burst):
+        self.state = state
+        self.name = name
+        self.rate = rate
+        self.capacity = burst
+
+    def _level(self, db, now):
+        row = db.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (self.name,)).fetchone()
+        if row is None:
+            return float(self.capacity)
+        return min(self.capacity, row[0] + max(0.0, now - row[1]) * self.rate)
+
+    def take(self, now=None):
+        now = time.time()
+        with self.state.transaction() as db:
+            tokens = self._level(db, now)
+            taken = tokens >= 1
+            if taken:
+                tokens -= 1
+            db.execute(
+                "INSERT INTO buckets (name, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (self.name, tokens, now),
+            )
+        return taken
+
+    def wait_time(self, needed=1, now=None):
+        with self.state.transaction() as db:
+            tokens = self._level(db, time.time())
+        return max(0.0, (needed - tokens) / self.rate)
+
+
+class SQLiteState:
+    def __init__(self, path=STATE_PATH):
+        self.path = path
+        self.owner = uuid.uuid4().hex
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        # isolation_level=None: transactions are opened explicitly with BEGIN IMMEDIATE.
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=10, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS buckets (
+                name TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS flights (
+                key TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires REAL NOT NULL,
+                done INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                finished REAL
+            );
+            CREATE TABLE IF NOT EXISTS flight_tokens (
+                key TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                token TEXT NOT NULL,
+                PRIMARY KEY (key, idx)
+            ) WITHOUT ROWID;
+        """)
+        self._buckets = {}
+
+    def transaction(self):
+        return _Transaction(self)
+
+    def bucket(self, name, rate, burst):
+        with self._lock:
+            if name not in self._buckets:
+                self._buckets[name] = SQLiteBucket(self, name, rate, burst)
+            return self._buckets[name]
+
+    def claim(self, key):
+        # True if this process now leads the call for key. A live leader or a
+        # recent successful result means follow() instead.
+        now = time.time()
+        with self.transaction() as db:
+            if _followable(db, key, now):
+                return False
+            db.execute("DELETE FROM flight_tokens WHERE key = ?", (key,))
+            db.execute(
+                "INSERT OR REPLACE INTO flights (key, owner, expires, done, error, finished) VALUES (?, ?, ?, 0, NULL, NULL)",
+                (key, self.owner, now + FLIGHT_LEASE),
+            )
+            # Housekeeping while the write lock is held anyway.
+            stale = now - FLIGHT_KEEP
+            db.execute("DELETE FROM flight_tokens WHERE key IN (SELECT key FROM flights WHERE finished < ? OR expires < ?)", (stale, stale - FLIGHT_LEASE))
+            db.execute("DELETE FROM flights WHERE finished < ? OR expires < ?", (stale, stale - FLIGHT_LEASE))
+        return True
+
+    def in_flight(self, key):
+        # True if claim(key) would have this process follow another's call.
+        with self._lock:
+            return _followable(self._db, key, time.time())
+
+    def lead(self, key):
+        return _Publisher(self, key)
+
+    def _publish(self, key, start, tokens, done=False, error=None):
+        now = time.time()
+        with self.transaction() as db:
+            db.executemany(
+                "INSERT INTO flight_tokens (key, idx, token) VALUES (?, ?, ?)",
+                [(key, start + i, token) for i, token in enumerate(tokens)],
+            )
+            if done:
+                db.execute(
+                    "UPDATE flights SET done = 1, error = ?, finished = ? WHERE key = ? AND owner = ?",
+                    (error, now, key, self.owner),
+                )
+            else:
+                db.execute("UPDATE flights SET expires = ? WHERE key = ? AND owner = ?", (now + FLIGHT_LEASE, key, self.owner))
+
+    def follow(self, key):
+        # Yields the leader's tokens as they land. Raises FlightAbandoned if the
+        # leader's lease runs out, or FlightFailed with its error.
+        index = 0
+        while True:
+            with self._lock:
+                row = self._db.execute("SELECT done, error, expires FROM flights WHERE key = ?", (key,)).fetchone()
+                tokens = [t for (t,) in self._db.execute(
+                    "SELECT token FROM flight_tokens WHERE key = ? AND idx >= ? ORDER BY idx", (key, index)
+                )]
+            if row is None:
+                raise FlightAbandoned(key)
+            index += len(tokens)
+            yield from tokens
+            done, error, expires = row
+            if done:
+                if error is not None:
+                    raise FlightFailed(error)
+                # Tokens published with the done flag are in this read already.
+                return
+            if expires < time.time():
+                raise FlightAbandoned(key)
+            if not tokens:
+                time.sleep(FLIGHT_POLL)
+
+
+def _followable(db, key, now):
+    # A live leader, or a recent successful result.
+    row = db.execute("SELECT done, error, expires, finished FROM flights WHERE key = ?", (key,)).fetchone()
+    if row is None:
+        return False
+    done, error, expires, finished = row
+    if not done:
+        return expires > now
+    return error is None and finished > now - FLIGHT_KEEP
+
+
+class _Transaction:
+    def __init__(self, state):
+        self.state = state
+
+    def __enter__(self):
+        self.state._lock.acquire()
+        try:
+            self.state._db.execute("BEGIN IMMEDIATE")
+        except BaseException:
+            self.state._lock.release()
+            raise
+        return self.state._db
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.state._db.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.state._lock.release()
+
+
+class _Publisher:
+    # The leader's side of a shared flight: tokens are written in batches
+    # every FLIGHT_FLUSH seconds, which also renews the lease.
+
+    def __init__(self, state, key):
+        self.state = state
+        self.key = key
+        self.buffer = []
+        self.written = 0
+        self.flushed_at = time.monotonic()
+
+    def publish(self, token):
+        if self.state is None:
+            return
+        self.buffer.append(token)
+        if time.monotonic() - self.flushed_at >= FLIGHT_FLUSH:
+            self._flush()
+
+    def _flush(self, done=False, error=None):
+        self.state._publish(self.key, self.written, self.buffer, done, error)
+        self.written += len(self.buffer)
+        self.buffer = []
+        self.flushed_at = time.monotonic()
+
+    def finish(self, error=None):
+        if self.state is None:
+            return
+        self._flush(done=True, error=None if error is None else f"{type(error).__name__}: {error}")
+
+
+def open_state(backend=STATE_BACKEND, path=STATE_PATH):
+    if backend == "local":
+        return LocalState()
+    if backend == "sqlite":
+        return SQLiteState(path)
+    raise ValueError(f"Unknown SHIKSHA_STATE_BACKEND {backend!r}; expected 'local' or 'sqlite'")
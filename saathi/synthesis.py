@@ -0,0 +1,237 @@
+import itertools
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from saathi import metrics
+from saathi.tts import profile_key, voice_profile
+
+# --- Multi-process TTS synthesis pool ---
+# pyttsx3 synthesis is CPU-bound and its engines are not thread-safe, so each
+# worker process owns one engine. Workers are pre-warmed with a voice profile
+# (accent + gender) and jobs are routed to an idle worker whose engine already
+# has the requested profile loaded, falling back to any idle worker. Pending
+# jobs wait in a bounded queue; a watchdog kills and restarts workers that
+# crash or overrun the per-job timeout. A job whose worker dies under it is
+# retried once on another worker. Workers run saathi/synthesis_worker.py.
+
+TTS_WORKERS = int(os.environ.get("SHIKSHA_TTS_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+TTS_QUEUE_SIZE = int(os.environ.get("SHIKSHA_TTS_QUEUE_SIZE", 64))
+TTS_JOB_TIMEOUT = float(os.environ.get("SHIKSHA_TTS_JOB_TIMEOUT", 30))
+
+WARM_PROFILES = [
+    voice_profile(dialect, gender)
+    for dialect in ("American English", "British English")
+    for gender in ("Woman", "Man")
+]
+
+# The child has to import saathi however the app itself was started.
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class PoolBusy(Exception):
+    pass
+
+
+class SynthesisTimeout(Exception):
+    pass
+
+
+def _worker_env():
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (PACKAGE_ROOT, env.get("PYTHONPATH")) if p)
+    return env
+
+
+class _Worker:
+    def __init__(self, worker_id, results, warm_profile):
+        self.worker_id = worker_id
+        self.loaded = profile_key(warm_profile)
+        self.job = None
+        self.started = 0.0
+        self.spawned = time.monotonic()
+        self.broken = False
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "saathi.synthesis_worker", json.dumps(warm_profile)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            env=_worker_env(),
+        )
+        threading.Thread(target=self._read, args=(results,), daemon=True).start()
+
+    def _read(self, results):
+        for line in self.process.stdout:
+            job_id, error = json.loads(line)
+            results.put((self.worker_id, job_id, error))
+
+    def alive(self):
+        return not self.broken and self.process.poll() is None
+
+    def send(self, job):
+        self.process.stdin.write(json.dumps(list(job)) + "\n")
+        self.process.stdin.flush()
+
+    def kill(self):
+        if self.process.poll() is None:
+            self.process.kill()
+        try:
+            self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            pass
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+
+
+class SynthesisPool:
+    def __init__(self, workers=TTS_WORKERS, queue_size=TTS_QUEUE_SIZE, job_timeout=TTS_JOB_TIMEOUT, warm_profiles=WARM_PROFILES):
+        self.queue_size = queue_size
+        self.job_timeout = job_timeout
+        self.warm_profiles = warm_profiles
+        self._results = queue.Queue()
+        self._pending = deque()
+        self._futures = {}
+        # Jobs already retried once after their worker died.
+        self._retried = set()
+        self._ids = itertools.count()
+        self._cond = threading.Condition()
+        self._workers = [self._spawn(i) for i in range(workers)]
+        self.completed = 0
+        self.failed = 0
+        self.restarts = 0
+        self.warm_hits = 0
+        threading.Thread(target=self._collect, daemon=True).start()
+        threading.Thread(target=self._dispatch, daemon=True).start()
+
+    def _spawn(self, worker_id):
+        warm = self.warm_profiles[worker_id % len(self.warm_profiles)]
+        return _Worker(worker_id, self._results, warm)
+
+    def submit(self, text, profile, wav_path):
+        future = Future()
+        with self._cond:
+            if len(self._pending) >= self.queue_size:
+                raise PoolBusy(f"TTS queue is full ({self.queue_size} jobs waiting)")
+            job_id = next(self._ids)
+            self._futures[job_id] = future
+            self._pending.append((job_id, text, profile, wav_path))
+            self._cond.notify_all()
+        return future
+
+    def synthesize(self, text, profile, wav_path):
+        # Queue wait is bounded by the queue size; the job itself by the watchdog.
+        return self.submit(text, profile, wav_path).result()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "workers": len(self._workers),
+                "busy": sum(1 for w in self._workers if w.job is not None),
+                "queued": len(self._pending),
+                "completed": self.completed,
+                "failed": self.failed,
+                "restarts": self.restarts,
+                "warm_hits": self.warm_hits,
+            }
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                self._cond.wait(timeout=0.5)
+                self._watchdog()
+                while self._pending:
+                    # A dead worker stays out until the watchdog restarts it.
+                    idle = [w for w in self._workers if w.job is None and w.alive()]
+                    if not idle:
+                        break
+                    job = self._pending.popleft()
+                    wanted = profile_key(job[2])
+                    worker = next((w for w in idle if w.loaded == wanted), None)
+                    if worker is not None:
+                        self.warm_hits += 1
+                    else:
+                        worker = idle[0]
+                    try:
+                        worker.send(job)
+                    except (OSError, ValueError):
+                        # The worker died since alive() was checked.
+                        worker.broken = True
+                        self._pending.appendleft(job)
+                        continue
+                    worker.job = job
+                    worker.loaded = wanted
+                    worker.started = time.monotonic()
+                metrics.set_gauge("shiksha_tts_pool_queued", len(self._pending))
+                metrics.set_gauge("shiksha_tts_pool_busy", sum(1 for w in self._workers if w.job is not None))
+
+    def _collect(self):
+        while True:
+            worker_id, job_id, error = self._results.get()
+            with self._cond:
+                worker = self._workers[worker_id]
+                if worker.job is not None and worker.job[0] == job_id:
+                    worker.job = None
+                self._retried.discard(job_id)
+                future = self._futures.pop(job_id, None)
+                if error is None:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+                self._cond.notify_all()
+            if future is not None:
+                if error is None:
+                    future.set_result(None)
+                else:
+                    future.set_exception(RuntimeError(f"TTS synthesis failed: {error}"))
+
+    def _watchdog(self):
+        # Called with self._cond held.
+        now = time.monotonic()
+        for i, worker in enumerate(self._workers):
+            overdue = worker.job is not None and now - worker.started > self.job_timeout
+            if worker.alive() and not overdue:
+                continue
+            if worker.job is None and now - worker.spawned < 5:
+                # Crash-looping at startup (e.g. no TTS driver); restart slowly.
+                continue
+            worker.kill()
+            if worker.job is not None:
+                job_id = worker.job[0]
+                if not overdue and job_id not in self._retried and job_id in self._futures:
+                    # The worker died under the job, not because of it (as
+                    # far as we know): give it one more go on a fresh worker.
+                    self._retried.add(job_id)
+                    self._pending.appendleft(worker.job)
+                else:
+                    self._retried.discard(job_id)
+                    future = self._futures.pop(job_id, None)
+                    self.failed += 1
+                    if future is not None:
+                        reason = "timed out" if overdue else f"worker exited with code {worker.process.returncode}"
+                        future.set_exception(SynthesisTimeout(f"TTS job {reason}") if overdue else RuntimeError(f"TTS {reason}"))
+            print(f"Restarting TTS worker {i} ({'timeout' if overdue else 'crashed'})")
+            self.restarts += 1
+            self._workers[i] = self._spawn(i)
+
+    def close(self):
+        with self._cond:
+            # A worker exits when its stdin closes.
+            for worker in self._workers:
+                try:
+                    worker.process.stdin.close()
+                except OSError:
+                    pass
+            for worker in self._workers:
+                try:
+                    worker.process.wait(timeout=2)
+                except subprocess.TimeoutExpired:
+                    worker.kill()
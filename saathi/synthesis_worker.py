@@ -0,0 +1,38 @@
+import json
+import sys
+
+from saathi.tts import apply_profile, profile_key
+
+# --- TTS synthesis worker process ---
+# Started by SynthesisPool as `python -m saathi.synthesis_worker <warm profile>`,
+# so the child never imports the Streamlit app script. Each job arrives on
+# stdin as one JSON line [job_id, text, profile, wav_path], and each result goes
+# back on stdout as [job_id, error], with error None on success.
+
+
+def main():
+    warm_profile = json.loads(sys.argv[1])
+    # Anything the TTS driver prints must not end up in the result stream.
+    results = sys.stdout
+    sys.stdout = sys.stderr
+    import pyttsx3
+    engine = pyttsx3.init()
+    apply_profile(engine, warm_profile)
+    loaded = profile_key(warm_profile)
+    for line in sys.stdin:
+        job_id, text, profile, wav_path = json.loads(line)
+        try:
+            if profile_key(profile) != loaded:
+                apply_profile(engine, profile)
+                loaded = profile_key(profile)
+            engine.save_to_file(text, wav_path)
+            engine.runAndWait()
+            error = None
+        except Exception as e:
+            error = repr(e)
+        results.write(json.dumps([job_id, error]) + "\n")
+        results.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+import re
+
+# --- Sentence and segment splitting shared by streaming, TTS and translation ---
+
+# Split off every complete sentence from a streaming buffer; the unfinished tail
+# is returned so it can be completed by the next tokens.
+SENTENCE_END = re.compile(r'(?<=[.!?।])\s+')
+
+# Answers always open with a greeting ("Hello friend,", "Namaste,"); keeping it
+# as its own segment lets the translation memory reuse it across answers.
+GREETING = re.compile(r"^((?:hello|hi|namaste|namaskar)\b[^.!?,]{0,30}[,!])\s+", re.IGNORECASE)
+
+
+def split_sentences(buffer):
+    parts = SENTENCE_END.split(buffer)
+    return [p for p in parts[:-1] if p.strip()], parts[-1]
+
+
+def segment_text(text):
+    text = text.strip()
+    segments = []
+    match = GREETING.match(text)
+    if match:
+        segments.append(match.group(1))
+        text = text[match.end():]
+    sentences, tail = split_sentences(text)
+    segments.extend(s.strip() for s in sentences)
+    if tail.strip():
+        segments.append(tail.strip())
+    return segments
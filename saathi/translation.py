@@ -0,0 +1,199 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from saathi.cache import CACHE_DIR, estimate_tokens, make_key
+from saathi.text import segment_text
+
+# --- Translation memory for the Hindi pass ---
+# Translations are stored per sentence/segment, so greetings and repeated
+# explanations are reused. Only unseen segments go upstream, in one batched
+# request with numbered lines.
+#
+# While an answer is still streaming, SentencePipeline translates each finished
+# sentence on a worker pool, so the Hindi is mostly done by the time the
+# English is.
+
+TRANSLATE_PROMPT = "Translate the following English text to simple Hindi. Be direct and concise. Do not add any extra explanation or text. Just provide the translated text."
+BATCH_PROMPT = (
+    "Translate each numbered line of English text to simple Hindi. Be direct and concise. "
+    "Reply with exactly the same number of lines, each starting with its number like '1. ', "
+    "and nothing else."
+)
+TRANSLATION_WORKERS = int(os.environ.get("SHIKSHA_TRANSLATION_WORKERS", 8))
+NUMBERED_LINE = re.compile(r"^\s*(\d+)[.)]\s*(.*)$")
+
+
+def normalize_segment(segment):
+    return re.sub(r"\s+", " ", segment).strip()
+
+
+def parse_numbered_lines(text, count):
+    translated = {}
+    for line in text.splitlines():
+        match = NUMBERED_LINE.match(line)
+        if match and match.group(2).strip():
+            translated[int(match.group(1))] = match.group(2).strip()
+    if sorted(translated) != list(range(1, count + 1)):
+        return None
+    return [translated[i] for i in range(1, count + 1)]
+
+
+class TranslationMemory:
+    def __init__(self, path=None):
+        self.path = path or os.path.join(CACHE_DIR, "translations.sqlite3")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS segments (
+                key TEXT PRIMARY KEY,
+                source TEXT NOT NULL,
+                target TEXT NOT NULL,
+                uses INTEGER NOT NULL DEFAULT 0,
+                last_access REAL NOT NULL
+            )
+        """)
+        # Counters live in the file too, so every server process reports the same totals.
+        self._db.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value REAL NOT NULL)")
+        self._db.commit()
+
+    def _key(self, segment, model):
+        return make_key(model, TRANSLATE_PROMPT, normalize_segment(segment))
+
+    def lookup(self, segments, model):
+        found = {}
+        now = time.time()
+        with self._lock:
+            for segment in segments:
+                row = self._db.execute("SELECT target FROM segments WHERE key = ?", (self._key(segment, model),)).fetchone()
+                if row is not None:
+                    found[segment] = row[0]
+            self._db.executemany(
+                "UPDATE segments SET uses = uses + 1, last_access = ? WHERE key = ?",
+                [(now, self._key(segment, model)) for segment in found],
+            )
+            self._db.commit()
+        return found
+
+    def store(self, pairs, model):
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO segments (key, source, target, uses, last_access) VALUES (?, ?, ?, 0, ?)",
+                [(self._key(source, model), normalize_segment(source), target, now) for source, target in pairs],
+            )
+            self._db.commit()
+
+    def translate(self, text, model, complete):
+        # complete(messages) performs one chat completion and returns its text.
+        segments = segment_text(text)
+        if not segments:
+            return ""
+        known = self.lookup(set(segments), model)
+        missing = [s for s in segments if s not in known]
+        self._bump({
+            "hits": len(segments) - len(missing),
+            "misses": len(missing),
+            "saved_tokens": sum(estimate_tokens(s) for s in segments if s in known),
+        })
+        if missing:
+            known.update(self._translate_batch(list(dict.fromkeys(missing)), model, complete))
+        return " ".join(known[s] for s in segments if known[s])
+
+    def _translate_batch(self, unseen, model, complete):
+        if len(unseen) == 1:
+            target = complete([
+                {"role": "system", "content": TRANSLATE_PROMPT},
+                {"role": "user", "content": unseen[0]},
+            ]).strip()
+            self.store([(unseen[0], target)], model)
+            return {unseen[0]: target}
+        numbered = "\n".join(f"{i}. {segment}" for i, segment in enumerate(unseen, 1))
+        reply = complete([
+            {"role": "system", "content": BATCH_PROMPT},
+            {"role": "user", "content": numbered},
+        ])
+        targets = parse_numbered_lines(reply, len(unseen))
+        if targets is None:
+            # The model merged or dropped lines; use its reply for this answer
+            # but don't poison the memory with misaligned segments.
+            print(f"Translation memory: batch reply did not align with {len(unseen)} segments")
+            joined = reply.strip()
+            return {segment: (joined if i == 0 else "") for i, segment in enumerate(unseen)}
+        pairs = list(zip(unseen, targets))
+        self.store(pairs, model)
+        return dict(pairs)
+
+    def _bump(self, deltas):
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO stats (name, value) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                list(deltas.items()),
+            )
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._db.execute("SELECT name, value FROM stats").fetchall())
+        hits, misses = int(stats.get("hits", 0)), int(stats.get("misses", 0))
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "saved_tokens": int(stats.get("saved_tokens", 0)),
+        }
+
+
+class SentencePipeline:
+    # translate(segment) returns the Hindi for one segment and runs on the
+    # executor. Pieces are handed back in answer order, however they finish.
+    # A segment that fails comes back as "" and its error is kept in
+    # self.error, so the English answer streaming alongside is never
+    # interrupted; the caller fails the Hindi pass once rest() is drained.
+    def __init__(self, translate, executor):
+        self.translate = translate
+        self.executor = executor
+        self.error = None
+        self._futures = []
+        self._taken = 0
+
+    def submit(self, sentence):
+        # The greeting is split off the first sentence, as segment_text does
+        # for a whole answer, so both paths share translation memory entries.
+        segments = segment_text(sentence) if not self._futures else [sentence.strip()]
+        for segment in segments:
+            if segment:
+                self._futures.append(self.executor.submit(self.translate, segment))
+
+    def ready(self):
+        # Pieces finished since the last call, up to the first one still running.
+        pieces = []
+        while self._taken < len(self._futures) and self._futures[self._taken].done():
+            pieces.append(self._piece(self._futures[self._taken]))
+            self._taken += 1
+        return pieces
+
+    def rest(self):
+        # The remaining pieces, waiting for each in turn.
+        while self._taken < len(self._futures):
+            piece = self._piece(self._futures[self._taken])
+            self._taken += 1
+            yield piece
+
+    def _piece(self, future):
+        try:
+            return future.result()
+        except Exception as e:
+            if self.error is None:
+                self.error = e
+            return ""
+
+    def cancel(self):
+        for future in self._futures[self._taken:]:
+            future.cancel()
@@ -0,0 +1,382 @@
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import wave
+
+from saathi.cache import CACHE_DIR
+
+# --- Rendered, content-addressed TTS audio ---
+# Speech is synthesised to a file instead of the server's speaker, so each
+# learner gets their own audio in the browser. Files are named after a hash of
+# the text and voice settings, so an answer that was spoken before costs no
+# synthesis at all. When ffmpeg is available the WAV output is re-encoded to
+# low-bitrate mono Opus, which is a fraction of the size on slow links.
+# Once the directory holds more than AUDIO_MAX_FILES files or AUDIO_MAX_BYTES,
+# the least recently played files are deleted. Lesson-pack audio that gets
+# pruned is copied back the next time the packs are installed.
+
+AUDIO_DIR = os.environ.get("SHIKSHA_AUDIO_DIR", os.path.join(CACHE_DIR, "audio"))
+AUDIO_BITRATE = os.environ.get("SHIKSHA_AUDIO_BITRATE", "24k")
+AUDIO_MAX_FILES = int(os.environ.get("SHIKSHA_AUDIO_MAX_FILES", 20000))
+AUDIO_MAX_BYTES = int(os.environ.get("SHIKSHA_AUDIO_MAX_BYTES", 500 * 1024 * 1024))
+AUDIO_FILE = re.compile(r"^[0-9a-f]{64}\.(ogg|wav)$")
+FFMPEG = shutil.which("ffmpeg")
+
+
+def voice_profile(dialect="American English", gender="Woman", rate=None):
+    return {"dialect": dialect, "gender": gender, "rate": rate}
+
+
+def profile_key(profile):
+    return "|".join(f"{k}={profile[k]}" for k in sorted(profile))
+
+
+# Each accent is matched on exact language codes (a code also matches its own
+# subtags, so "en-gb" covers "en-gb-x-rp"). The codes come from a voice's
+# languages, the tail of an espeak-ng id ("gmw/en-us", "inc/hi") or a code in a
+# SAPI5/NSSS id ("TTS_MS_EN-US_ZIRA", "com.apple.voice.compact.en-GB.Daniel").
+# Some voices only carry a well-known name, so those are matched as whole words.
+DIALECT_CODES = {
+    "American English": ("en-us",),
+    "British English": ("en-gb",),
+    "Hindi": ("hi",),
+}
+DIALECT_NAMES = {
+    "American English": ("zira", "david", "samantha", "alex"),
+    "British English": ("hazel", "daniel", "serena"),
+    "Hindi": ("lekha", "kalpana", "hemant"),
+}
+# Voice ids of the older espeak, which name the language instead.
+ESPEAK_LEGACY_IDS = {"english-us": "en-us", "english": "en-gb", "english_rp": "en-gb", "hindi": "hi"}
+GENDER_HINTS = {
+    "Woman": ("female", "zira", "hazel", "samantha", "serena"),
+    "Man": ("male", "david", "daniel", "alex"),
+}
+LANGUAGE_CODE = re.compile(r"^[a-z]{2,3}(-[a-z0-9]+)*$")
+EMBEDDED_CODE = re.compile(r"(?<![a-z0-9])(?=([a-z]{2,3}[-_][a-z]{2})(?![a-z]))")
+
+
+def _voice_text(voice):
+    languages = " ".join(
+        lang.decode("utf-8", "ignore") if isinstance(lang, bytes) else str(lang)
+        for lang in (getattr(voice, "languages", None) or [])
+    )
+    return f"{voice.id} {voice.name} {languages}".lower()
+
+
+def _voice_codes(voice):
+    codes = set()
+    for lang in getattr(voice, "languages", None) or []:
+        # espeak prefixes each language with a priority byte.
+        lang = lang.decode("utf-8", "ignore") if isinstance(lang, bytes) else str(lang)
+        code = "".join(c for c in lang if c.isprintable()).strip().lower().replace("_", "-")
+        if LANGUAGE_CODE.match(code):
+            codes.add(code)
+    voice_id = str(voice.id).lower().split("+")[0]
+    tail = voice_id.replace("\\", "/").split("/")[-1]
+    if tail in ESPEAK_LEGACY_IDS:
+        codes.add(ESPEAK_LEGACY_IDS[tail])
+    elif LANGUAGE_CODE.match(tail):
+        codes.add(tail)
+    codes.update(code.replace("_", "-") for code in EMBEDDED_CODE.findall(voice_id))
+    return codes
+
+
+def _speaks(voice, codes):
+    return any(code == wanted or code.startswith(wanted + "-") for code in _voice_codes(voice) for wanted in codes)
+
+
+def _voice_is(voice, gender):
+    declared = (getattr(voice, "gender", None) or "").lower()
+    if declared:
+        return declared == ("female" if gender == "Woman" else "male")
+    text = _voice_text(voice)
+    if gender == "Man" and "female" in text:
+        return False
+    return any(hint in text for hint in GENDER_HINTS.get(gender, ()))
+
+
+def select_voice(voices, profile):
+    # Best match on accent first, then gender. espeak voices carry no gender,
+    # so a female/male variant suffix is added to the matching accent instead.
+    # Without a voice for the accent, any English voice is used; without one
+    # of those, None leaves the engine's current voice alone.
+    dialect = profile.get("dialect")
+    names = DIALECT_NAMES.get(dialect, ())
+    by_dialect = [
+        v for v in voices
+        if _speaks(v, DIALECT_CODES.get(dialect, ())) or set(re.findall(r"[a-z]+", str(v.name).lower())) & set(names)
+    ] or [v for v in voices if _speaks(v, ("en",))]
+    for voice in by_dialect:
+        if _voice_is(voice, profile.get("gender")):
+            return voice.id
+    if not by_dialect:
+        return None
+    voice_id = by_dialect[0].id
+    if sys.platform.startswith("linux") and "+" not in voice_id:
+        voice_id += "+f3" if profile.get("gender") == "Woman" else "+m3"
+    return voice_id
+
+
+def apply_profile(engine, profile):
+    voice_id = select_voice(engine.getProperty("voices"), profile)
+    if voice_id is not None:
+        engine.setProperty("voice", voice_id)
+    if profile.get("rate"):
+        engine.setProperty("rate", profile["rate"])
+
+
+def audio_key(text, profile):
+    return hashlib.sha256(f"{profile_key(profile)}\x1f{text.strip()}".encode("utf-8")).hexdigest()
+
+
+def audio_mime(path):
+    return "audio/ogg" if path.endswith(".ogg") else "audio/wav"
+
+
+def audio_duration(path):
+    # Seconds of audio in a rendered file, or None if it can't be read.
+    try:
+        if path.endswith(".wav"):
+            with wave.open(path, "rb") as f:
+                return f.getnframes() / f.getframerate()
+        with open(path, "rb") as f:
+            head = f.read(4096)
+            f.seek(max(0, os.path.getsize(path) - 65536))
+            tail = f.read()
+        # Opus granule positions count 48 kHz samples, including the pre-skip.
+        pre_skip = int.from_bytes(head[head.index(b"OpusHead") + 10:][:2], "little")
+        page = tail.rindex(b"OggS")
+        return (int.from_bytes(tail[page + 6:page + 14], "little") - pre_skip) / 48000
+    except (OSError, EOFError, ValueError, wave.Error):
+        return None
+
+
+def encode_compact(wav_path, out_path):
+    subprocess.run(
+        [FFMPEG, "-y", "-loglevel", "error", "-i", wav_path, "-ac", "1", "-ar", "16000",
+         "-c:a", "libopus", "-b:a", AUDIO_BITRATE, "-application", "voip", out_path],
+        check=True,
+        timeout=60,
+    )
+
+
+class AudioRenderer:
+    def __init__(self, audio_dir=AUDIO_DIR, pool=None, max_files=AUDIO_MAX_FILES, max_bytes=AUDIO_MAX_BYTES):
+        self.audio_dir = audio_dir
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        os.makedirs(self.audio_dir, exist_ok=True)
+        # With a SynthesisPool, synthesis runs in worker processes; otherwise
+        # it falls back to one in-process engine.
+        self.pool = pool
+        self._engine = None
+        # pyttsx3 engines are not thread-safe; sessions take turns on this one.
+        self._lock = threading.Lock()
+        self.rendered = 0
+        self.reused = 0
+        # (files, bytes) in audio_dir, counted on the first write. Other
+        # processes write there too, so it is recounted whenever it is pruned.
+        self._usage = None
+        self._usage_lock = threading.Lock()
+        self.pruned = 0
+
+    def cached_path(self, text, profile):
+        key = audio_key(text, profile)
+        for ext in (".ogg", ".wav"):
+            path = os.path.join(self.audio_dir, key[:2], key + ext)
+            if os.path.exists(path):
+                # The modification time doubles as the last use for pruning.
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+                return path
+        return None
+
+    def _stored(self, path):
+        with self._usage_lock:
+            if self._usage is None:
+                self._usage = self._count()
+            else:
+                files, size = self._usage
+                self._usage = (files + 1, size + os.path.getsize(path))
+            if self._usage[0] > self.max_files or self._usage[1] > self.max_bytes:
+                self._prune()
+
+    def _entries(self):
+        # (mtime, size, path) of every cached file; files deleted meanwhile by
+        # another process are skipped.
+        for shard in os.scandir(self.audio_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if AUDIO_FILE.match(entry.name):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    yield stat.st_mtime, stat.st_size, entry.path
+
+    def _count(self):
+        entries = list(self._entries())
+        return len(entries), sum(size for _, size, _ in entries)
+
+    def _prune(self):
+        # Walk from least recently used and delete until both caps are met again.
+        entries = sorted(self._entries())
+        files, size = len(entries), sum(entry_size for _, entry_size, _ in entries)
+        for _, entry_size, path in entries:
+            if files <= self.max_files and size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            files -= 1
+            size -= entry_size
+            self.pruned += 1
+        self._usage = (files, size)
+
+    def render(self, text, profile):
+        path = self.cached_path(text, profile)
+        if path is not None:
+            self.reused += 1
+            return path
+        key = audio_key(text, profile)
+        target_dir = os.path.join(self.audio_dir, key[:2])
+        os.makedirs(target_dir, exist_ok=True)
+        fd, wav_path = tempfile.mkstemp(suffix=".wav", dir=target_dir)
+        os.close(fd)
+        try:
+            if self.pool is not None:
+                self.pool.synthesize(text, profile, wav_path)
+            else:
+                with self._lock:
+                    self._synthesize(text, profile, wav_path)
+            path = None
+            if FFMPEG:
+                tmp_path = wav_path[:-4] + ".ogg"
+                try:
+                    encode_compact(wav_path, tmp_path)
+                    path = os.path.join(target_dir, key + ".ogg")
+                    os.replace(tmp_path, path)
+                except (subprocess.SubprocessError, OSError) as e:
+                    print(f"Error encoding audio, keeping WAV: {e}")
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    path = None
+            if path is None:
+                path = os.path.join(target_dir, key + ".wav")
+                os.replace(wav_path, path)
+        finally:
+            if os.path.exists(wav_path):
+                os.remove(wav_path)
+        self.rendered += 1
+        self._stored(path)
+        return path
+
+    def join(self, paths, text, profile):
+        # Stitches the rendered sentences of text into the file for the whole
+        # of it, so replaying the answer or rendering it again is a cache hit.
+        path = self.cached_path(text, profile)
+        if path is not None:
+            return path
+        if len(paths) == 1:
+            return paths[0]
+        key = audio_key(text, profile)
+        target_dir = os.path.join(self.audio_dir, key[:2])
+        os.makedirs(target_dir, exist_ok=True)
+        if all(p.endswith(".wav") for p in paths):
+            fd, tmp_path = tempfile.mkstemp(suffix=".wav", dir=target_dir)
+            os.close(fd)
+            path = os.path.join(target_dir, key + ".wav")
+            try:
+                with wave.open(tmp_path, "wb") as out:
+                    for i, segment in enumerate(paths):
+                        with wave.open(segment, "rb") as f:
+                            if i == 0:
+                                out.setparams(f.getparams())
+                            elif f.getparams()[:3] != out.getparams()[:3]:
+                                raise ValueError(f"{segment} doesn't match the format of {paths[0]}")
+                            out.writeframes(f.readframes(f.getnframes()))
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            self._stored(path)
+            return path
+        if not FFMPEG:
+            raise ValueError("joining Opus audio needs ffmpeg")
+        fd, list_path = tempfile.mkstemp(suffix=".txt", dir=target_dir)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.writelines(f"file '{os.path.abspath(p)}'\n" for p in paths)
+        tmp_path = list_path[:-4] + ".ogg"
+        path = os.path.join(target_dir, key + ".ogg")
+        try:
+            subprocess.run(
+                [FFMPEG, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", list_path, "-ac", "1",
+                 "-ar", "16000", "-c:a", "libopus", "-b:a", AUDIO_BITRATE, "-application", "voip", tmp_path],
+                check=True,
+                timeout=60,
+            )
+            os.replace(tmp_path, path)
+        finally:
+            for leftover in (list_path, tmp_path):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+        self._stored(path)
+        return path
+
+    def _synthesize(self, text, profile, wav_path):
+        if self._engine is None:
+            import pyttsx3
+            self._engine = pyttsx3.init()
+        apply_profile(self._engine, profile)
+        self._engine.save_to_file(text, wav_path)
+        self._engine.runAndWait()
+
+
+class SentenceAudio:
+    # Renders an answer sentence by sentence while it is still being written,
+    # on the executor's threads, so the first sentence can be played before
+    # the answer is complete. Each sentence is cached under its own key;
+    # join() then builds the whole answer's file from them.
+    def __init__(self, renderer, profile, executor):
+        self.renderer = renderer
+        self.profile = profile
+        self.executor = executor
+        self._futures = []
+
+    def submit(self, sentence):
+        if sentence.strip():
+            self._futures.append(self.executor.submit(self.renderer.render, sentence.strip(), self.profile))
+
+    def cancel(self):
+        # Sentences not yet being rendered are dropped.
+        for future in self._futures:
+            future.cancel()
+
+    def first(self, wait=False):
+        # The first sentence's file once it is rendered, else None.
+        if not self._futures:
+            return None
+        future = self._futures[0]
+        if not wait and not future.done():
+            return None
+        return future.result() if future.exception() is None else None
+
+    def join(self, text):
+        path = self.renderer.cached_path(text, self.profile)
+        if path is not None or not self._futures:
+            return path or self.renderer.render(text, self.profile)
+        try:
+            return self.renderer.join([future.result() for future in self._futures], text, self.profile)
+        except Exception as e:
+            print(f"Error joining sentence audio, rendering the whole answer: {e}")
+            return self.renderer.render(text, self.profile)
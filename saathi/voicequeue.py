@@ -0,0 +1,162 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+from saathi import metrics
+
+# --- Bounded voice queue for speaker mode ---
+# Each session gets its own queue of at most VOICE_QUEUE_MAX sentences, and
+# one worker thread speaks them, taking sessions round-robin. The bound fits a
+# whole turn, English and Hindi. When a queue is full, the oldest sentence
+# from an earlier turn is dropped; if the queue holds only the current turn,
+# the new sentence is dropped instead, so an answer never loses its start.
+# With the "supersede" policy (the default), a sentence from a newer turn also
+# drops that session's queued sentences from older turns and cuts off the one
+# being spoken. A learner who asks three quick questions then hears only the
+# latest answer. "drop-oldest" only enforces the bound. cancel() silences a
+# session at once, e.g. when a new question is sent or the learner starts
+# speaking.
+
+VOICE_QUEUE_MAX = int(os.environ.get("SHIKSHA_VOICE_QUEUE_MAX", 32))
+VOICE_QUEUE_POLICY = os.environ.get("SHIKSHA_VOICE_QUEUE_POLICY", "supersede")
+POLICIES = ("supersede", "drop-oldest")
+
+
+class VoiceItem:
+    def __init__(self, session, turn, text, on_start=None, profile=None):
+        self.session = session
+        self.turn = turn
+        self.text = text
+        self.on_start = on_start
+        self.profile = profile
+        self.enqueued_at = time.perf_counter()
+        # Set when the item is cut off; speak() checks it in case stop() came
+        # before the engine started talking.
+        self.cancelled = False
+
+
+class VoiceQueue:
+    def __init__(self, speak, stop=None, max_per_session=VOICE_QUEUE_MAX, policy=VOICE_QUEUE_POLICY):
+        # speak(item) speaks one item on the worker thread; stop() interrupts
+        # it from another thread.
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown voice queue policy {policy!r}; expected one of {POLICIES}")
+        self.speak = speak
+        self.stop = stop
+        self.max_per_session = max_per_session
+        self.policy = policy
+        self._cond = threading.Condition()
+        # session -> deque of items; the dict order is the round-robin order.
+        self._sessions = OrderedDict()
+        self.current = None
+        self.dropped = {"overflow": 0, "superseded": 0, "cancelled": 0}
+        self.interrupted = 0
+        self._closed = False
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+        return self
+
+    def put(self, session, turn, text, on_start=None, profile=None):
+        item = VoiceItem(session, turn, text, on_start, profile)
+        with self._cond:
+            queue = self._sessions.setdefault(session, deque())
+            if self.policy == "supersede":
+                stale = [queued for queued in queue if queued.turn != turn]
+                for queued in stale:
+                    queue.remove(queued)
+                self._drop("superseded", len(stale))
+                if self.current is not None and self.current.session == session and self.current.turn != turn:
+                    self._interrupt()
+            while len(queue) >= self.max_per_session:
+                self._drop("overflow")
+                stale = next((queued for queued in queue if queued.turn != turn), None)
+                if stale is None:
+                    item.cancelled = True
+                    return item
+                queue.remove(stale)
+            queue.append(item)
+            self._update_depth()
+            self._cond.notify()
+        return item
+
+    def cancel(self, session):
+        # Drops everything queued for the session and stops it mid-sentence.
+        with self._cond:
+            queue = self._sessions.pop(session, None)
+            self._drop("cancelled", len(queue) if queue else 0)
+            if self.current is not None and self.current.session == session:
+                self._interrupt()
+            self._update_depth()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def depth(self, session=None):
+        with self._cond:
+            if session is not None:
+                return len(self._sessions.get(session, ()))
+            return sum(len(queue) for queue in self._sessions.values())
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queued": sum(len(queue) for queue in self._sessions.values()),
+                "sessions": len(self._sessions),
+                "dropped": dict(self.dropped),
+                "interrupted": self.interrupted,
+            }
+
+    def _drop(self, reason, count=1):
+        if count:
+            self.dropped[reason] += count
+            metrics.inc("shiksha_voice_dropped_total", count, reason=reason)
+
+    def _interrupt(self):
+        self.interrupted += 1
+        metrics.inc("shiksha_voice_interrupted_total")
+        self.current.cancelled = True
+        self.current = None
+        if self.stop is not None:
+            try:
+                self.stop()
+            except Exception as e:
+                print(f"Error stopping speech: {e}")
+
+    def _update_depth(self):
+        metrics.set_gauge("shiksha_voice_queue_depth", sum(len(queue) for queue in self._sessions.values()))
+
+    def _next(self):
+        session, queue = next(iter(self._sessions.items()))
+        item = queue.popleft()
+        if queue:
+            self._sessions.move_to_end(session)
+        else:
+            del self._sessions[session]
+        return item
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._sessions and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                item = self._next()
+                self.current = item
+                self._update_depth()
+            metrics.observe("shiksha_voice_queue_wait_seconds", time.perf_counter() - item.enqueued_at)
+            try:
+                if item.on_start is not None:
+                    item.on_start()
+                with metrics.span("tts_speak", chars=len(item.text)):
+                    self.speak(item)
+            except Exception as e:
+                print(f"Error in voice worker: {e}")
+            finally:
+                with self._cond:
+                    if self.current is item:
+                        self.current = None
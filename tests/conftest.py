@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+# Tests import the saathi package from the repo root and keep every cache in a
+# throwaway directory.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SHIKSHA_CACHE_DIR", tempfile.mkdtemp(prefix="shiksha-tests-"))
@@ -0,0 +1,29 @@
+import httpx
+import pytest
+
+from saathi import docstore
+from saathi.docstore import DocStore
+
+DOC = {"file_name": "notes.pdf", "url": "https://example.org/notes.pdf"}
+
+
+def make_store(tmp_path):
+    return DocStore(str(tmp_path / "store"), str(tmp_path / "static"), str(tmp_path / "docs"))
+
+
+def test_repeated_416_raises_after_the_last_attempt(tmp_path, monkeypatch):
+    monkeypatch.setattr(docstore, "FETCH_RETRIES", 1)
+    monkeypatch.setattr(docstore.time, "sleep", lambda seconds: None)
+    client = httpx.Client(transport=httpx.MockTransport(lambda request: httpx.Response(416)))
+    with pytest.raises(httpx.HTTPStatusError):
+        make_store(tmp_path).fetch(DOC, client)
+
+
+def test_416_restarts_the_download(tmp_path, monkeypatch):
+    monkeypatch.setattr(docstore.time, "sleep", lambda seconds: None)
+    responses = iter([httpx.Response(416), httpx.Response(200, content=b"%PDF notes")])
+    client = httpx.Client(transport=httpx.MockTransport(lambda request: next(responses)))
+    store = make_store(tmp_path)
+    entry, fetched = store.fetch(DOC, client)
+    assert fetched and entry["size"] == len(b"%PDF notes")
+    assert store.local_url("notes.pdf")
@@ -0,0 +1,22 @@
+from saathi.history import HistoryManager, prompt_tokens
+
+SYSTEM = {"role": "system", "content": "You are a friendly tutor."}
+
+
+def conversation(turns):
+    messages = [SYSTEM]
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"Question {i} about crops and water " * 5, "seq": 2 * i + 1})
+        messages.append({"role": "assistant", "content": f"Answer {i} about crops and water " * 5, "seq": 2 * i + 2})
+    messages.append({"role": "user", "content": "And what about seeds?", "seq": 2 * turns + 1})
+    return messages
+
+
+def test_reserved_tokens_shrink_the_verbatim_window():
+    messages = conversation(2)
+    plain = HistoryManager(budget=200, fold_every=100).build(messages, lambda m: "summary")
+    history = HistoryManager(budget=200, fold_every=100)
+    reserved = history.build(messages, lambda m: "summary", reserved=100)
+    assert len(reserved) < len(plain)
+    assert history.last_prompt_tokens == prompt_tokens(reserved) + 100
+    assert history.last_prompt_tokens <= 200
@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from bench.stub_server import ANSWER, StubConfig, start_in_thread
+from saathi.llm import LLMClient, LLMError, LLMTimeout
+
+MESSAGES = [{"role": "user", "content": "How do I save money?"}]
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(**config):
+        server, url = start_in_thread(config=StubConfig(jitter=0, tokens_per_second=1000, **config))
+        servers.append(server)
+        return url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def test_hedged_request_is_won_by_the_fallback(stub):
+    url = stub(latency=0.01, model_latency={"slow": 2.0})
+    client = LLMClient("key", base_url=url, fallback_model="fast", hedge_after=0.1, deadline=5)
+    answered = []
+    assert client.complete(MESSAGES, "slow", on_model=answered.append) == ANSWER
+    assert answered == ["fast"]
+    assert client.stats["hedged"] == 1 and client.stats["fallback_wins"] == 1
+
+
+def test_repeated_503s_exhaust_retries(stub):
+    url = stub(latency=0, error_rate=1.0, error_status=503)
+    client = LLMClient("key", base_url=url, fallback_model=None, max_retries=1, deadline=10)
+    with pytest.raises(LLMError, match="503"):
+        client.complete(MESSAGES, "primary")
+    assert client.stats["retries"] == 1 and client.stats["errors"] == 1
+
+
+def test_deadline_raises_timeout(stub):
+    url = stub(latency=2.0)
+    client = LLMClient("key", base_url=url, fallback_model=None, deadline=0.3)
+    with pytest.raises(LLMTimeout):
+        client.complete(MESSAGES, "primary")
+    assert client.stats["timeouts"] == 1
+
+
+def test_acomplete(stub):
+    url = stub(latency=0.01)
+    client = LLMClient("key", base_url=url, fallback_model=None)
+    assert asyncio.run(client.acomplete(MESSAGES, "primary")) == ANSWER
+    assert client.stats["requests"] == 1
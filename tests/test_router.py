@@ -0,0 +1,38 @@
+import pytest
+
+from saathi.router import ModelRouter
+
+TIERS = {"fast": ["small"], "standard": ["big"]}
+MESSAGES = [{"role": "user", "content": "Why do seeds need water?"}]
+
+
+def make_router():
+    return ModelRouter(tiers=TIERS, log_path=None, enabled=True)
+
+
+def test_call_is_credited_to_the_model_that_answered():
+    router = make_router()
+    decision = router.route("explain", "big")
+
+    def hedged(messages, model, on_model):
+        on_model("small")
+        yield "Seeds "
+        yield "need water."
+
+    assert "".join(router.stream(decision, hedged, MESSAGES)) == "Seeds need water."
+    stats = router.stats()
+    assert list(stats) == ["small"]
+    assert stats["small"]["samples"] == 1 and stats["small"]["error_rate"] == 0.0
+
+
+def test_failed_call_is_recorded_once_and_reraised():
+    router = make_router()
+    decision = router.route("explain", "big")
+
+    def failing(messages, model, on_model):
+        raise RuntimeError("upstream 500")
+        yield
+
+    with pytest.raises(RuntimeError):
+        list(router.stream(decision, failing, MESSAGES))
+    assert router.stats()["big"]["error_rate"] == 1.0
@@ -0,0 +1,103 @@
+import pytest
+
+from saathi.scheduler import QueueTimeout, Scheduler, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def make_scheduler(clock, rate_per_minute=6000, burst=100, max_in_flight=1):
+    return Scheduler(rate_per_minute=rate_per_minute, burst=burst, max_in_flight=max_in_flight, clock=clock)
+
+
+def test_sessions_are_served_round_robin():
+    scheduler = make_scheduler(FakeClock())
+    running = scheduler.submit("a")
+    assert running.granted
+    a2, a3, b1 = scheduler.submit("a"), scheduler.submit("a"), scheduler.submit("b")
+    scheduler.release(running)
+    assert a2.granted and not b1.granted
+    scheduler.release(a2)
+    assert b1.granted and not a3.granted
+    scheduler.release(b1)
+    assert a3.granted
+
+
+def test_answers_go_before_translations():
+    scheduler = make_scheduler(FakeClock())
+    running = scheduler.submit("a", "answer")
+    translation = scheduler.submit("b", "translation")
+    answer = scheduler.submit("c", "answer")
+    assert scheduler.position(answer) == 0
+    assert scheduler.position(translation) == 1
+    scheduler.release(running)
+    assert answer.granted and not translation.granted
+    scheduler.release(answer)
+    assert translation.granted
+
+
+def test_bucket_refills_with_the_clock():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, rate_per_minute=60, burst=1, max_in_flight=10)
+    assert scheduler.submit("a").granted
+    waiting = scheduler.submit("a")
+    assert not waiting.granted
+    assert scheduler.eta(waiting) == pytest.approx(1.0)
+    clock.advance(0.5)
+    scheduler.dispatch()
+    assert not waiting.granted
+    clock.advance(0.5)
+    scheduler.dispatch()
+    assert waiting.granted
+
+
+def test_token_bucket_caps_at_burst():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1.0, burst=2, clock=clock)
+    assert bucket.take() and bucket.take() and not bucket.take()
+    clock.advance(60)
+    assert bucket.take() and bucket.take() and not bucket.take()
+    assert bucket.wait_time() == pytest.approx(1.0)
+
+
+def test_queue_timeout_removes_the_ticket():
+    scheduler = make_scheduler(FakeClock())
+    scheduler.submit("a")
+    waiting = scheduler.submit("b")
+    with pytest.raises(QueueTimeout):
+        scheduler.wait(waiting, timeout=0)
+    stats = scheduler.stats()
+    assert stats["queued"] == 0
+    assert stats["timed_out"] == 1
+
+
+def test_slot_is_released_when_the_body_raises():
+    scheduler = make_scheduler(FakeClock())
+    with pytest.raises(RuntimeError):
+        with scheduler.slot("a"):
+            assert scheduler.stats()["in_flight"] == 1
+            raise RuntimeError("upstream 500")
+    assert scheduler.stats()["in_flight"] == 0
+
+
+def test_slot_is_cancelled_when_the_wait_is_interrupted():
+    scheduler = make_scheduler(FakeClock())
+    running = scheduler.submit("a")
+
+    def interrupt(position, eta):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        with scheduler.slot("b", on_wait=interrupt):
+            pass
+    assert scheduler.stats()["queued"] == 0
+    scheduler.release(running)
+    assert scheduler.stats()["in_flight"] == 0
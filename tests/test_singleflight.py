@@ -0,0 +1,62 @@
+import threading
+
+import pytest
+
+from saathi.singleflight import SingleFlight
+from saathi.state import SQLiteState
+
+
+def gated_stream(tokens, gate, calls):
+    def open_stream():
+        calls.append(1)
+        yield tokens[0]
+        gate.wait(5)
+        yield from tokens[1:]
+    return open_stream
+
+
+def test_concurrent_streams_share_one_call():
+    flights = SingleFlight()
+    gate = threading.Event()
+    calls = []
+    tokens = ["Hello ", "friend, ", "this is long."]
+    first = flights.stream("k", gated_stream(tokens, gate, calls))
+    assert next(first) == "Hello "
+    second = flights.stream("k", gated_stream(tokens, gate, calls))
+    gate.set()
+    assert "Hello " + "".join(first) == "".join(second) == "".join(tokens)
+    assert len(calls) == 1
+    assert flights.stats()["coalesced"] == 1
+
+
+def test_do_joining_a_stream_gets_the_whole_answer():
+    flights = SingleFlight()
+    gate = threading.Event()
+    calls = []
+    tokens = ["Hello ", "friend, ", "this is long."]
+    stream = flights.stream("k", gated_stream(tokens, gate, calls))
+    assert next(stream) == "Hello "
+    threading.Timer(0.05, gate.set).start()
+    assert flights.do("k", lambda: "not called") == "".join(tokens)
+    assert len(calls) == 1
+
+
+def test_errors_reach_every_follower():
+    flights = SingleFlight()
+
+    def failing():
+        raise RuntimeError("upstream 500")
+
+    with pytest.raises(RuntimeError, match="upstream 500"):
+        flights.do("k", failing)
+    assert not flights.in_flight("k")
+
+
+def test_in_flight_sees_another_process_leading(tmp_path):
+    path = str(tmp_path / "state.sqlite3")
+    leader, follower = SingleFlight(SQLiteState(path)), SingleFlight(SQLiteState(path))
+    assert not follower.in_flight("k")
+    assert leader.state.claim("k")
+    assert follower.in_flight("k")
+    leader.state.lead("k").finish(RuntimeError("upstream 500"))
+    assert not follower.in_flight("k")
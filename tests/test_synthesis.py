@@ -0,0 +1,28 @@
+import os
+import time
+
+from saathi.synthesis import SynthesisPool
+from saathi.tts import audio_duration, voice_profile
+
+FAKE_TTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench", "fake_tts")
+
+
+def test_job_is_retried_when_its_worker_dies(tmp_path, monkeypatch):
+    monkeypatch.setenv("PYTHONPATH", FAKE_TTS)
+    monkeypatch.setenv("SHIKSHA_FAKE_TTS_CPS", "20")
+    pool = SynthesisPool(workers=1, job_timeout=30)
+    try:
+        wav_path = str(tmp_path / "answer.wav")
+        future = pool.submit("Save a little money every week.", voice_profile(), wav_path)
+        deadline = time.monotonic() + 10
+        while pool.stats()["busy"] == 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        pool._workers[0].process.kill()
+        future.result(timeout=30)
+        assert audio_duration(wav_path) > 0
+        stats = pool.stats()
+        assert stats["restarts"] == 1
+        assert stats["completed"] == 1
+        assert stats["failed"] == 0
+    finally:
+        pool.close()
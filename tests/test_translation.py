@@ -0,0 +1,29 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from saathi.translation import SentencePipeline
+
+
+def translate(segment):
+    if "fail" in segment:
+        raise RuntimeError("upstream 500")
+    return segment.upper()
+
+
+def test_pieces_come_back_in_answer_order():
+    with ThreadPoolExecutor(2) as executor:
+        pipeline = SentencePipeline(translate, executor)
+        for sentence in ["Save money.", "Open an account.", "Ask the bank."]:
+            pipeline.submit(sentence)
+        assert list(pipeline.rest()) == ["SAVE MONEY.", "OPEN AN ACCOUNT.", "ASK THE BANK."]
+        assert pipeline.error is None
+
+
+def test_failed_segment_does_not_raise_while_streaming():
+    with ThreadPoolExecutor(2) as executor:
+        pipeline = SentencePipeline(translate, executor)
+        pipeline.submit("This will fail.")
+        pipeline.submit("This is fine.")
+        executor.shutdown(wait=True)
+        assert pipeline.ready() == ["", "THIS IS FINE."]
+        assert list(pipeline.rest()) == []
+        assert isinstance(pipeline.error, RuntimeError)
@@ -0,0 +1,103 @@
+import os
+import sys
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from saathi import tts
+from saathi.tts import select_voice, voice_profile
+
+
+class Voice:
+    def __init__(self, voice_id, name, languages=(), gender=None):
+        self.id = voice_id
+        self.name = name
+        self.languages = list(languages)
+        self.gender = gender
+
+
+ESPEAK_NG = [
+    Voice("gmw/af", "Afrikaans", [b"\x05af"]),
+    Voice("zle/uk", "Ukrainian", [b"\x05uk"]),
+    Voice("gmw/en", "English (Great Britain)", [b"\x02en-gb", b"\x02en"]),
+    Voice("gmw/en-US", "English (America)", [b"\x05en-us"]),
+    Voice("inc/hi", "Hindi", [b"\x05hi"]),
+]
+SAPI = [
+    Voice(r"HKEY_LOCAL_MACHINE\SOFTWARE\Microsoft\Speech\Voices\Tokens\TTS_MS_EN-US_DAVID_11.0",
+          "Microsoft David Desktop - English (United States)"),
+    Voice(r"HKEY_LOCAL_MACHINE\SOFTWARE\Microsoft\Speech\Voices\Tokens\TTS_MS_EN-GB_HAZEL_11.0",
+          "Microsoft Hazel Desktop - English (Great Britain)"),
+    Voice(r"HKEY_LOCAL_MACHINE\SOFTWARE\Microsoft\Speech\Voices\Tokens\TTS_MS_EN-US_ZIRA_11.0",
+          "Microsoft Zira Desktop - English (United States)"),
+]
+
+
+def base(voice_id):
+    return voice_id.split("+")[0] if voice_id else voice_id
+
+
+def test_espeak_dialects_match_exact_language_codes():
+    assert base(select_voice(ESPEAK_NG, voice_profile("American English"))) == "gmw/en-US"
+    assert base(select_voice(ESPEAK_NG, voice_profile("British English"))) == "gmw/en"
+    assert base(select_voice(ESPEAK_NG, voice_profile("Hindi"))) == "inc/hi"
+
+
+def test_sapi_voices_match_on_id_and_gender():
+    assert select_voice(SAPI, voice_profile("British English")) == SAPI[1].id
+    assert select_voice(SAPI, voice_profile("American English", "Man")) == SAPI[0].id
+
+
+def test_missing_dialect_falls_back_to_english_then_to_the_engine_default():
+    without_hindi = ESPEAK_NG[:4]
+    assert base(select_voice(without_hindi, voice_profile("Hindi"))) in ("gmw/en", "gmw/en-US")
+    assert select_voice(ESPEAK_NG[:2], voice_profile("Hindi")) is None
+
+
+def test_espeak_gets_a_gender_variant_on_linux(monkeypatch):
+    monkeypatch.setattr(sys, "platform", "linux")
+    assert select_voice(ESPEAK_NG, voice_profile("Hindi", "Woman")) == "inc/hi+f3"
+    assert select_voice(ESPEAK_NG, voice_profile("Hindi", "Man")) == "inc/hi+m3"
+
+
+class SilentPool:
+    # Writes 0.1 s of silence per word instead of synthesising speech.
+    def synthesize(self, text, profile, wav_path):
+        with wave.open(wav_path, "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(16000)
+            f.writeframes(b"\0\0" * 1600 * len(text.split()))
+
+
+def test_sentence_audio_joins_cached_segments(tmp_path, monkeypatch):
+    monkeypatch.setattr(tts, "FFMPEG", None)
+    renderer = tts.AudioRenderer(str(tmp_path), pool=SilentPool())
+    profile = voice_profile()
+    with ThreadPoolExecutor(2) as executor:
+        audio = tts.SentenceAudio(renderer, profile, executor)
+        audio.submit("Namaste friend.")
+        audio.submit(" Save a little every week.")
+        first = audio.first(wait=True)
+        assert first == renderer.cached_path("Namaste friend.", profile)
+        path = audio.join("Namaste friend. Save a little every week.")
+    assert path == renderer.cached_path("Namaste friend. Save a little every week.", profile)
+    assert tts.audio_duration(first) == pytest.approx(0.2)
+    assert tts.audio_duration(path) == pytest.approx(0.7)
+    assert renderer.rendered == 2
+
+
+def test_least_recently_used_audio_is_pruned(tmp_path, monkeypatch):
+    monkeypatch.setattr(tts, "FFMPEG", None)
+    renderer = tts.AudioRenderer(str(tmp_path), pool=SilentPool(), max_files=2)
+    profile = voice_profile()
+    first = renderer.render("One.", profile)
+    second = renderer.render("Two.", profile)
+    os.utime(first, (1, 1))
+    os.utime(second, (2, 2))
+    renderer.cached_path("One.", profile)
+    renderer.render("Three.", profile)
+    assert renderer.cached_path("Two.", profile) is None
+    assert renderer.cached_path("One.", profile) and renderer.cached_path("Three.", profile)
+    assert renderer.pruned == 1
@@ -0,0 +1,45 @@
+from saathi.voicequeue import VoiceQueue
+
+
+def queued(voice_queue, session):
+    return [item.text for item in voice_queue._sessions.get(session, ())]
+
+
+def test_overflow_keeps_the_start_of_the_current_turn():
+    voice_queue = VoiceQueue(lambda item: None, max_per_session=3)
+    items = [voice_queue.put("s", "t1", f"sentence {i}") for i in range(5)]
+    assert queued(voice_queue, "s") == ["sentence 0", "sentence 1", "sentence 2"]
+    assert items[3].cancelled and items[4].cancelled
+    assert voice_queue.stats()["dropped"]["overflow"] == 2
+
+
+def test_overflow_evicts_earlier_turns_first():
+    voice_queue = VoiceQueue(lambda item: None, max_per_session=3, policy="drop-oldest")
+    voice_queue.put("s", "t1", "old 0")
+    voice_queue.put("s", "t1", "old 1")
+    voice_queue.put("s", "t2", "new 0")
+    voice_queue.put("s", "t2", "new 1")
+    voice_queue.put("s", "t2", "new 2")
+    assert queued(voice_queue, "s") == ["new 0", "new 1", "new 2"]
+    assert voice_queue.stats()["dropped"]["overflow"] == 2
+
+
+def test_new_turn_supersedes_the_old_one():
+    stopped = []
+    voice_queue = VoiceQueue(lambda item: None, stop=lambda: stopped.append(1))
+    voice_queue.put("s", "t1", "old 0")
+    voice_queue.put("s", "t1", "old 1")
+    voice_queue.current = voice_queue._next()
+    voice_queue.put("s", "t2", "new 0")
+    assert queued(voice_queue, "s") == ["new 0"]
+    assert stopped == [1]
+    assert voice_queue.stats()["dropped"]["superseded"] == 1
+    assert voice_queue.stats()["interrupted"] == 1
+
+
+def test_sessions_are_spoken_round_robin():
+    voice_queue = VoiceQueue(lambda item: None)
+    for text in ["a0", "a1", "a2"]:
+        voice_queue.put("a", "t", text)
+    voice_queue.put("b", "t", "b0")
+    assert [voice_queue._next().text for _ in range(4)] == ["a0", "b0", "a1", "a2"]